@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Stratified Sampling with Adaptive Early Stopping
+
+Instead of sending every suite query on every router change, sends a
+stratified sample and keeps adding batches only until the success criteria
+can be decided:
+
+    - strata are difficulty × intent × domain cells (suite_loader index)
+    - tiers are sampled in the proportions declared in the suite metadata
+      (difficulty_distribution / difficulty_tiers; the suite's own counts when
+      absent), intent/domain cells in proportion to their size within a tier
+    - after each batch, every criterion gets a confidence interval:
+        per-tier accuracy  Wilson interval with a finite population correction
+                           (the question is the accuracy over the whole suite, so
+                           the interval closes as a tier is exhausted)
+        P90 latency        distribution-free order-statistic interval
+    - a criterion is decided once its interval lies entirely on one side of
+      the threshold; the run stops when the verdict is known (one criterion
+      failed, or all passed), when --max-queries is reached, or when the
+      suite runs out (remaining criteria are then decided on the full-run value)
+
+Checking after every batch is a sequential test, so the real error rate is
+somewhat above the nominal one; raise --confidence for high-stakes gates.
+
+Usage:
+    python3 adaptive_test.py --test-suite ../test-suites/difficulty-stratified-balanced-250.json
+    python3 adaptive_test.py --confidence 0.99 --batch 40 --criteria-level critical
+
+Arguments:
+    --test-suite PATH          Path to test suite JSON file
+    --min-per-tier N           Queries per tier before the first decision (default: 20)
+    --batch N                  Queries added per round after that (default: 25)
+    --max-queries N            Stop undecided after this many queries (default: whole suite)
+    --confidence LEVEL         Confidence level of the intervals (default: 0.95)
+    --criteria-level LEVEL     Success criteria column: target or critical (default: target)
+    --thresholds PATH          JSON file overriding criteria by name, e.g. {"P90 Latency": 1.5}
+    --seed N                   Sampling seed (default: 42)
+    --concurrency N            In-flight requests (default: 8)
+    --timeout SECONDS          Per-request timeout (default: 30)
+    --api-base URL             Base URL of the query API (default: http://localhost:8000)
+    --output-dir PATH          Where to write results (default: <RESULTS_DIR>/adaptive)
+
+Exits 0 on PASS, 1 on FAIL and 2 when --max-queries stopped the run undecided.
+
+Outputs:
+    - stratified_results.json: Sampled per-query results, metrics, and metrics.adaptive
+      (decisions, intervals, per-round history, queries saved)
+    - stratified_summary.txt: Standard summary plus the adaptive report
+    - confusion_matrix.txt: Intent prediction confusion analysis
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compare_runs import SUCCESS_CRITERIA
+from difficulty_stratified_test import (
+    API_BASE,
+    RESULT_LOG_NAME,
+    RESULTS_DIR,
+    api_endpoints,
+    calculate_metrics,
+    check_api_health,
+    format_confusion_matrix,
+    format_summary,
+    run_queries_async,
+    save_reports,
+)
+from metrics_aggregator import DIFFICULTIES
+from metrics_exporter import add_exporter_arguments, exporter_from_args
+from result_log import ResultLog, iter_results
+from suite_loader import Suite, SuiteError, load_suite
+
+ADAPTIVE_CRITERIA = ("Easy Tier", "Medium Tier", "Hard Tier", "P90 Latency")
+TIER_CRITERIA = {"Easy Tier": "easy", "Medium Tier": "medium", "Hard Tier": "hard"}
+DECISION_ICONS = {"pass": "✅", "fail": "❌", "undecided": "⏳"}
+
+
+def tier_proportions(suite: Suite) -> Dict[str, float]:
+    """Tier sampling weights from the suite metadata, or from the suite itself when not declared."""
+    declared = suite.metadata.get('difficulty_distribution') or suite.metadata.get('difficulty_tiers') or {}
+    counts = {tier: declared[tier] for tier in suite.counts('difficulty') if isinstance(declared.get(tier), int)}
+    if len(counts) != len(suite.counts('difficulty')):
+        counts = suite.counts('difficulty')
+    total = sum(counts.values())
+    return {tier: count / total for tier, count in counts.items()}
+
+
+class StratifiedSampler:
+    """Draws suite positions without replacement, keeping tier and cell proportions at every size."""
+
+    def __init__(self, suite: Suite, proportions: Dict[str, float], seed: int):
+        rng = random.Random(seed)
+        self.cells: Dict[Tuple[str, str, Any], List[int]] = {}
+        for position, query in enumerate(suite.queries):
+            self.cells.setdefault((query['difficulty'], query['intent'], query['domain']), []).append(position)
+        for positions in self.cells.values():
+            rng.shuffle(positions)
+
+        tier_sizes = suite.counts('difficulty')
+        self.proportions = proportions
+        # Share of its tier's draws each cell should hold
+        self.weights = {cell: len(positions) / tier_sizes[cell[0]] for cell, positions in self.cells.items()}
+        self.drawn = {cell: 0 for cell in self.cells}
+        self.tier_drawn = {tier: 0 for tier in tier_sizes}
+        self.total_drawn = 0
+
+    @property
+    def remaining(self) -> int:
+        return sum(len(positions) - self.drawn[cell] for cell, positions in self.cells.items())
+
+    def draw(self, k: int) -> List[int]:
+        """The next k positions: the open tier furthest below its proportion, then its cell furthest below share.
+
+        Allocating in two levels keeps the tier shares exact to within one query;
+        picking cells directly would let each cell's rounding error add up within a tier.
+        """
+        batch = []
+        for _ in range(min(k, self.remaining)):
+            n = self.total_drawn + 1
+            open_cells = [c for c in self.cells if self.drawn[c] < len(self.cells[c])]
+            open_tiers = [t for t in self.tier_drawn if any(c[0] == t for c in open_cells)]
+            tier = max(open_tiers, key=lambda t: self.proportions.get(t, 0.0) * n - self.tier_drawn[t])
+            tier_n = self.tier_drawn[tier] + 1
+            cell = max((c for c in open_cells if c[0] == tier), key=lambda c: self.weights[c] * tier_n - self.drawn[c])
+            batch.append(self.cells[cell][self.drawn[cell]])
+            self.drawn[cell] += 1
+            self.tier_drawn[tier] += 1
+            self.total_drawn += 1
+        return batch
+
+    def draw_min_per_tier(self, proportions: Dict[str, float], min_per_tier: int) -> List[int]:
+        """A first batch big enough that every tier gets min_per_tier queries at its proportion."""
+        needed = max(math.ceil(min_per_tier / p) for p in proportions.values() if p > 0)
+        return self.draw(needed)
+
+
+def wilson_interval(correct: int, n: int, z: float, sampled: int, population: int) -> Tuple[float, float]:
+    """Wilson score interval for a proportion, with the finite population correction.
+
+    The correction enters as an effective sample size n·(N-1)/(N-sampled), so
+    the interval shrinks to the observed proportion once the tier is exhausted.
+    """
+    if n == 0:
+        return 0.0, 1.0
+    p = correct / n
+    if population > 1:
+        if sampled >= population:
+            return p, p
+        n = n * (population - 1) / (population - sampled)
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def quantile_interval(values: np.ndarray, q: float, z: float) -> Tuple[float, float, float]:
+    """Point estimate and distribution-free confidence interval for a quantile (inf when n is too small)."""
+    ordered = np.sort(values)
+    n = len(ordered)
+    if n == 0:
+        return math.nan, 0.0, math.inf
+    point = float(np.quantile(ordered, q, method='weibull'))  # statistics.quantiles() default
+    spread = z * math.sqrt(n * q * (1 - q))
+    lower_rank = math.floor(n * q - spread)
+    upper_rank = math.ceil(n * q + spread) + 1
+    low = float(ordered[lower_rank - 1]) if lower_rank >= 1 else 0.0
+    high = float(ordered[upper_rank - 1]) if upper_rank <= n else math.inf
+    return point, low, high
+
+
+class SampleState:
+    """Running per-tier counts and successful latencies of the sampled queries."""
+
+    def __init__(self):
+        self.sampled = {tier: 0 for tier in DIFFICULTIES}
+        self.successful = {tier: 0 for tier in DIFFICULTIES}
+        self.correct = {tier: 0 for tier in DIFFICULTIES}
+        self.latencies: List[float] = []
+
+    def record(self, result: Dict[str, Any]):
+        tier = result['difficulty']
+        self.sampled[tier] = self.sampled.get(tier, 0) + 1
+        if result['status'] != 'success':
+            return
+        self.successful[tier] = self.successful.get(tier, 0) + 1
+        self.correct[tier] = self.correct.get(tier, 0) + bool(result.get('intent_correct'))
+        self.latencies.append(result['latency_seconds'])
+
+    @property
+    def total(self) -> int:
+        return sum(self.sampled.values())
+
+
+def criteria_thresholds(level: str, overrides: Dict[str, float]) -> List[Tuple[str, str, float]]:
+    """(name, op, threshold) for the criteria this runner decides."""
+    return [(name, op, overrides.get(name, target if level == 'target' else critical))
+            for name, _, op, target, critical in SUCCESS_CRITERIA if name in ADAPTIVE_CRITERIA]
+
+
+def evaluate(state: SampleState, suite: Suite, criteria: List[Tuple[str, str, float]], z: float,
+             exhausted: bool) -> List[Dict[str, Any]]:
+    """Estimate, interval and pass/fail/undecided decision for every criterion."""
+    tier_sizes = suite.counts('difficulty')
+    checks = []
+    for name, op, threshold in criteria:
+        tier = TIER_CRITERIA.get(name)
+        if tier is not None:
+            n = state.successful.get(tier, 0)
+            estimate = state.correct.get(tier, 0) / n * 100 if n else math.nan
+            low, high = wilson_interval(state.correct.get(tier, 0), n, z, state.sampled.get(tier, 0),
+                                        tier_sizes.get(tier, 0))
+            low, high = low * 100, high * 100
+        else:
+            n = len(state.latencies)
+            estimate, low, high = quantile_interval(np.array(state.latencies), 0.9, z)
+
+        if n == 0:
+            decision = "undecided"
+        elif op == '>=':
+            decision = "pass" if low >= threshold else "fail" if high < threshold else "undecided"
+        else:
+            decision = "pass" if high < threshold else "fail" if low >= threshold else "undecided"
+        decided_by = "interval"
+        if decision == "undecided" and exhausted and n:
+            passed = estimate >= threshold if op == '>=' else estimate < threshold
+            decision, decided_by = ("pass" if passed else "fail"), "full suite"
+
+        checks.append({"criterion": name, "op": op, "threshold": threshold, "n": n, "estimate": estimate,
+                       "ci_low": low, "ci_high": high, "decision": decision, "decided_by": decided_by})
+    return checks
+
+
+def overall_verdict(checks: List[Dict[str, Any]]) -> Optional[str]:
+    """'FAIL' once any criterion failed, 'PASS' once all passed, else None."""
+    decisions = [check['decision'] for check in checks]
+    if "fail" in decisions:
+        return "FAIL"
+    if all(decision == "pass" for decision in decisions):
+        return "PASS"
+    return None
+
+
+def _format_value(name: str, value: float) -> str:
+    if TIER_CRITERIA.get(name):
+        return f"{value:.1f}%"
+    return "∞" if math.isinf(value) else f"{value * 1000:.0f}ms"
+
+
+def format_round(queries: int, checks: List[Dict[str, Any]]) -> str:
+    """One status line per round."""
+    cells = []
+    for check in checks:
+        label = TIER_CRITERIA.get(check['criterion'], "P90")
+        if check['n'] == 0:
+            cells.append(f"{label} -")
+            continue
+        cells.append(f"{label} {_format_value(check['criterion'], check['estimate'])} "
+                     f"[{_format_value(check['criterion'], check['ci_low'])}, "
+                     f"{_format_value(check['criterion'], check['ci_high'])}] {DECISION_ICONS[check['decision']]}")
+    return f"🔎 {queries:>5} queries | " + " | ".join(cells)
+
+
+async def run_adaptive(suite: Suite, sampler: StratifiedSampler, state: SampleState, on_result,
+                       criteria: List[Tuple[str, str, float]], z: float, args, endpoint: str,
+                       proportions: Dict[str, float]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], str]:
+    """Sample rounds until the verdict is known; returns (final checks, per-round history, stop reason)."""
+    max_queries = args.max_queries or len(suite)
+    history = []
+    positions = sampler.draw_min_per_tier(proportions, args.min_per_tier)
+    while True:
+        positions = positions[:max(max_queries - state.total, 0)]
+        await run_queries_async([(p + 1, suite.queries[p]) for p in positions], len(suite), args.concurrency,
+                                on_result, timeout=args.timeout, endpoint=endpoint, quiet=True)
+        exhausted = sampler.remaining == 0
+        checks = evaluate(state, suite, criteria, z, exhausted)
+        history.append({"queries": state.total,
+                        "decisions": {check['criterion']: check['decision'] for check in checks}})
+        print(format_round(state.total, checks), flush=True)
+
+        if overall_verdict(checks):
+            return checks, history, "verdict reached"
+        if exhausted:
+            return checks, history, "suite exhausted"
+        if state.total >= max_queries:
+            return checks, history, "--max-queries reached"
+        positions = sampler.draw(args.batch)
+
+
+def format_adaptive_report(adaptive: Dict[str, Any]) -> str:
+    """Decisions with their intervals, sample allocation and queries saved."""
+    lines = []
+    lines.append("="*80)
+    lines.append(f"ADAPTIVE SAMPLING ({adaptive['confidence'] * 100:g}% intervals, "
+                 f"{adaptive['criteria_level']} criteria)")
+    lines.append("="*80)
+    lines.append(f"{'Criterion':<14} {'Estimate':>9} {'Interval':>22} {'Threshold':>11} {'n':>5}  Decision")
+    lines.append("-"*80)
+    for check in adaptive['checks']:
+        name = check['criterion']
+        if check['n']:
+            estimate = _format_value(name, check['estimate'])
+            interval = f"[{_format_value(name, check['ci_low'])}, {_format_value(name, check['ci_high'])}]"
+        else:
+            estimate, interval = "-", "-"
+        threshold = f"{check['op']} " + (f"{check['threshold']:g}%" if name in TIER_CRITERIA
+                                         else f"{check['threshold'] * 1000:g}ms")
+        decision = f"{DECISION_ICONS[check['decision']]} {check['decision']}"
+        if check['decided_by'] != "interval":
+            decision += f" ({check['decided_by']})"
+        lines.append(f"{name:<14} {estimate:>9} {interval:>22} {threshold:>11} {check['n']:>5}  {decision}")
+    lines.append("")
+
+    lines.append("🎯 Sample by tier (sampled / suite, target share):")
+    for tier, sampled in adaptive['samples_by_tier'].items():
+        lines.append(f"   {tier:<8} {sampled:>5} / {adaptive['suite_by_tier'].get(tier, 0):<5} "
+                     f"{adaptive['tier_proportions'].get(tier, 0) * 100:5.1f}%")
+    lines.append("")
+
+    verdict = adaptive['verdict'] or "UNDECIDED"
+    lines.append(f"{'✅' if verdict == 'PASS' else '❌' if verdict == 'FAIL' else '⏳'} Verdict: {verdict} "
+                 f"after {len(adaptive['rounds'])} round(s) ({adaptive['stop_reason']})")
+    lines.append(f"💰 Queries run: {adaptive['queries_run']} of {adaptive['suite_size']} "
+                 f"({adaptive['queries_saved']} saved, {adaptive['saved_fraction'] * 100:.1f}%; "
+                 f"~{adaptive['estimated_seconds_saved']:.0f}s at this run's throughput)")
+    lines.append("="*80)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stratified sample of a suite with adaptive early stopping')
+    parser.add_argument(
+        '--test-suite',
+        type=str,
+        default='/Users/richardglaubitz/Projects/Apex-Memory-System-Development/tests/test-suites/difficulty-stratified-balanced-250.json',
+        help='Path to test suite JSON file (default: difficulty-stratified-balanced-250.json)'
+    )
+    parser.add_argument('--min-per-tier', type=int, default=20,
+                        help='Queries per tier before the first decision (default: 20)')
+    parser.add_argument('--batch', type=int, default=25, help='Queries added per round (default: 25)')
+    parser.add_argument('--max-queries', type=int, help='Stop undecided after this many queries (default: whole suite)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level (default: 0.95)')
+    parser.add_argument('--criteria-level', choices=['target', 'critical'], default='target',
+                        help='Success criteria column to decide against (default: target)')
+    parser.add_argument('--thresholds', type=str, help='JSON file overriding criteria by name')
+    parser.add_argument('--seed', type=int, default=42, help='Sampling seed (default: 42)')
+    parser.add_argument('--concurrency', type=int, default=8, help='In-flight requests (default: 8)')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+    parser.add_argument('--api-base', type=str, default=API_BASE, help=f'Base URL of the query API (default: {API_BASE})')
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(RESULTS_DIR / "adaptive"),
+        help='Directory for result files (default: <RESULTS_DIR>/adaptive)'
+    )
+    add_exporter_arguments(parser)
+    args = parser.parse_args()
+    if not 0 < args.confidence < 1:
+        parser.error('--confidence must be between 0 and 1')
+    if args.batch < 1 or args.min_per_tier < 1:
+        parser.error('--batch and --min-per-tier must be at least 1')
+
+    query_endpoint, health_endpoint = api_endpoints(args.api_base)
+    queries_path = Path(args.test_suite)
+    output_dir = Path(args.output_dir)
+    overrides = json.loads(Path(args.thresholds).read_text()) if args.thresholds else {}
+    criteria = criteria_thresholds(args.criteria_level, overrides)
+    z = NormalDist().inv_cdf((1 + args.confidence) / 2)
+
+    print("🚀 Starting Adaptive Stratified Test")
+    print("="*80)
+    print(f"   Test Suite: {queries_path.name}")
+    print(f"   API Endpoint: {query_endpoint}")
+    print(f"   Confidence: {args.confidence * 100:g}% | {args.min_per_tier} per tier, then rounds of {args.batch}")
+    print("="*80)
+    print("")
+
+    if not check_api_health(health_endpoint):
+        print("\n❌ API is not healthy. Exiting.")
+        sys.exit(1)
+
+    try:
+        suite = load_suite(queries_path)
+    except (OSError, SuiteError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    proportions = tier_proportions(suite)
+    sampler = StratifiedSampler(suite, proportions, args.seed)
+    print(f"✅ Loaded {len(suite)} test queries in {len(sampler.cells)} strata; tier shares "
+          + ", ".join(f"{tier} {share * 100:.0f}%" for tier, share in proportions.items()) + "\n")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    log_path = output_dir / RESULT_LOG_NAME
+    state = SampleState()
+    exporter = exporter_from_args(args, {"mode": "adaptive", "test_suite": queries_path.name})
+
+    run_start = time.perf_counter()
+    try:
+        with ResultLog(log_path) as log:
+            def on_result(result: Dict[str, Any]):
+                log.write(result)
+                state.record(result)
+                if exporter:
+                    exporter.record(result)
+
+            checks, rounds, stop_reason = asyncio.run(run_adaptive(suite, sampler, state, on_result, criteria, z,
+                                                                   args, query_endpoint, proportions))
+            completed = log.written
+    finally:
+        # Final textfile write and server shutdown even if the run fails
+        if exporter:
+            exporter.close()
+    run_duration = time.perf_counter() - run_start
+
+    verdict = overall_verdict(checks)
+    saved = len(suite) - completed
+    metrics = calculate_metrics(iter_results(log_path))
+    metrics['adaptive'] = {
+        "confidence": args.confidence,
+        "criteria_level": args.criteria_level,
+        "verdict": verdict,
+        "stop_reason": stop_reason,
+        "checks": checks,
+        "rounds": rounds,
+        "tier_proportions": proportions,
+        "samples_by_tier": {tier: n for tier, n in state.sampled.items() if tier in proportions},
+        "suite_by_tier": suite.counts('difficulty'),
+        "suite_size": len(suite),
+        "queries_run": completed,
+        "queries_saved": saved,
+        "saved_fraction": saved / len(suite) if len(suite) else 0.0,
+        "estimated_seconds_saved": saved * run_duration / completed if completed else 0.0
+    }
+
+    test_run = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "adaptive",
+        "total_queries": completed,
+        "test_suite": str(queries_path),
+        "api_endpoint": query_endpoint,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "duration_seconds": run_duration,
+        "throughput_qps": completed / run_duration if run_duration > 0 else 0.0
+    }
+    report = format_adaptive_report(metrics['adaptive'])
+    summary = format_summary(metrics) + "\n\n" + report
+    confusion_text = format_confusion_matrix(metrics['confusion_matrix'])
+    print("")
+    save_reports(output_dir, test_run, iter_results(log_path), metrics, summary, confusion_text)
+    print("")
+    print(report)
+
+    sys.exit(0 if verdict == "PASS" else 1 if verdict == "FAIL" else 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Query Cache Effectiveness Benchmark
+
+The stratified runner always sends "use_cache": false, so its numbers say
+nothing about the query cache that absorbs most production traffic. This
+runner sends the suite with the cache enabled in three phases:
+
+    cold   every suite query once, against an empty cache (see --flush-command)
+    warm   the same queries again, in the same order
+    zipf   a Zipf-skewed replay, from an empty cache again: a few queries are
+           very popular, most are rare, like production traffic. Fix the
+           exponent with --zipf-exponent, or give the fraction of production
+           requests that repeat an earlier query with --target-repeat-rate and
+           the exponent is fitted to it.
+
+--flush-command runs before the cold and Zipf phases. Without it the Zipf
+phase starts from the warm cache and its hit rate is an upper bound.
+
+Hits and misses come from the "cached" flag in each response. Every phase
+reports hit rate, hit vs miss latency percentiles and the miss/hit speedup
+per difficulty tier; the cold and warm passes are also compared tier by tier.
+
+Usage:
+    python3 cache_benchmark.py --test-suite SUITE --flush-command "redis-cli FLUSHDB"
+    python3 cache_benchmark.py --zipf-requests 2000 --target-repeat-rate 0.6 --concurrency 8
+
+Arguments:
+    --test-suite PATH          Path to test suite JSON file
+    --concurrency N            In-flight requests per phase (default: 4)
+    --timeout SECONDS          Per-request timeout (default: 30)
+    --flush-command CMD        Shell command run before the cold and Zipf phases to empty the cache
+    --zipf-requests N          Requests in the Zipf phase (default: 4x suite size)
+    --zipf-exponent S          Zipf exponent (default: 1.0)
+    --target-repeat-rate FRAC  Fit the exponent so this fraction of Zipf requests are repeats
+    --seed N                   Seed for the Zipf popularity ranking and draws (default: 42)
+    --api-base URL             Base URL of the query API (default: http://localhost:8000)
+    --output-dir PATH          Where to write results (default: <RESULTS_DIR>/cache-benchmark)
+
+Outputs:
+    - stratified_results.json: Per-query results (tagged with their phase) and per-phase cache metrics
+    - stratified_summary.txt: Standard summary plus the cache report
+    - confusion_matrix.txt: Intent prediction confusion analysis
+"""
+
+import argparse
+import asyncio
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from difficulty_stratified_test import (
+    API_BASE,
+    RESULTS_DIR,
+    api_endpoints,
+    calculate_metrics,
+    check_api_health,
+    format_confusion_matrix,
+    format_summary,
+    load_queries,
+    run_queries_async,
+    save_reports,
+)
+
+PHASES = ['cold', 'warm', 'zipf']
+
+
+def zipf_weights(n: int, exponent: float) -> List[float]:
+    """Normalized Zipf probabilities for popularity ranks 1..n."""
+    weights = [1 / (rank ** exponent) for rank in range(1, n + 1)]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+
+def expected_repeat_rate(n_queries: int, n_requests: int, exponent: float) -> float:
+    """Expected fraction of n_requests Zipf draws that repeat an earlier draw."""
+    distinct = sum(1 - (1 - p) ** n_requests for p in zipf_weights(n_queries, exponent))
+    return 1 - distinct / n_requests
+
+
+def fit_zipf_exponent(target_repeat_rate: float, n_queries: int, n_requests: int) -> float:
+    """Bisect for the exponent whose expected repeat rate matches the target (clamped to 0..5)."""
+    low, high = 0.0, 5.0
+    for _ in range(50):
+        mid = (low + high) / 2
+        if expected_repeat_rate(n_queries, n_requests, mid) < target_repeat_rate:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def zipf_workload(queries: List[Dict[str, Any]], n_requests: int, exponent: float,
+                  seed: int) -> List[Tuple[int, Dict[str, Any]]]:
+    """Draw (query_index, query_data) pairs with Zipf-distributed popularity.
+
+    Popularity ranks are assigned by a seeded shuffle, so the most popular
+    queries are not simply the first ones in the suite file (which is
+    grouped by difficulty).
+    """
+    rng = random.Random(seed)
+    ranking = list(range(len(queries)))
+    rng.shuffle(ranking)
+    picks = rng.choices(ranking, weights=zipf_weights(len(queries), exponent), k=n_requests)
+    return [(i + 1, queries[i]) for i in picks]
+
+
+def run_phase(phase: str, workload: List[Tuple[int, Dict[str, Any]]], concurrency: int, timeout: float,
+              endpoint: str) -> Tuple[List[Dict[str, Any]], float]:
+    """Run one phase with the cache enabled. Returns (results tagged with the phase, wall-clock seconds)."""
+    results: List[Dict[str, Any]] = []
+
+    def on_result(result: Dict[str, Any]):
+        result['phase'] = phase
+        results.append(result)
+
+    start = time.perf_counter()
+    asyncio.run(run_queries_async(workload, len(workload), concurrency, on_result,
+                                  timeout=timeout, endpoint=endpoint, use_cache=True))
+    return results, time.perf_counter() - start
+
+
+def tier_speedups(cold: Dict[str, Any], warm: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Compare median latency per difficulty tier between the cold and warm passes."""
+    speedups = {}
+    for tier in ['easy', 'medium', 'hard']:
+        cold_tier = cold.get('by_difficulty', {}).get(tier)
+        warm_tier = warm.get('by_difficulty', {}).get(tier)
+        if cold_tier and warm_tier:
+            speedups[tier] = {
+                "cold_median_seconds": cold_tier['median_latency'],
+                "warm_median_seconds": warm_tier['median_latency'],
+                "speedup": (cold_tier['median_latency'] / warm_tier['median_latency']
+                            if warm_tier['median_latency'] > 0 else None)
+            }
+    return speedups
+
+
+def format_cache_report(cache_benchmark: Dict[str, Any]) -> str:
+    """Format per-phase hit rates, hit/miss latency and per-tier speedups."""
+    lines = []
+    lines.append("="*80)
+    lines.append("CACHE EFFECTIVENESS (cold → warm → Zipf replay)")
+    lines.append("="*80)
+    lines.append("")
+    lines.append(" Phase | Requests | Hit rate | Hit P50 (ms) | Hit P99 (ms) | Miss P50 (ms) | Miss P99 (ms) |")
+    lines.append("-" * 92)
+    for phase in PHASES:
+        data = cache_benchmark['phases'].get(phase)
+        if not data:
+            continue
+        cache = data['cache_performance']
+        hit = cache.get('hit_latency') or {}
+        miss = cache.get('miss_latency') or {}
+
+        def ms(summary, key):
+            return f"{summary[key] * 1000:.1f}" if summary else "-"
+
+        lines.append(
+            f" {phase:5s} | {data['requests']:8d} | {cache['hit_rate']:7.1f}% |"
+            f" {ms(hit, 'p50_seconds'):>12s} | {ms(hit, 'p99_seconds'):>12s} |"
+            f" {ms(miss, 'p50_seconds'):>13s} | {ms(miss, 'p99_seconds'):>13s} |"
+        )
+    lines.append("")
+
+    zipf = cache_benchmark['zipf']
+    lines.append(f"   Zipf replay: exponent {zipf['exponent']:.3f}, {zipf['distinct_queries']} distinct of "
+                 f"{zipf['requests']} requests (repeat rate {zipf['repeat_rate'] * 100:.1f}%)")
+    lines.append("")
+
+    lines.append("   Speedup by Difficulty Tier:")
+    for tier, data in cache_benchmark['cold_vs_warm'].items():
+        speedup = f"{data['speedup']:.1f}x" if data['speedup'] else "-"
+        lines.append(f"      {tier.capitalize():8s}: cold {data['cold_median_seconds'] * 1000:7.1f}ms → "
+                     f"warm {data['warm_median_seconds'] * 1000:7.1f}ms ({speedup})")
+    zipf_tiers = cache_benchmark['phases'].get('zipf', {}).get('cache_performance', {}).get('by_difficulty', {})
+    for tier, data in zipf_tiers.items():
+        speedup = f"{data['speedup']:.1f}x" if data['speedup'] else "-"
+        lines.append(f"      {tier.capitalize():8s}: Zipf hit rate {data['hit_rate']:5.1f}%, miss/hit speedup {speedup}")
+
+    cold_hits = cache_benchmark['phases'].get('cold', {}).get('cache_performance', {}).get('hits', 0)
+    if cold_hits > cache_benchmark['duplicate_queries']:
+        lines.append("")
+        lines.append("   ⚠️  The cold pass had more cache hits than the suite has duplicate queries: "
+                     "the cache was not empty (use --flush-command)")
+
+    lines.append("="*80)
+    return "\n".join(lines)
+
+
+def main():
+    """Cache benchmark execution."""
+    parser = argparse.ArgumentParser(description='Measure query cache effectiveness with cold, warm and Zipf phases')
+    parser.add_argument(
+        '--test-suite',
+        type=str,
+        default='/Users/richardglaubitz/Projects/Apex-Memory-System-Development/tests/test-suites/difficulty-stratified-balanced-250.json',
+        help='Path to test suite JSON file (default: difficulty-stratified-balanced-250.json)'
+    )
+    parser.add_argument('--concurrency', type=int, default=4, help='In-flight requests per phase (default: 4)')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+    parser.add_argument('--flush-command', type=str,
+                        help='Shell command that empties the cache before the cold and Zipf phases')
+    parser.add_argument('--zipf-requests', type=int, help='Requests in the Zipf phase (default: 4x suite size)')
+    parser.add_argument('--zipf-exponent', type=float, default=1.0, help='Zipf exponent (default: 1.0)')
+    parser.add_argument('--target-repeat-rate', type=float,
+                        help='Fit the Zipf exponent so this fraction of requests repeat an earlier one')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the Zipf replay (default: 42)')
+    parser.add_argument('--api-base', type=str, default=API_BASE, help=f'Base URL of the query API (default: {API_BASE})')
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(RESULTS_DIR / "cache-benchmark"),
+        help='Directory for result files (default: <RESULTS_DIR>/cache-benchmark)'
+    )
+    args = parser.parse_args()
+
+    query_endpoint, health_endpoint = api_endpoints(args.api_base)
+    queries_path = Path(args.test_suite)
+
+    print("🚀 Starting Cache Effectiveness Benchmark")
+    print("="*80)
+    print(f"   Test Suite: {queries_path.name}")
+    print(f"   API Endpoint: {query_endpoint}")
+    print(f"   Concurrency: {args.concurrency}")
+    print("="*80)
+    print("")
+
+    if not check_api_health(health_endpoint):
+        print("\n❌ API is not healthy. Exiting.")
+        sys.exit(1)
+
+    if not queries_path.exists():
+        print(f"❌ Test suite not found: {queries_path}")
+        return
+
+    queries = load_queries(queries_path)
+    zipf_requests = args.zipf_requests or 4 * len(queries)
+    exponent = args.zipf_exponent
+    if args.target_repeat_rate is not None:
+        if expected_repeat_rate(len(queries), zipf_requests, 0.0) > args.target_repeat_rate:
+            print(f"⚠️  {zipf_requests} uniform draws from {len(queries)} queries already repeat more than "
+                  f"{args.target_repeat_rate * 100:.0f}%; use fewer --zipf-requests to reach the target")
+        exponent = fit_zipf_exponent(args.target_repeat_rate, len(queries), zipf_requests)
+        print(f"📐 Zipf exponent {exponent:.3f} "
+              f"(expected repeat rate {expected_repeat_rate(len(queries), zipf_requests, exponent) * 100:.1f}%)")
+
+    suite_order = list(enumerate(queries, 1))
+    zipf_order = zipf_workload(queries, zipf_requests, exponent, args.seed)
+    workloads = {'cold': suite_order, 'warm': suite_order, 'zipf': zipf_order}
+
+    all_results: List[Dict[str, Any]] = []
+    phases: Dict[str, Dict[str, Any]] = {}
+    phase_metrics: Dict[str, Dict[str, Any]] = {}
+    for phase in PHASES:
+        if args.flush_command and phase in ('cold', 'zipf'):
+            print(f"🧹 Flushing cache: {args.flush_command}")
+            subprocess.run(args.flush_command, shell=True, check=True)
+        print(f"\n🧪 {phase.capitalize()} phase: {len(workloads[phase])} requests with the cache enabled...")
+        results, duration = run_phase(phase, workloads[phase], args.concurrency, args.timeout, query_endpoint)
+        metrics = calculate_metrics(results, use_cache=True)
+        if 'error' in metrics:
+            print(f"❌ {phase.capitalize()} phase had no successful queries. Exiting.")
+            sys.exit(1)
+        phase_metrics[phase] = metrics
+        phases[phase] = {
+            "requests": len(results),
+            "duration_seconds": duration,
+            "throughput_qps": len(results) / duration if duration > 0 else 0.0,
+            "latency": metrics['latency'],
+            "cache_performance": metrics['cache_performance']
+        }
+        all_results.extend(results)
+
+    print("\n📊 Calculating metrics...")
+    metrics = calculate_metrics(all_results, use_cache=True)
+    metrics['cache_benchmark'] = {
+        "phases": phases,
+        "zipf": {
+            "exponent": exponent,
+            "requests": zipf_requests,
+            "distinct_queries": len({i for i, _ in zipf_order}),
+            "repeat_rate": 1 - len({i for i, _ in zipf_order}) / zipf_requests,
+            "seed": args.seed
+        },
+        "cold_vs_warm": tier_speedups(phase_metrics['cold'], phase_metrics['warm']),
+        "duplicate_queries": len(queries) - len({q['query'] for q in queries})
+    }
+
+    test_run = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "cache_benchmark",
+        "total_queries": len(all_results),
+        "test_suite": str(queries_path),
+        "api_endpoint": query_endpoint,
+        "concurrency": args.concurrency,
+        "cache_enabled": True,
+        "cache_flushed": bool(args.flush_command)
+    }
+    summary = format_summary(metrics) + "\n\n" + format_cache_report(metrics['cache_benchmark'])
+    confusion_text = format_confusion_matrix(metrics['confusion_matrix'])
+    save_reports(Path(args.output_dir), test_run, all_results, metrics, summary, confusion_text)
+    print("")
+
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Offline Intent Classifier Benchmark
+
+Runs a test suite straight through an intent classifier in-process, with no
+HTTP, JSON encoding or database fan-out in the measurement. Reports
+classification throughput and per-call latency for one or more batch sizes,
+alongside the usual accuracy summary and confusion matrix, so a slow router
+can be told apart from everything around it.
+
+The classifier is given as an import path:
+
+    package.module:callable          classify(query) -> intent or {"intent": ...}
+    package.module:ClassName         instantiated with --init-kwargs, then as below
+    path/to/file.py:object           an object with classify(query) and, optionally,
+                                     classify_batch(queries) -> list of results
+    stub                             built-in keyword classifier (no dependencies)
+
+Batch sizes above 1 call classify_batch() when the classifier has one;
+otherwise the batch is classified query by query and reported as emulated.
+
+Usage:
+    python3 classifier_benchmark.py --classifier stub
+    python3 classifier_benchmark.py --classifier apex_memory.query_router.semantic_classifier:SemanticClassifier \\
+        --init-kwargs '{"threshold": 0.3}' --batch-sizes 1,8,32 --repeat 3
+
+Arguments:
+    --test-suite PATH     Path to test suite JSON file
+    --classifier SPEC     Import path of the classifier, or "stub"
+    --init-kwargs JSON    Keyword arguments when SPEC names a class (default: {})
+    --batch-sizes LIST    Comma-separated batch sizes to compare (default: 1)
+    --repeat N            Passes over the suite per batch size (default: 1)
+    --warmup N            Untimed calls before measuring (default: 10)
+    --output-dir PATH     Where to write results (default: <RESULTS_DIR>/classifier-benchmark)
+
+Outputs:
+    - stratified_results.json: Per-query results for the first batch size, plus throughput per batch size
+    - stratified_summary.txt: Standard summary plus the throughput table
+    - confusion_matrix.txt: Intent prediction confusion analysis
+"""
+
+import argparse
+import importlib
+import importlib.util
+import inspect
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from difficulty_stratified_test import (
+    RESULTS_DIR,
+    build_exception_result,
+    build_success_result,
+    calculate_metrics,
+    format_confusion_matrix,
+    format_summary,
+    load_queries,
+    save_reports,
+)
+from latency_histogram import LatencyHistogram
+
+
+class KeywordStubClassifier:
+    """Keyword-count classifier used as a local stand-in and a floor to compare against.
+
+    Each intent scores one point per matching phrase; ties and zero scores fall
+    back to semantic, the router's default route.
+    """
+
+    KEYWORDS = {
+        'graph': [
+            'connected', 'connection', 'relationship', 'depend', 'network', 'linked', 'between',
+            'assigned to', 'reports to', 'upstream', 'downstream', 'path', 'hierarchy', 'related to'
+        ],
+        'temporal': [
+            'over time', 'history', 'historical', 'trend', 'evolved', 'changed', 'last week',
+            'last month', 'last year', 'since', 'timeline', 'yesterday', 'recent', 'when did'
+        ],
+        'metadata': [
+            'filter', 'status', 'tagged', 'created by', 'owned by', 'type', 'count', 'list all',
+            'attribute', 'field', 'category', 'where', 'with property'
+        ],
+        'semantic': [
+            'similar', 'about', 'like', 'meaning', 'discuss', 'explain', 'concept', 'topic'
+        ]
+    }
+
+    def __init__(self):
+        self._patterns = {
+            intent: [re.compile(r'\b' + re.escape(phrase)) for phrase in phrases]
+            for intent, phrases in self.KEYWORDS.items()
+        }
+
+    def classify(self, query: str) -> str:
+        text = query.lower()
+        scores = {intent: sum(1 for p in patterns if p.search(text)) for intent, patterns in self._patterns.items()}
+        best = max(scores.values())
+        leaders = [intent for intent, score in scores.items() if score == best]
+        return leaders[0] if best > 0 and len(leaders) == 1 else 'semantic'
+
+    def classify_batch(self, queries: List[str]) -> List[str]:
+        return [self.classify(q) for q in queries]
+
+
+def load_classifier(spec: str, init_kwargs: Dict[str, Any]) -> Any:
+    """Resolve a classifier spec ("stub", "module:attr" or "file.py:attr")."""
+    if spec == 'stub':
+        return KeywordStubClassifier()
+
+    target, _, attribute = spec.partition(':')
+    if not attribute:
+        raise ValueError(f"Classifier spec must look like module:attribute, got {spec!r}")
+
+    if target.endswith('.py'):
+        module_spec = importlib.util.spec_from_file_location(Path(target).stem, target)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        sys.path.insert(0, str(Path.cwd()))
+        module = importlib.import_module(target)
+
+    obj = module
+    for part in attribute.split('.'):
+        obj = getattr(obj, part)
+
+    return obj(**init_kwargs) if inspect.isclass(obj) else obj
+
+
+def classifier_functions(classifier: Any) -> Tuple[Callable[[str], Any], Optional[Callable[[List[str]], List[Any]]]]:
+    """Return (single, batch) call functions; batch is None when not natively supported."""
+    single = classifier.classify if hasattr(classifier, 'classify') else classifier
+    batch = getattr(classifier, 'classify_batch', None)
+    if not callable(single):
+        raise TypeError("Classifier must be callable or provide classify(query)")
+    return single, batch
+
+
+def as_response(prediction: Any) -> Dict[str, Any]:
+    """Normalize a classifier return value to the API's response shape."""
+    if isinstance(prediction, dict):
+        return prediction
+    return {"intent": getattr(prediction, 'intent', prediction)}
+
+
+def benchmark_batch_size(single: Callable, batch: Optional[Callable], queries: List[Dict[str, Any]],
+                         batch_size: int, repeat: int) -> Dict[str, Any]:
+    """Classify the suite `repeat` times in batches and time every call.
+
+    Per-query latency for a batched call is the batch's latency divided by its
+    size, i.e. the amortized cost of one classification.
+    """
+    per_query = LatencyHistogram()
+    per_call = LatencyHistogram()
+    results: List[Dict[str, Any]] = []
+    classified = 0
+    busy_seconds = 0.0
+
+    for _ in range(repeat):
+        pass_results = []
+        for offset in range(0, len(queries), batch_size):
+            chunk = queries[offset:offset + batch_size]
+            texts = [q['query'] for q in chunk]
+            start = time.perf_counter()
+            try:
+                if batch_size == 1:
+                    predictions = [single(texts[0])]
+                elif batch:
+                    predictions = list(batch(texts))
+                else:
+                    predictions = [single(text) for text in texts]
+                if len(predictions) != len(chunk):
+                    # Without one prediction per input there is no telling which query each belongs to
+                    raise ValueError(f"classifier returned {len(predictions)} predictions for {len(chunk)} queries")
+                error = None
+            except Exception as e:
+                predictions, error = None, e
+            elapsed = time.perf_counter() - start
+
+            busy_seconds += elapsed
+            per_call.record(elapsed)
+            amortized = elapsed / len(chunk)
+            for i, query_data in enumerate(chunk):
+                per_query.record(amortized)
+                index = offset + i + 1
+                if error is not None:
+                    pass_results.append(build_exception_result(query_data, index, error, amortized))
+                else:
+                    pass_results.append(build_success_result(query_data, index, as_response(predictions[i]), amortized))
+            classified += len(chunk)
+
+        results = pass_results
+
+    correct = len([r for r in results if r.get('intent_correct')])
+    return {
+        "batch_size": batch_size,
+        "native_batching": batch_size == 1 or batch is not None,
+        "queries_classified": classified,
+        "busy_seconds": busy_seconds,
+        "queries_per_second": classified / busy_seconds if busy_seconds > 0 else 0.0,
+        "per_query_latency": per_query.summary(),
+        "per_call_latency": per_call.summary(),
+        "accuracy": (correct / len(results)) * 100 if results else 0.0,
+        "results": results
+    }
+
+
+def format_throughput_report(runs: List[Dict[str, Any]]) -> str:
+    """Format classification throughput per batch size."""
+    lines = []
+    lines.append("="*80)
+    lines.append("CLASSIFIER THROUGHPUT (in-process, no HTTP)")
+    lines.append("="*80)
+    lines.append("")
+    lines.append(" Batch |   Queries/s | P50/query (ms) | P99/query (ms) | P99/call (ms) | Accuracy |")
+    lines.append("-" * 83)
+    for run in runs:
+        note = "" if run['native_batching'] else " (emulated)"
+        lines.append(
+            f" {run['batch_size']:5d} | {run['queries_per_second']:11.1f} |"
+            f" {run['per_query_latency']['p50_seconds'] * 1000:14.3f} |"
+            f" {run['per_query_latency']['p99_seconds'] * 1000:14.3f} |"
+            f" {run['per_call_latency']['p99_seconds'] * 1000:13.3f} | {run['accuracy']:7.1f}% |{note}"
+        )
+    lines.append("="*80)
+    return "\n".join(lines)
+
+
+def main():
+    """Offline classifier benchmark execution."""
+    parser = argparse.ArgumentParser(description='Benchmark an intent classifier in-process, bypassing HTTP')
+    parser.add_argument(
+        '--test-suite',
+        type=str,
+        default='/Users/richardglaubitz/Projects/Apex-Memory-System-Development/tests/test-suites/difficulty-stratified-balanced-250.json',
+        help='Path to test suite JSON file (default: difficulty-stratified-balanced-250.json)'
+    )
+    parser.add_argument('--classifier', type=str, required=True, help='module:attribute, file.py:attribute or "stub"')
+    parser.add_argument('--init-kwargs', type=str, default='{}', help='JSON keyword arguments for a classifier class')
+    parser.add_argument('--batch-sizes', type=str, default='1', help='Comma-separated batch sizes (default: 1)')
+    parser.add_argument('--repeat', type=int, default=1, help='Passes over the suite per batch size (default: 1)')
+    parser.add_argument('--warmup', type=int, default=10, help='Untimed calls before measuring (default: 10)')
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(RESULTS_DIR / "classifier-benchmark"),
+        help='Directory for result files (default: <RESULTS_DIR>/classifier-benchmark)'
+    )
+    args = parser.parse_args()
+
+    try:
+        batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    except ValueError:
+        parser.error(f"--batch-sizes: expected comma-separated integers, got {args.batch_sizes!r}")
+    if any(size < 1 for size in batch_sizes):
+        parser.error('--batch-sizes must all be at least 1')
+    if args.repeat < 1:
+        parser.error('--repeat must be at least 1')
+
+    queries_path = Path(args.test_suite)
+
+    print("🚀 Starting Offline Classifier Benchmark")
+    print("="*80)
+    print(f"   Test Suite: {queries_path.name}")
+    print(f"   Classifier: {args.classifier}")
+    print(f"   Batch Sizes: {', '.join(str(size) for size in batch_sizes)} (x{args.repeat} passes)")
+    print("="*80)
+    print("")
+
+    if not queries_path.exists():
+        print(f"❌ Test suite not found: {queries_path}")
+        return
+
+    queries = load_queries(queries_path)
+    classifier = load_classifier(args.classifier, json.loads(args.init_kwargs))
+    single, batch = classifier_functions(classifier)
+    print(f"✅ Loaded {len(queries)} test queries and classifier {type(classifier).__name__}")
+
+    for query_data in queries[:args.warmup]:
+        single(query_data['query'])
+
+    runs = []
+    for batch_size in batch_sizes:
+        run = benchmark_batch_size(single, batch, queries, batch_size, args.repeat)
+        print(f"   Batch {batch_size:4d}: {run['queries_per_second']:.1f} queries/s, "
+              f"P99 {run['per_query_latency']['p99_seconds'] * 1000:.3f}ms/query")
+        runs.append(run)
+
+    print("\n📊 Calculating metrics...")
+    results = runs[0]['results']
+    metrics = calculate_metrics(results)
+    metrics['classifier_throughput'] = [{k: v for k, v in run.items() if k != 'results'} for run in runs]
+
+    test_run = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "classifier_benchmark",
+        "total_queries": len(queries),
+        "test_suite": str(queries_path),
+        "classifier": args.classifier,
+        "batch_sizes": batch_sizes,
+        "repeat": args.repeat
+    }
+    summary = format_summary(metrics) + "\n\n" + format_throughput_report(runs)
+    confusion_text = format_confusion_matrix(metrics['confusion_matrix'])
+    save_reports(Path(args.output_dir), test_run, results, metrics, summary, confusion_text)
+    print("")
+
+    print(summary)
+    print(confusion_text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Run Comparison and Performance Regression Gate
+
+Compares one or more candidate runs against a baseline run and exits
+non-zero when the candidate regresses, so a CI job can fail on it instead of
+someone diffing stratified_summary.txt files by eye.
+
+For the whole run and for every difficulty tier, expected intent and
+database, it reports:
+
+    - latency P50/P90/P99 deltas with bootstrap confidence intervals
+    - a Mann-Whitney U test for a shift in the whole latency distribution
+    - accuracy deltas with bootstrap confidence intervals
+
+A change is significant when its confidence interval excludes zero. Slice
+level changes are reported only. The gate fails a candidate when it misses a
+success criterion (README table, --criteria-level target or critical; the
+README defines no critical P50/P99 threshold, so those are only checked at
+target level) or when it regresses against the baseline. Criteria misses and
+regressions are reported separately. A regression means:
+
+    - an overall latency percentile is significantly higher by more than --max-latency-regression
+    - throughput (test_run.throughput_qps, when both runs have it) drops by more than
+      --max-throughput-regression
+
+Usage:
+    python3 compare_runs.py results/stratified/2025-10-08-stratified-results.json NEW/stratified_results.json
+    python3 compare_runs.py BASELINE CAND1 CAND2 --criteria-level critical --output comparison.json
+
+Arguments:
+    BASELINE                       Baseline stratified_results.json (.jsonl result log, or STORE.rstore#RUN)
+    CANDIDATE ...                  One or more runs to compare against it
+    --criteria-level LEVEL         Success criteria column to enforce: target, critical or none (default: target)
+    --thresholds PATH              JSON file overriding criteria by name, e.g. {"P90 Latency": 1.5}
+    --max-latency-regression FRAC  Allowed significant increase in overall P50/P90/P99 (default: 0.10)
+    --max-throughput-regression FRAC
+                                   Allowed drop in throughput (default: 0.10)
+    --confidence LEVEL             Confidence level of the intervals (default: 0.95)
+    --bootstrap N                  Bootstrap resamples (default: 2000)
+    --seed N                       Bootstrap seed (default: 42)
+    --output PATH                  Also write the comparison as JSON
+
+Exit status: 0 when every candidate passes, 1 when any regresses or misses a success criterion.
+"""
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics_aggregator import DIFFICULTIES, INTENTS, ResultColumns, aggregate_metrics, latency_summary
+from result_log import iter_results
+from result_store import load_store_run
+
+PERCENTILES = [50, 90, 99]
+
+# Success criteria from the testing-framework README: (name, metric, comparison, target, critical).
+# Latency targets also include the P50/P99 targets listed under "Latency Metrics"; the README gives
+# those no critical threshold, so critical is None (not checked unless set with --thresholds).
+SUCCESS_CRITERIA = [
+    ("Overall Accuracy", ("overall", "overall_accuracy"), ">=", 90, 80),
+    ("Easy Tier", ("by_difficulty", "easy", "accuracy"), ">=", 95, 90),
+    ("Medium Tier", ("by_difficulty", "medium", "accuracy"), ">=", 85, 75),
+    ("Hard Tier", ("by_difficulty", "hard", "accuracy"), ">=", 70, 60),
+    ("Graph Intent", ("intent_overall", "graph", "accuracy"), ">=", 90, 80),
+    ("Temporal Intent", ("intent_overall", "temporal", "accuracy"), ">=", 90, 85),
+    ("Semantic Intent", ("intent_overall", "semantic", "accuracy"), ">=", 90, 85),
+    ("Metadata Intent", ("intent_overall", "metadata", "accuracy"), ">=", 85, 75),
+    ("P50 Latency", ("latency", "p50_seconds"), "<", 0.5, None),
+    ("P90 Latency", ("latency", "p90_seconds"), "<", 1.0, 2.0),
+    ("P99 Latency", ("latency", "p99_seconds"), "<", 2.0, None)
+]
+
+
+def load_run(path: Path) -> Tuple[Dict[str, Any], ResultColumns]:
+    """Load a run's test_run block and its results as columns."""
+    path = Path(path)
+    if path.suffix == '.jsonl':
+        return {}, ResultColumns.from_results(iter_results(path))
+    if path.suffix == '.rstore' or '.rstore#' in path.name:
+        store, run = load_store_run(str(path))
+        return store.run(run)["document"].get('test_run', {}), ResultColumns.from_results(store.results(run))
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return data.get('test_run', {}), ResultColumns.from_results(data['results'])
+
+
+def slice_masks(columns: ResultColumns) -> Dict[Tuple[str, str], np.ndarray]:
+    """Boolean row masks over successful rows for the whole run and every tier, intent and database."""
+    success = columns.status == 0
+    masks = {("overall", "all"): success}
+    for d, tier in enumerate(DIFFICULTIES):
+        masks[("difficulty", tier)] = success & (columns.difficulty == d)
+    for i, intent in enumerate(INTENTS):
+        masks[("intent", intent)] = success & (columns.expected == i)
+    for c, db in enumerate(columns.databases.values):
+        used = np.zeros(len(columns), dtype=bool)
+        used[columns.db_rows[columns.db_codes == c]] = True
+        masks[("database", db)] = success & used
+    return masks
+
+
+def _bootstrap_quantiles(values: np.ndarray, quantiles: np.ndarray, n_boot: int,
+                         rng: np.random.Generator) -> np.ndarray:
+    """(n_boot, len(quantiles)) array of quantiles of bootstrap resamples, in bounded-memory chunks."""
+    out = np.empty((n_boot, len(quantiles)))
+    chunk = max(1, 4_000_000 // max(len(values), 1))
+    for start in range(0, n_boot, chunk):
+        stop = min(start + chunk, n_boot)
+        idx = rng.integers(0, len(values), size=(stop - start, len(values)))
+        out[start:stop] = np.quantile(values[idx], quantiles, axis=1, method='weibull').T
+    return out
+
+
+def bootstrap_percentile_deltas(baseline: np.ndarray, candidate: np.ndarray, n_boot: int,
+                                confidence: float, rng: np.random.Generator) -> Dict[str, Dict[str, float]]:
+    """Candidate minus baseline for each of PERCENTILES, with a percentile bootstrap interval.
+
+    Point estimates come from latency_summary(), so they are the P50/P90/P99
+    printed in each run's summary; resamples use the same 'weibull'
+    (statistics.quantiles() exclusive) definition.
+    """
+    quantiles = np.array(PERCENTILES) / 100
+    base_summary, cand_summary = latency_summary(baseline), latency_summary(candidate)
+    base_point = [base_summary[f"p{p}_seconds"] for p in PERCENTILES]
+    cand_point = [cand_summary[f"p{p}_seconds"] for p in PERCENTILES]
+    deltas = _bootstrap_quantiles(candidate, quantiles, n_boot, rng) - _bootstrap_quantiles(baseline, quantiles, n_boot, rng)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(deltas, [alpha, 1 - alpha], axis=0)
+
+    comparison = {}
+    for k, p in enumerate(PERCENTILES):
+        comparison[f"p{p}"] = {
+            "baseline_seconds": float(base_point[k]),
+            "candidate_seconds": float(cand_point[k]),
+            "delta_seconds": float(cand_point[k] - base_point[k]),
+            "relative_change": float((cand_point[k] - base_point[k]) / base_point[k]) if base_point[k] > 0 else None,
+            "ci_low": float(low[k]),
+            "ci_high": float(high[k]),
+            "significant": bool(low[k] > 0 or high[k] < 0)
+        }
+    return comparison
+
+
+def mann_whitney(baseline: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Two-sided Mann-Whitney U test (normal approximation with tie correction).
+
+    prob_candidate_slower is U / (n1 * n2): the chance a random candidate
+    latency exceeds a random baseline latency (0.5 means no shift).
+    """
+    n1, n2 = len(candidate), len(baseline)
+    combined = np.concatenate([candidate, baseline])
+    _, inverse, counts = np.unique(combined, return_inverse=True, return_counts=True)
+    # Average rank of each distinct value, then look up each observation's rank
+    ends = np.cumsum(counts)
+    ranks = (ends - (counts - 1) / 2)[inverse]
+
+    u = float(ranks[:n1].sum() - n1 * (n1 + 1) / 2)
+    n = n1 + n2
+    tie_term = float((counts ** 3 - counts).sum()) / (n * (n - 1)) if n > 1 else 0.0
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term)) if n > 1 else 0.0
+    z = (u - n1 * n2 / 2) / sigma if sigma > 0 else 0.0
+    return {
+        "u": u,
+        "z": z,
+        "p_value": math.erfc(abs(z) / math.sqrt(2)),
+        "prob_candidate_slower": u / (n1 * n2)
+    }
+
+
+def bootstrap_accuracy_delta(base_correct: int, base_total: int, cand_correct: int, cand_total: int,
+                             n_boot: int, confidence: float, rng: np.random.Generator) -> Dict[str, Any]:
+    """Candidate minus baseline accuracy (percentage points) with a bootstrap interval.
+
+    Resampling n Bernoulli outcomes and counting successes is a binomial
+    draw, so the bootstrap needs no per-query arrays.
+    """
+    base_p = base_correct / base_total
+    cand_p = cand_correct / cand_total
+    deltas = (rng.binomial(cand_total, cand_p, n_boot) / cand_total - rng.binomial(base_total, base_p, n_boot) / base_total) * 100
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(deltas, [alpha, 1 - alpha])
+    return {
+        "baseline_accuracy": base_p * 100,
+        "candidate_accuracy": cand_p * 100,
+        "delta_points": (cand_p - base_p) * 100,
+        "ci_low": float(low),
+        "ci_high": float(high),
+        "significant": bool(low > 0 or high < 0)
+    }
+
+
+def compare_slices(baseline: ResultColumns, candidate: ResultColumns, n_boot: int, confidence: float,
+                   rng: np.random.Generator) -> Dict[str, Dict[str, Any]]:
+    """Latency and accuracy comparison for every slice present in both runs."""
+    base_masks = slice_masks(baseline)
+    cand_masks = slice_masks(candidate)
+
+    slices = {}
+    for key, base_mask in base_masks.items():
+        cand_mask = cand_masks.get(key)
+        if cand_mask is None or base_mask.sum() < 2 or cand_mask.sum() < 2:
+            continue
+        base_latency = baseline.latency[base_mask]
+        cand_latency = candidate.latency[cand_mask]
+        slices[f"{key[0]}:{key[1]}"] = {
+            "dimension": key[0],
+            "value": key[1],
+            "baseline_count": int(base_mask.sum()),
+            "candidate_count": int(cand_mask.sum()),
+            "latency": bootstrap_percentile_deltas(base_latency, cand_latency, n_boot, confidence, rng),
+            "mann_whitney": mann_whitney(base_latency, cand_latency),
+            "accuracy": bootstrap_accuracy_delta(
+                int(baseline.correct[base_mask].sum()), int(base_mask.sum()),
+                int(candidate.correct[cand_mask].sum()), int(cand_mask.sum()),
+                n_boot, confidence, rng
+            )
+        }
+    return slices
+
+
+def _lookup(metrics: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    value: Any = metrics
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def check_criteria(metrics: Dict[str, Any], level: str, overrides: Dict[str, float]) -> List[Dict[str, Any]]:
+    """Evaluate the README success criteria against one run's metrics.
+
+    passed is None when the metric was not measured or the level defines no threshold for it.
+    """
+    checks = []
+    for name, path, op, target, critical in SUCCESS_CRITERIA:
+        threshold = overrides.get(name, target if level == 'target' else critical)
+        actual = _lookup(metrics, path)
+        if actual is None or threshold is None:
+            passed = None
+        else:
+            passed = actual >= threshold if op == '>=' else actual < threshold
+        checks.append({"criterion": name, "op": op, "threshold": threshold, "actual": actual, "passed": passed})
+    return checks
+
+
+def criteria_failures(criteria: List[Dict[str, Any]]) -> List[str]:
+    """Success criteria the candidate misses, whatever the baseline did."""
+    return [f"{check['criterion']} {check['actual']:.3f} misses {check['op']} {check['threshold']}"
+            for check in criteria if check['passed'] is False]
+
+
+def find_regressions(overall: Dict[str, Any], base_run: Dict[str, Any], cand_run: Dict[str, Any],
+                     max_latency_regression: float, max_throughput_regression: float) -> List[str]:
+    """Ways the candidate is significantly worse than the baseline (empty when it is not)."""
+    reasons = []
+
+    for name, data in overall['latency'].items():
+        relative = data['relative_change']
+        if data['significant'] and data['delta_seconds'] > 0 and relative is not None and relative > max_latency_regression:
+            reasons.append(f"{name.upper()} latency up {relative * 100:.1f}% "
+                           f"(CI +{data['ci_low'] * 1000:.1f}..+{data['ci_high'] * 1000:.1f}ms)")
+
+    base_qps = base_run.get('throughput_qps')
+    cand_qps = cand_run.get('throughput_qps')
+    if base_qps and cand_qps is not None and (base_qps - cand_qps) / base_qps > max_throughput_regression:
+        reasons.append(f"Throughput down {(base_qps - cand_qps) / base_qps * 100:.1f}% "
+                       f"({base_qps:.1f} → {cand_qps:.1f} qps)")
+
+    return reasons
+
+
+def format_comparison(baseline_path: str, comparison: Dict[str, Any]) -> str:
+    """Format one baseline-vs-candidate comparison for display."""
+    lines = []
+    lines.append("="*80)
+    lines.append("RUN COMPARISON")
+    lines.append(f"Baseline:  {baseline_path}")
+    lines.append(f"Candidate: {comparison['candidate']}")
+    lines.append(f"Confidence: {comparison['confidence'] * 100:.0f}% ({comparison['bootstrap']} bootstrap resamples)")
+    lines.append("="*80)
+    lines.append("")
+
+    lines.append("⚡ Latency (candidate - baseline; * = significant)")
+    lines.append(f"   {'Slice':24s} {'P50 Δ (ms)':23s}{'P90 Δ (ms)':23s}{'P99 Δ (ms)':23s}MWU p")
+    for name, data in comparison['slices'].items():
+        cells = []
+        for p in PERCENTILES:
+            d = data['latency'][f"p{p}"]
+            mark = "*" if d['significant'] else " "
+            cells.append(f"{d['delta_seconds'] * 1000:+8.1f}{mark} [{d['ci_low'] * 1000:+.0f},{d['ci_high'] * 1000:+.0f}]")
+        lines.append(f"   {name:24s} " + " ".join(f"{c:22s}" for c in cells) + f" {data['mann_whitney']['p_value']:.3f}")
+    lines.append("")
+
+    lines.append("🎯 Accuracy (percentage points; * = significant)")
+    for name, data in comparison['slices'].items():
+        acc = data['accuracy']
+        mark = "*" if acc['significant'] else " "
+        lines.append(f"   {name:24s} {acc['baseline_accuracy']:5.1f}% → {acc['candidate_accuracy']:5.1f}% "
+                     f"({acc['delta_points']:+5.1f}{mark} [{acc['ci_low']:+.1f}, {acc['ci_high']:+.1f}])")
+    lines.append("")
+
+    if comparison['criteria']:
+        lines.append(f"📏 Success Criteria ({comparison['criteria_level']})")
+    for check in comparison['criteria']:
+        if check['threshold'] is None:
+            lines.append(f"   {check['criterion']:18s}: ➖ no {comparison['criteria_level']} threshold defined")
+            continue
+        if check['passed'] is None:
+            lines.append(f"   {check['criterion']:18s}: ➖ not measured")
+            continue
+        lines.append(f"   {check['criterion']:18s}: {'✅' if check['passed'] else '❌'} "
+                     f"{check['actual']:.3f} ({check['op']} {check['threshold']})")
+    if comparison['criteria']:
+        lines.append("")
+
+    if comparison['regressions']:
+        lines.append("❌ REGRESSION vs baseline")
+        for reason in comparison['regressions']:
+            lines.append(f"   - {reason}")
+    else:
+        lines.append("✅ No regression vs baseline")
+    if comparison['criteria_failures']:
+        lines.append("❌ MISSES SUCCESS CRITERIA")
+        for reason in comparison['criteria_failures']:
+            lines.append(f"   - {reason}")
+    elif comparison['criteria']:
+        lines.append(f"✅ Meets the {comparison['criteria_level']} success criteria")
+    lines.append("="*80)
+    return "\n".join(lines)
+
+
+def main():
+    """Compare runs and gate on regressions."""
+    parser = argparse.ArgumentParser(description='Compare stratified runs against a baseline and gate on regressions')
+    parser.add_argument('baseline', type=str, help='Baseline stratified_results.json')
+    parser.add_argument('candidates', type=str, nargs='+', help='Candidate run(s) to compare')
+    parser.add_argument('--criteria-level', choices=['target', 'critical', 'none'], default='target',
+                        help='Success criteria column to enforce, or none (default: target)')
+    parser.add_argument('--thresholds', type=str, help='JSON file overriding criteria thresholds by name')
+    parser.add_argument('--max-latency-regression', type=float, default=0.10,
+                        help='Allowed significant increase in overall P50/P90/P99 (default: 0.10)')
+    parser.add_argument('--max-throughput-regression', type=float, default=0.10,
+                        help='Allowed drop in throughput_qps (default: 0.10)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level (default: 0.95)')
+    parser.add_argument('--bootstrap', type=int, default=2000, help='Bootstrap resamples (default: 2000)')
+    parser.add_argument('--seed', type=int, default=42, help='Bootstrap seed (default: 42)')
+    parser.add_argument('--output', type=str, help='Write the comparison as JSON to this path')
+    args = parser.parse_args()
+
+    overrides = json.loads(Path(args.thresholds).read_text()) if args.thresholds else {}
+    rng = np.random.default_rng(args.seed)
+
+    base_run, baseline = load_run(Path(args.baseline))
+    comparisons = []
+    for candidate_path in args.candidates:
+        cand_run, candidate = load_run(Path(candidate_path))
+        metrics = aggregate_metrics(candidate)
+        if 'error' in metrics:
+            print(f"❌ {candidate_path}: {metrics['error']}")
+            comparisons.append({"candidate": candidate_path, "regressions": [metrics['error']],
+                                "criteria_failures": []})
+            continue
+
+        slices = compare_slices(baseline, candidate, args.bootstrap, args.confidence, rng)
+        criteria = check_criteria(metrics, args.criteria_level, overrides) if args.criteria_level != 'none' else []
+        comparison = {
+            "candidate": candidate_path,
+            "confidence": args.confidence,
+            "bootstrap": args.bootstrap,
+            "criteria_level": args.criteria_level,
+            "slices": slices,
+            "criteria": criteria,
+            "throughput_qps": {"baseline": base_run.get('throughput_qps'), "candidate": cand_run.get('throughput_qps')},
+            "regressions": find_regressions(slices.get('overall:all', {'latency': {}}), base_run, cand_run,
+                                            args.max_latency_regression, args.max_throughput_regression),
+            "criteria_failures": criteria_failures(criteria)
+        }
+        comparisons.append(comparison)
+        print(format_comparison(args.baseline, comparison))
+        print("")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"baseline": args.baseline, "comparisons": comparisons}, indent=2))
+        print(f"✅ Comparison saved to: {args.output}")
+
+    regressed = [c['candidate'] for c in comparisons if c['regressions']]
+    missed = [c['candidate'] for c in comparisons if c['criteria_failures']]
+    if regressed or missed:
+        print(f"❌ Of {len(comparisons)} candidate(s): {len(regressed)} regressed vs baseline, "
+              f"{len(missed)} missed the success criteria")
+        sys.exit(1)
+    print(f"✅ {len(comparisons)} candidate(s) passed")
+
+
+if __name__ == "__main__":
+    main()
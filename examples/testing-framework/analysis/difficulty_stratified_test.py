@@ -7,39 +7,69 @@ and collects stratified performance metrics with confusion matrix analysis.
 
 Usage:
     python3 tests/analysis/difficulty_stratified_test.py [--test-suite PATH] [--use-hybrid]
+                                                         [--concurrency N] [--timeout SECONDS]
+                                                         [--output-dir PATH] [--resume] [--api-base URL]
+                                                         [--profile [--profile-interval MS]]
 
 Arguments:
     --test-suite PATH    Path to test suite JSON file (default: config/difficulty-stratified-queries.json)
     --use-hybrid         Enable hybrid classifier (keyword + embeddings cascade)
+    --concurrency N      Number of in-flight requests (default: 1, sequential with 0.1s pause).
+                         Values >1 use the asyncio load generator with a pooled HTTP client.
+    --timeout SECONDS    Per-request timeout (default: 30)
+    --output-dir PATH    Directory for result files (default: monitoring/stratified)
+    --resume             Continue an interrupted run, skipping query IDs already in the result log
+    --api-base URL       Base URL of the query API (default: http://localhost:8000)
+    --profile            Profile the harness itself: overhead per request, max sustainable QPS and
+                         a flamegraph-compatible stack profile (see harness_profiler.py)
+    --profile-interval MS
+                         Stack sampling interval for --profile (default: 5)
 
 Outputs:
+    - stratified_results.jsonl: Append-only log, one result per line as each query completes
     - stratified_results.json: Detailed results for each query
     - stratified_summary.txt: Human-readable summary
     - confusion_matrix.txt: Intent prediction confusion analysis
+    - harness_profile.txt / .json / .folded: Harness overhead report and folded stacks (--profile)
 """
 
 import argparse
-import json
+import asyncio
 import time
+import httpx
 import requests
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
-import statistics
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from collections import defaultdict
 
+from harness_profiler import HarnessProfiler, format_harness_profile
+from latency_histogram import LatencyHistogramSet
+from metrics_aggregator import ResultColumns, aggregate_confusion_matrix, aggregate_metrics
+from metrics_exporter import add_exporter_arguments, exporter_from_args
+from result_log import ResultLog, iter_results, write_results_json
+from server_timing import extract_server_timings, format_stage_waterfall
+from suite_loader import SuiteError, load_suite
+
 # Configuration
 API_BASE = "http://localhost:8000"
 QUERY_ENDPOINT = f"{API_BASE}/api/v1/query/"
 HEALTH_ENDPOINT = f"{API_BASE}/api/v1/query/health"
 RESULTS_DIR = Path("/Users/richardglaubitz/Projects/apex-memory-system/monitoring/stratified")
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+RESULT_LOG_NAME = "stratified_results.jsonl"
+
+
+def api_endpoints(api_base: str) -> Tuple[str, str]:
+    """Return the (query, health) endpoint URLs for an API base URL."""
+    api_base = api_base.rstrip('/')
+    return f"{api_base}/api/v1/query/", f"{api_base}/api/v1/query/health"
 
 
-def check_api_health() -> bool:
+def check_api_health(health_endpoint: str = HEALTH_ENDPOINT) -> bool:
     """Verify API is healthy before testing."""
     try:
-        response = requests.get(HEALTH_ENDPOINT, timeout=10)
+        response = requests.get(health_endpoint, timeout=10)
         if response.status_code == 200:
             health = response.json()
             print(f"✅ API Health: {health['overall']}")
@@ -54,7 +84,98 @@ def check_api_health() -> bool:
         return False
 
 
-def run_query(query_data: Dict[str, Any], query_index: int, total: int, use_hybrid: bool = False) -> Dict[str, Any]:
+def load_queries(queries_path: Path) -> List[Dict[str, Any]]:
+    """Load the validated, normalized query list from a test suite JSON file (see suite_loader.py)."""
+    return load_suite(queries_path).queries
+
+
+def build_query_payload(query_data: Dict[str, Any], use_cache: bool = False,
+                        request_fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build the request body sent to the query endpoint.
+
+    The cache is bypassed by default so latency reflects the full routing
+    path; cache_benchmark.py turns it on. `request_fields` are merged into
+    the body, e.g. per-request router options for router_sweep.py.
+    """
+    # Note: use_hybrid flag is for test reporting only.
+    # Hybrid classification must be enabled at router initialization time.
+    # To test hybrid mode, start the API with enable_hybrid_classification=True
+    # (or compare configurations with router_sweep.py)
+    payload = {
+        "query": query_data['query'],
+        "limit": 10,
+        "use_cache": use_cache
+    }
+    if request_fields:
+        payload.update(request_fields)
+    return payload
+
+
+def build_success_result(query_data: Dict[str, Any], query_index: int, result: Dict[str, Any],
+                         latency: float, server_timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Build the per-query result dict for a 200 response.
+
+    `server_timings` ({stage: seconds}, see server_timing.py) is only stored
+    when the server reported any, so results from servers without timing
+    support keep their original shape.
+    """
+    expected_intent = query_data['intent']
+    actual_intent = result.get('intent', 'unknown')
+
+    record = {
+        "query_id": query_data.get('id', f"q{query_index}"),
+        "query": query_data['query'],
+        "expected_intent": expected_intent,
+        "actual_intent": actual_intent,
+        "intent_correct": actual_intent == expected_intent,
+        "difficulty": query_data['difficulty'],
+        "difficulty_rationale": query_data.get('difficulty_rationale', ''),
+        "databases_used": result.get('databases_used', []),
+        "result_count": result.get('result_count', 0),
+        "cached": result.get('cached', False),
+        "latency_seconds": latency,
+        "status": "success",
+        "timestamp": datetime.now().isoformat()
+    }
+    if server_timings:
+        record["server_timings"] = server_timings
+
+    return record
+
+
+def build_error_result(query_data: Dict[str, Any], query_index: int, status_code: int,
+                       error_message: str, latency: float) -> Dict[str, Any]:
+    """Build the per-query result dict for a non-200 response."""
+    return {
+        "query_id": query_data.get('id', f"q{query_index}"),
+        "query": query_data['query'],
+        "expected_intent": query_data['intent'],
+        "difficulty": query_data['difficulty'],
+        "status": "error",
+        "error_code": status_code,
+        "error_message": error_message,
+        "latency_seconds": latency,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def build_exception_result(query_data: Dict[str, Any], query_index: int, error: Exception,
+                           latency: float) -> Dict[str, Any]:
+    """Build the per-query result dict for a request that raised (timeout, connection error)."""
+    return {
+        "query_id": query_data.get('id', f"q{query_index}"),
+        "query": query_data['query'],
+        "expected_intent": query_data['intent'],
+        "difficulty": query_data['difficulty'],
+        "status": "exception",
+        "error_message": str(error) or type(error).__name__,
+        "latency_seconds": latency,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def run_query(query_data: Dict[str, Any], query_index: int, total: int, use_hybrid: bool = False,
+              timeout: float = 30, endpoint: str = QUERY_ENDPOINT) -> Dict[str, Any]:
     """Execute a single query and collect metrics."""
     query_text = query_data['query']
     expected_intent = query_data['intent']
@@ -65,222 +186,114 @@ def run_query(query_data: Dict[str, Any], query_index: int, total: int, use_hybr
     start_time = time.time()
 
     try:
-        # Note: use_hybrid flag is for test reporting only.
-        # Hybrid classification must be enabled at router initialization time.
-        # To test hybrid mode, start the API with enable_hybrid_classification=True
-        payload = {
-            "query": query_text,
-            "limit": 10,
-            "use_cache": False
-        }
-
         response = requests.post(
-            QUERY_ENDPOINT,
-            json=payload,
-            timeout=30
+            endpoint,
+            json=build_query_payload(query_data),
+            timeout=timeout
         )
 
         end_time = time.time()
         latency = end_time - start_time
 
         if response.status_code == 200:
-            result = response.json()
-
-            actual_intent = result.get('intent', 'unknown')
-            correct = (actual_intent == expected_intent)
+            body = response.json()
+            result = build_success_result(query_data, query_index, body, latency,
+                                          extract_server_timings(response.headers, body, latency))
+            correct = result['intent_correct']
+            actual_intent = result['actual_intent']
 
             print(f"   {'✅' if correct else '❌'} Latency: {latency:.3f}s | Intent: {actual_intent} (expected: {expected_intent}) {'✓' if correct else '✗'}")
 
-            return {
-                "query_id": query_data.get('id', f"q{query_index}"),
-                "query": query_text,
-                "expected_intent": expected_intent,
-                "actual_intent": actual_intent,
-                "intent_correct": correct,
-                "difficulty": difficulty,
-                "difficulty_rationale": query_data.get('difficulty_rationale', ''),
-                "databases_used": result.get('databases_used', []),
-                "result_count": result.get('result_count', 0),
-                "cached": result.get('cached', False),
-                "latency_seconds": latency,
-                "status": "success",
-                "timestamp": datetime.now().isoformat()
-            }
+            return result
         else:
             print(f"   ❌ Error: {response.status_code}")
-            return {
-                "query_id": query_data.get('id', f"q{query_index}"),
-                "query": query_text,
-                "expected_intent": expected_intent,
-                "difficulty": difficulty,
-                "status": "error",
-                "error_code": response.status_code,
-                "error_message": response.text,
-                "latency_seconds": time.time() - start_time,
-                "timestamp": datetime.now().isoformat()
-            }
+            return build_error_result(query_data, query_index, response.status_code, response.text,
+                                      time.time() - start_time)
 
     except Exception as e:
         print(f"   ❌ Exception: {str(e)}")
-        return {
-            "query_id": query_data.get('id', f"q{query_index}"),
-            "query": query_text,
-            "expected_intent": expected_intent,
-            "difficulty": difficulty,
-            "status": "exception",
-            "error_message": str(e),
-            "latency_seconds": time.time() - start_time,
-            "timestamp": datetime.now().isoformat()
-        }
-
-
-def calculate_confusion_matrix(results: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Calculate intent classification confusion matrix."""
-    intents = ['graph', 'temporal', 'semantic', 'metadata']
-    confusion = {intent: {other: 0 for other in intents + ['unknown']} for intent in intents}
+        return build_exception_result(query_data, query_index, e, time.time() - start_time)
 
-    successful = [r for r in results if r['status'] == 'success']
 
-    for r in successful:
-        expected = r['expected_intent']
-        actual = r['actual_intent']
-        if expected in confusion:
-            if actual in confusion[expected]:
-                confusion[expected][actual] += 1
-            else:
-                confusion[expected]['unknown'] += 1
-
-    return confusion
+async def run_query_async(client: httpx.AsyncClient, query_data: Dict[str, Any], query_index: int,
+                          total: int, endpoint: str = QUERY_ENDPOINT, use_cache: bool = False,
+                          quiet: bool = False, request_fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Execute a single query on a shared async client and collect metrics.
 
+    Produces the same result dicts as run_query(). Prints a single line on
+    completion, since concurrent requests would interleave a two-line log,
+    or nothing when `quiet` (for harness benchmarks at thousands of QPS).
+    """
+    difficulty = query_data['difficulty']
+    start_time = time.perf_counter()
 
-def calculate_metrics(results: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Calculate comprehensive metrics from test results."""
-    successful = [r for r in results if r['status'] == 'success']
+    try:
+        response = await client.post(endpoint, json=build_query_payload(query_data, use_cache, request_fields))
+        latency = time.perf_counter() - start_time
 
-    if not successful:
-        return {"error": "No successful queries"}
+        if response.status_code == 200:
+            body = response.json()
+            result = build_success_result(query_data, query_index, body, latency,
+                                          extract_server_timings(response.headers, body, latency))
+            correct = result['intent_correct']
+            if not quiet:
+                print(f"[{query_index}/{total}] ({difficulty.upper()}) {'✅' if correct else '❌'} {latency:.3f}s | "
+                      f"Intent: {result['actual_intent']} (expected: {result['expected_intent']})")
+            return result
+
+        if not quiet:
+            print(f"[{query_index}/{total}] ({difficulty.upper()}) ❌ Error: {response.status_code}")
+        return build_error_result(query_data, query_index, response.status_code, response.text, latency)
 
-    latencies = [r['latency_seconds'] for r in successful]
-    correct_intents = [r for r in successful if r.get('intent_correct', False)]
+    except Exception as e:
+        latency = time.perf_counter() - start_time
+        result = build_exception_result(query_data, query_index, e, latency)
+        if not quiet:
+            print(f"[{query_index}/{total}] ({difficulty.upper()}) ❌ Exception: {result['error_message']}")
+        return result
+
+
+async def run_queries_async(indexed_queries: Iterable[Tuple[int, Dict[str, Any]]], total: int,
+                            concurrency: int, on_result: Callable[[Dict[str, Any]], None],
+                            timeout: float = 30, endpoint: str = QUERY_ENDPOINT, use_cache: bool = False,
+                            transport: Optional[httpx.AsyncBaseTransport] = None, quiet: bool = False,
+                            request_fields: Optional[Dict[str, Any]] = None):
+    """Run (query_index, query_data) pairs with at most `concurrency` requests in flight.
+
+    A fixed pool of worker coroutines pulls from a shared iterator, so memory
+    stays flat regardless of suite size. The HTTP connection pool is sized to
+    the concurrency so every worker reuses a keep-alive connection. Each
+    result is handed to `on_result` as soon as it completes. `transport`
+    replaces the network, e.g. mock_query_api.mock_transport() in-process.
+    `request_fields` are added to every request body (see build_query_payload).
+    """
+    pending = iter(indexed_queries)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(timeout), transport=transport) as client:
+        async def worker():
+            for query_index, query_data in pending:
+                on_result(await run_query_async(client, query_data, query_index, total, endpoint, use_cache, quiet,
+                                                request_fields))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
 
-    # Overall metrics
-    overall_metrics = {
-        "total_queries": len(results),
-        "successful_queries": len(successful),
-        "failed_queries": len(results) - len(successful),
-        "success_rate": (len(successful) / len(results)) * 100,
-        "overall_accuracy": (len(correct_intents) / len(successful)) * 100,
-        "correct_count": len(correct_intents),
-        "total_count": len(successful)
-    }
 
-    # Latency metrics
-    latency_metrics = {
-        "p50_seconds": statistics.median(latencies),
-        "p90_seconds": statistics.quantiles(latencies, n=10)[8] if len(latencies) > 1 else latencies[0],
-        "p99_seconds": statistics.quantiles(latencies, n=100)[98] if len(latencies) > 2 else max(latencies),
-        "mean_seconds": statistics.mean(latencies),
-        "min_seconds": min(latencies),
-        "max_seconds": max(latencies)
-    }
+def calculate_confusion_matrix(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Calculate intent classification confusion matrix."""
+    return aggregate_confusion_matrix(ResultColumns.from_results(results))
 
-    # Metrics by difficulty tier
-    difficulty_metrics = {}
-    for difficulty in ['easy', 'medium', 'hard']:
-        tier_results = [r for r in successful if r.get('difficulty') == difficulty]
-        if tier_results:
-            tier_correct = [r for r in tier_results if r.get('intent_correct', False)]
-            tier_latencies = [r['latency_seconds'] for r in tier_results]
-
-            difficulty_metrics[difficulty] = {
-                "total": len(tier_results),
-                "correct": len(tier_correct),
-                "accuracy": (len(tier_correct) / len(tier_results)) * 100,
-                "avg_latency": statistics.mean(tier_latencies),
-                "median_latency": statistics.median(tier_latencies)
-            }
-
-    # Metrics by intent within each difficulty tier
-    intent_by_difficulty = {}
-    for difficulty in ['easy', 'medium', 'hard']:
-        intent_by_difficulty[difficulty] = {}
-        for intent in ['graph', 'temporal', 'semantic', 'metadata']:
-            intent_tier_results = [
-                r for r in successful
-                if r.get('difficulty') == difficulty and r['expected_intent'] == intent
-            ]
-            if intent_tier_results:
-                correct = len([r for r in intent_tier_results if r.get('intent_correct', False)])
-                intent_by_difficulty[difficulty][intent] = {
-                    'total': len(intent_tier_results),
-                    'correct': correct,
-                    'accuracy': (correct / len(intent_tier_results)) * 100
-                }
-
-    # Overall intent accuracy (across all difficulties)
-    intent_accuracy = {}
-    for intent in ['graph', 'temporal', 'semantic', 'metadata']:
-        intent_queries = [r for r in successful if r['expected_intent'] == intent]
-        if intent_queries:
-            correct = len([r for r in intent_queries if r.get('intent_correct', False)])
-            intent_accuracy[intent] = {
-                'total': len(intent_queries),
-                'correct': correct,
-                'accuracy': (correct / len(intent_queries)) * 100
-            }
-
-    # Confusion matrix
-    confusion_matrix = calculate_confusion_matrix(results)
-
-    # Database usage
-    db_usage = {}
-    for r in successful:
-        for db in r.get('databases_used', []):
-            db_usage[db] = db_usage.get(db, 0) + 1
-
-    # Failure analysis (incorrect predictions by difficulty)
-    failures = [r for r in successful if not r.get('intent_correct', False)]
-    failure_analysis = {
-        'total_failures': len(failures),
-        'by_difficulty': {},
-        'examples': []
-    }
 
-    for difficulty in ['easy', 'medium', 'hard']:
-        diff_failures = [f for f in failures if f.get('difficulty') == difficulty]
-        if diff_failures:
-            failure_analysis['by_difficulty'][difficulty] = {
-                'count': len(diff_failures),
-                'percentage': (len(diff_failures) / len([r for r in successful if r.get('difficulty') == difficulty])) * 100
-            }
-
-    # Add failure examples (first 10)
-    for f in failures[:10]:
-        failure_analysis['examples'].append({
-            'query': f['query'],
-            'expected': f['expected_intent'],
-            'actual': f['actual_intent'],
-            'difficulty': f['difficulty'],
-            'rationale': f.get('difficulty_rationale', '')
-        })
+def calculate_metrics(results: Iterable[Dict[str, Any]], use_cache: bool = False) -> Dict[str, Any]:
+    """Calculate comprehensive metrics from test results.
 
-    return {
-        "overall": overall_metrics,
-        "latency": latency_metrics,
-        "by_difficulty": difficulty_metrics,
-        "intent_by_difficulty": intent_by_difficulty,
-        "intent_overall": intent_accuracy,
-        "confusion_matrix": confusion_matrix,
-        "database_routing": {
-            "usage_counts": db_usage,
-            "most_used": max(db_usage, key=db_usage.get) if db_usage else None
-        },
-        "failure_analysis": failure_analysis,
-        "cache_performance": {
-            "hit_rate": 0.0,
-            "note": "Cache disabled for testing"
-        }
-    }
+    The results are copied once into columnar storage and every section is
+    built from it by metrics_aggregator.aggregate_metrics(), which keeps the
+    cost flat in the number of tiers/intents and handles 10^6+ rows. Any
+    iterable works, including iter_results() over a result log. Pass
+    use_cache=True when the requests asked for cached answers.
+    """
+    return aggregate_metrics(ResultColumns.from_results(results), use_cache)
 
 
 def format_confusion_matrix(confusion: Dict[str, Dict[str, int]]) -> str:
@@ -356,6 +369,41 @@ def format_summary(metrics: Dict[str, Any]) -> str:
     summary.append(f"   Range:              {metrics['latency']['min_seconds']:.3f}s - {metrics['latency']['max_seconds']:.3f}s")
     summary.append("")
 
+    # Latency percentiles by slice
+    if 'latency_histograms' in metrics:
+        histograms = LatencyHistogramSet.from_dict(metrics['latency_histograms'])
+        summary.append("⏱️  Latency by Slice (P50 / P90 / P99)")
+        slice_order = {
+            'difficulty': ['easy', 'medium', 'hard'],
+            'intent': ['graph', 'temporal', 'semantic', 'metadata']
+        }
+        for dimension, label in [('difficulty', 'Tier'), ('intent', 'Intent'), ('database', 'Database')]:
+            order = slice_order.get(dimension, [])
+            slices = histograms.slices.get(dimension, {})
+            for value in sorted(slices, key=lambda v: (order.index(v) if v in order else len(order), v)):
+                hist = slices[value]
+                summary.append(f"   {label + ' ' + value:20s}: {hist.percentile(50):.3f}s / {hist.percentile(90):.3f}s / "
+                               f"{hist.percentile(99):.3f}s ({hist.total_count} queries)")
+        summary.append("")
+
+    # Server-side stage breakdown, when the API reports it
+    if 'server_timing' in metrics:
+        summary.append(format_stage_waterfall(metrics['server_timing']))
+        summary.append("")
+
+    # Cache effectiveness, when the run asked for the cache or any response was served from it
+    cache = metrics.get('cache_performance', {})
+    if 'hits' in cache:
+        summary.append("💾 Cache Performance")
+        summary.append(f"   Hit Rate:           {cache['hit_rate']:.1f}% ({cache['hits']}/{cache['hits'] + cache['misses']})")
+        if cache['hit_latency']:
+            summary.append(f"   Hit Latency:        P50 {cache['hit_latency']['p50_seconds']:.3f}s | P99 {cache['hit_latency']['p99_seconds']:.3f}s")
+        if cache['miss_latency']:
+            summary.append(f"   Miss Latency:       P50 {cache['miss_latency']['p50_seconds']:.3f}s | P99 {cache['miss_latency']['p99_seconds']:.3f}s")
+        if cache['speedup']:
+            summary.append(f"   Speedup (P50):      {cache['speedup']:.1f}x")
+        summary.append("")
+
     # Accuracy by difficulty tier
     summary.append("🎯 Accuracy by Difficulty Tier")
     for difficulty in ['easy', 'medium', 'hard']:
@@ -424,6 +472,38 @@ def format_summary(metrics: Dict[str, Any]) -> str:
     return "\n".join(summary)
 
 
+def save_reports(results_dir: Path, test_run: Dict[str, Any], results: Iterable[Dict[str, Any]],
+                 metrics: Dict[str, Any], summary: str, confusion_text: str) -> Tuple[Path, Path, Path]:
+    """Write stratified_results.json, stratified_summary.txt and confusion_matrix.txt.
+
+    `results` may be a generator (e.g. iter_results() over the result log);
+    it is streamed into the JSON file rather than collected first.
+    """
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    # Save detailed results
+    results_file = results_dir / "stratified_results.json"
+    write_results_json(results_file, test_run, results, metrics)
+
+    print(f"✅ Detailed results saved to: {results_file}")
+
+    # Save summary
+    summary_file = results_dir / "stratified_summary.txt"
+    with open(summary_file, 'w') as f:
+        f.write(summary)
+
+    print(f"✅ Summary saved to: {summary_file}")
+
+    # Save confusion matrix
+    confusion_file = results_dir / "confusion_matrix.txt"
+    with open(confusion_file, 'w') as f:
+        f.write(confusion_text)
+
+    print(f"✅ Confusion matrix saved to: {confusion_file}")
+
+    return results_file, summary_file, confusion_file
+
+
 def main():
     """Main test execution."""
     # Parse arguments
@@ -441,20 +521,67 @@ def main():
         action='store_true',
         help='Enable hybrid classifier (keyword + embeddings cascade)'
     )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=1,
+        help='Number of in-flight requests (default: 1, sequential). Values >1 use the asyncio load generator'
+    )
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=30,
+        help='Per-request timeout in seconds (default: 30)'
+    )
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(RESULTS_DIR),
+        help='Directory for result files (default: monitoring/stratified)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted run, skipping query IDs already in the result log'
+    )
+    parser.add_argument(
+        '--api-base',
+        type=str,
+        default=API_BASE,
+        help=f'Base URL of the query API (default: {API_BASE})'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile the harness: overhead per request, max sustainable QPS and folded stacks for a flamegraph'
+    )
+    parser.add_argument(
+        '--profile-interval',
+        type=float,
+        default=5,
+        help='Stack sampling interval in milliseconds for --profile (default: 5)'
+    )
+    add_exporter_arguments(parser)
 
     args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
     queries_path = Path(args.test_suite)
     use_hybrid = args.use_hybrid
+    output_dir = Path(args.output_dir)
+    log_path = output_dir / RESULT_LOG_NAME
+    query_endpoint, health_endpoint = api_endpoints(args.api_base)
 
     print("🚀 Starting Difficulty-Stratified Performance Testing")
     print("="*80)
     print(f"   Test Suite: {queries_path.name}")
     print(f"   Hybrid Classifier: {'✅ ENABLED' if use_hybrid else '❌ DISABLED (semantic only)'}")
+    print(f"   Concurrency: {args.concurrency}")
     print("="*80)
     print("")
 
     # Check API health
-    if not check_api_health():
+    if not check_api_health(health_endpoint):
         print("\n❌ API is not healthy. Exiting.")
         return
 
@@ -467,76 +594,112 @@ def main():
         print(f"❌ Test suite not found: {queries_path}")
         return
 
-    with open(queries_path, 'r') as f:
-        data = json.load(f)
-
-    queries = data['queries']
+    try:
+        suite = load_suite(queries_path)
+    except SuiteError as e:
+        print(f"❌ {e}")
+        return
+    queries = suite.queries
+    tier_counts = suite.counts('difficulty')
     print(f"✅ Loaded {len(queries)} test queries")
-    print(f"   - Easy: {len([q for q in queries if q['difficulty'] == 'easy'])}")
-    print(f"   - Medium: {len([q for q in queries if q['difficulty'] == 'medium'])}")
-    print(f"   - Hard: {len([q for q in queries if q['difficulty'] == 'hard'])}")
-    print("")
-
-    print("🧪 Running stratified tests (cache disabled)...")
-    print("="*80)
-
-    # Run tests
-    results = []
-    for i, query_data in enumerate(queries, 1):
-        result = run_query(query_data, i, len(queries), use_hybrid=use_hybrid)
-        results.append(result)
-
-        # Brief pause to avoid overwhelming API
-        time.sleep(0.1)
-
-    print("\n\n📊 Calculating metrics...")
-
-    # Calculate metrics
-    metrics = calculate_metrics(results)
-
-    # Save detailed results
-    results_file = RESULTS_DIR / "stratified_results.json"
-    with open(results_file, 'w') as f:
-        json.dump({
-            "test_run": {
-                "timestamp": datetime.now().isoformat(),
-                "total_queries": len(queries),
-                "test_suite": str(queries_path),
-                "hybrid_classifier_enabled": use_hybrid,
-                "api_endpoint": QUERY_ENDPOINT
-            },
-            "results": results,
-            "metrics": metrics
-        }, f, indent=2)
-
-    print(f"✅ Detailed results saved to: {results_file}")
-
-    # Save summary
-    summary = format_summary(metrics)
-    summary_file = RESULTS_DIR / "stratified_summary.txt"
-    with open(summary_file, 'w') as f:
-        f.write(summary)
-
-    print(f"✅ Summary saved to: {summary_file}")
-
-    # Save confusion matrix
-    confusion_text = format_confusion_matrix(metrics['confusion_matrix'])
-    confusion_file = RESULTS_DIR / "confusion_matrix.txt"
-    with open(confusion_file, 'w') as f:
-        f.write(confusion_text)
-
-    print(f"✅ Confusion matrix saved to: {confusion_file}")
+    print(f"   - Easy: {tier_counts.get('easy', 0)}")
+    print(f"   - Medium: {tier_counts.get('medium', 0)}")
+    print(f"   - Hard: {tier_counts.get('hard', 0)}")
+    for warning in suite.warnings:
+        print(f"   ⚠️  {warning}")
     print("")
 
-    # Print summary to console
-    print(summary)
-    print(confusion_text)
+    exporter = exporter_from_args(args, {"mode": "stratified", "test_suite": queries_path.name})
+    profiler = HarnessProfiler(args.profile_interval / 1000) if args.profile else None
+    if profiler:
+        profiler.instrument(globals())
 
-    print(f"\n✅ Difficulty-stratified testing complete!")
-    print(f"   - Detailed results: {results_file}")
-    print(f"   - Summary report:   {summary_file}")
-    print(f"   - Confusion matrix: {confusion_file}")
-    print("")
+    # Finalize the metrics exporter, restore the instrumented functions and stop the sampler thread
+    # even if the run fails
+    try:
+        print("🧪 Running stratified tests (cache disabled)...")
+        print("="*80)
+
+        # Run tests, streaming each result to the append-only log as it completes
+        with ResultLog(log_path, resume=args.resume) as log:
+            resumed = len(log.completed_ids)
+            if resumed:
+                print(f"↩️  Resuming: {resumed} queries already recorded in {log_path}")
+
+            pending = [
+                (i, query_data) for i, query_data in enumerate(queries, 1)
+                if query_data.get('id', f"q{i}") not in log.completed_ids
+            ]
+            on_result = exporter.tee(log.write) if exporter else log.write
+            if profiler:
+                on_result = profiler.wrap('record_result', on_result)
+                profiler.start()
+
+            run_start = time.perf_counter()
+            if args.concurrency > 1:
+                asyncio.run(run_queries_async(pending, len(queries), args.concurrency, on_result,
+                                              timeout=args.timeout, endpoint=query_endpoint))
+            else:
+                for i, query_data in pending:
+                    on_result(run_query(query_data, i, len(queries), use_hybrid=use_hybrid, timeout=args.timeout,
+                                        endpoint=query_endpoint))
+
+                    # Brief pause to avoid overwhelming API
+                    time.sleep(0.1)
+            run_duration = time.perf_counter() - run_start
+            completed = log.written
+            if profiler:
+                profiler.end_run(completed)
+
+        throughput = completed / run_duration if run_duration > 0 else 0.0
+
+        print(f"\n⏱️  Completed {completed} queries in {run_duration:.2f}s ({throughput:.1f} queries/s)")
+        print("\n\n📊 Calculating metrics...")
+
+        # Calculate metrics by streaming over the log
+        metrics = calculate_metrics(iter_results(log_path))
+
+        test_run = {
+            "timestamp": datetime.now().isoformat(),
+            "total_queries": len(queries),
+            "test_suite": str(queries_path),
+            "hybrid_classifier_enabled": use_hybrid,
+            "api_endpoint": query_endpoint,
+            "concurrency": args.concurrency,
+            "resumed_queries": resumed,
+            "duration_seconds": run_duration,
+            "throughput_qps": throughput
+        }
+        summary = format_summary(metrics)
+        confusion_text = format_confusion_matrix(metrics['confusion_matrix'])
+        results_file, summary_file, confusion_file = save_reports(
+            output_dir, test_run, iter_results(log_path), metrics, summary, confusion_text
+        )
+        print("")
+
+        # Print summary to console
+        print(summary)
+        print(confusion_text)
+
+        print(f"\n✅ Difficulty-stratified testing complete!")
+        print(f"   - Detailed results: {results_file}")
+        print(f"   - Summary report:   {summary_file}")
+        print(f"   - Confusion matrix: {confusion_file}")
+        print("")
+
+        if profiler:
+            profiler.stop()
+            harness_report = profiler.report(args.concurrency)
+            _, profile_text, profile_folded = profiler.write(output_dir, harness_report)
+            print(format_harness_profile(harness_report))
+            print(f"\n✅ Harness profile: {profile_text}")
+            print(f"   - Folded stacks:    {profile_folded} (flamegraph.pl / speedscope)")
+            print("")
+    finally:
+        if exporter:
+            exporter.close()
+        if profiler:
+            profiler.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Distributed Stratified Load Driver
+
+Splits a test suite into shards and runs them from several worker processes,
+on one machine or across hosts, then merges the shard logs into the usual
+stratified_results.json, summary and confusion matrix.
+
+Workers coordinate through a shared directory (a local path, or an NFS/SMB
+mount when workers run on different hosts), which stands in for a real
+coordination service:
+
+    <coord-dir>/plan.json              plan ID, suite, shard count, concurrency, start time
+    <coord-dir>/shards/shard-003.claim created atomically by the worker that takes shard 3
+    <coord-dir>/shards/shard-003.jsonl result log for shard 3 (see result_log.py)
+    <coord-dir>/shards/shard-003.done  written when shard 3 finishes (plan ID, host, timing, count)
+
+Shard k holds every query whose position modulo the shard count is k, so each
+shard keeps the suite's difficulty/intent mix. A worker keeps claiming shards
+until none are left, so using more shards than workers balances uneven hosts.
+Merging reads the raw shard logs, so global percentiles and per-tier metrics
+are exact rather than averaged across workers.
+
+Usage:
+    # Everything on one box: plan, spawn 4 worker processes, merge
+    python3 distributed_runner.py run --workers 4 --coord-dir /tmp/dist-run --test-suite SUITE
+
+    # Across hosts sharing /mnt/shared/run1
+    python3 distributed_runner.py plan --coord-dir /mnt/shared/run1 --test-suite SUITE --shards 16 --start-delay 30
+    python3 distributed_runner.py worker --coord-dir /mnt/shared/run1 --api-base http://api:8000   # on each host
+    python3 distributed_runner.py merge --coord-dir /mnt/shared/run1 --output-dir results/dist/
+
+To re-run a shard whose worker died, delete its .claim file and start another
+worker; it resumes the shard's existing log.
+
+Planning refuses a coordination directory that still holds shard files from
+an earlier plan (pass --force to clear them), and merge only accepts .done
+markers stamped with the current plan's ID.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import shutil
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from difficulty_stratified_test import (
+    API_BASE,
+    RESULTS_DIR,
+    api_endpoints,
+    calculate_metrics,
+    check_api_health,
+    format_confusion_matrix,
+    format_summary,
+    load_queries,
+    run_queries_async,
+    save_reports,
+)
+from result_log import ResultLog, iter_results
+
+
+def shard_path(coord_dir: Path, shard: int, suffix: str) -> Path:
+    return coord_dir / "shards" / f"shard-{shard:03d}.{suffix}"
+
+
+def write_plan(coord_dir: Path, test_suite: str, shards: int, concurrency: int, timeout: float,
+               start_delay: float, force: bool = False) -> Dict[str, Any]:
+    """Create the coordination directory and its plan.json.
+
+    Raises FileExistsError if shard files from an earlier plan are present,
+    unless force is set, in which case they are deleted.
+    """
+    shards_dir = coord_dir / "shards"
+    leftovers = sorted(shards_dir.iterdir()) if shards_dir.is_dir() else []
+    if leftovers and not force:
+        raise FileExistsError(f"{shards_dir} holds {len(leftovers)} files from an earlier plan "
+                              f"(use --force to clear them, or choose a new --coord-dir)")
+    if leftovers:
+        shutil.rmtree(shards_dir)
+        for log in coord_dir.glob("worker-*.log"):
+            log.unlink()
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    plan = {
+        "plan_id": uuid.uuid4().hex,
+        "created": datetime.now().isoformat(),
+        "test_suite": str(Path(test_suite).resolve()),
+        "shards": shards,
+        "concurrency": concurrency,
+        "timeout": timeout,
+        "start_at": time.time() + start_delay
+    }
+    (coord_dir / "plan.json").write_text(json.dumps(plan, indent=2))
+    return plan
+
+
+def read_plan(coord_dir: Path) -> Dict[str, Any]:
+    return json.loads((coord_dir / "plan.json").read_text())
+
+
+def claim_next_shard(coord_dir: Path, plan: Dict[str, Any], worker_name: str) -> Optional[int]:
+    """Atomically claim the lowest unclaimed shard, or return None when all are taken."""
+    for shard in range(plan['shards']):
+        try:
+            fd = os.open(shard_path(coord_dir, shard, "claim"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{plan.get('plan_id')} {worker_name}")
+        return shard
+    return None
+
+
+def run_shard(coord_dir: Path, plan: Dict[str, Any], queries: List[Dict[str, Any]], shard: int,
+              query_endpoint: str, worker_name: str) -> Dict[str, Any]:
+    """Run one shard into its result log and write its .done marker."""
+    shards = plan['shards']
+    started = time.time()
+
+    with ResultLog(shard_path(coord_dir, shard, "jsonl"), resume=True) as log:
+        pending = [
+            (i, query_data) for i, query_data in enumerate(queries, 1)
+            if (i - 1) % shards == shard and query_data.get('id', f"q{i}") not in log.completed_ids
+        ]
+        asyncio.run(run_queries_async(pending, len(queries), plan['concurrency'], log.write,
+                                      timeout=plan['timeout'], endpoint=query_endpoint))
+        completed = len(log.completed_ids)
+
+    marker = {
+        "plan_id": plan.get('plan_id'),
+        "shard": shard,
+        "worker": worker_name,
+        "started": started,
+        "finished": time.time(),
+        "completed": completed
+    }
+    shard_path(coord_dir, shard, "done").write_text(json.dumps(marker, indent=2))
+    return marker
+
+
+def run_worker(coord_dir: Path, api_base: str) -> int:
+    """Claim and run shards until none are left. Returns the number of shards run."""
+    plan = read_plan(coord_dir)
+    queries = load_queries(Path(plan['test_suite']))
+    query_endpoint, _ = api_endpoints(api_base)
+    worker_name = f"{socket.gethostname()}:{os.getpid()}"
+    shards_run = 0
+
+    # Line up every worker on the plan's start time so load starts together
+    delay = plan['start_at'] - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+    while (shard := claim_next_shard(coord_dir, plan, worker_name)) is not None:
+        print(f"🔧 {worker_name}: running shard {shard + 1}/{plan['shards']}")
+        marker = run_shard(coord_dir, plan, queries, shard, query_endpoint, worker_name)
+        print(f"✅ {worker_name}: shard {shard + 1} done ({marker['completed']} queries)")
+        shards_run += 1
+
+    return shards_run
+
+
+def iter_shard_results(coord_dir: Path, shards: int) -> Iterator[Dict[str, Any]]:
+    """Stream every result from every shard log, shard by shard."""
+    for shard in range(shards):
+        yield from iter_results(shard_path(coord_dir, shard, "jsonl"))
+
+
+def merge_shards(coord_dir: Path, output_dir: Path, query_endpoint: str) -> bool:
+    """Merge finished shard logs into one set of reports. Returns False if shards are missing."""
+    plan = read_plan(coord_dir)
+    shards = plan['shards']
+
+    missing = [shard for shard in range(shards) if not shard_path(coord_dir, shard, "done").exists()]
+    if missing:
+        print(f"❌ {len(missing)} shard(s) not finished: {', '.join(str(s) for s in missing)}")
+        return False
+
+    markers = [json.loads(shard_path(coord_dir, shard, "done").read_text()) for shard in range(shards)]
+    stale = [m['shard'] for m in markers if m.get('plan_id') != plan.get('plan_id')]
+    if stale:
+        print(f"❌ {len(stale)} shard(s) finished under a different plan: {', '.join(str(s) for s in stale)}")
+        return False
+    first_start = min(m['started'] for m in markers)
+    last_finish = max(m['finished'] for m in markers)
+    completed = sum(m['completed'] for m in markers)
+    wall_clock = last_finish - first_start
+
+    print(f"📊 Merging {shards} shards ({completed} queries)...")
+    metrics = calculate_metrics(iter_shard_results(coord_dir, shards))
+
+    test_run = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "distributed",
+        "total_queries": completed,
+        "test_suite": plan['test_suite'],
+        "api_endpoint": query_endpoint,
+        "shards": shards,
+        "workers": sorted({m['worker'] for m in markers}),
+        "concurrency_per_worker": plan['concurrency'],
+        "duration_seconds": wall_clock,
+        "throughput_qps": completed / wall_clock if wall_clock > 0 else 0.0,
+        "shard_timings": [
+            {
+                "shard": m['shard'],
+                "worker": m['worker'],
+                "duration_seconds": m['finished'] - m['started'],
+                "completed": m['completed']
+            }
+            for m in markers
+        ]
+    }
+    summary = format_summary(metrics)
+    confusion_text = format_confusion_matrix(metrics['confusion_matrix'])
+    save_reports(output_dir, test_run, iter_shard_results(coord_dir, shards), metrics, summary, confusion_text)
+    print("")
+    print(summary)
+    return True
+
+
+def run_local(coord_dir: Path, workers: int, api_base: str) -> bool:
+    """Spawn `workers` worker processes on this host, wait for them, and report failures."""
+    processes = []
+    for i in range(workers):
+        log_file = open(coord_dir / f"worker-{i}.log", 'w')
+        process = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), 'worker',
+             '--coord-dir', str(coord_dir), '--api-base', api_base],
+            stdout=log_file, stderr=subprocess.STDOUT
+        )
+        processes.append((process, log_file))
+
+    print(f"🚀 Started {workers} worker processes (logs in {coord_dir}/worker-*.log)")
+
+    ok = True
+    for i, (process, log_file) in enumerate(processes):
+        if process.wait() != 0:
+            print(f"❌ Worker {i} exited with code {process.returncode}")
+            ok = False
+        log_file.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the stratified suite from multiple worker processes or hosts')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_plan_arguments(sub):
+        sub.add_argument(
+            '--test-suite',
+            type=str,
+            default='/Users/richardglaubitz/Projects/Apex-Memory-System-Development/tests/test-suites/difficulty-stratified-balanced-250.json',
+            help='Path to test suite JSON file (default: difficulty-stratified-balanced-250.json)'
+        )
+        sub.add_argument('--shards', type=int, help='Number of shards (default: one per worker)')
+        sub.add_argument('--concurrency', type=int, default=8, help='In-flight requests per worker (default: 8)')
+        sub.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+        sub.add_argument('--start-delay', type=float, default=2,
+                         help='Seconds from planning until workers start sending (default: 2)')
+
+    for name in ('run', 'plan', 'worker', 'merge'):
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--coord-dir', type=str, required=True, help='Shared coordination directory')
+        sub.add_argument('--api-base', type=str, default=API_BASE, help=f'Base URL of the query API (default: {API_BASE})')
+        if name in ('run', 'plan'):
+            add_plan_arguments(sub)
+            sub.add_argument('--force', action='store_true',
+                             help="Delete shard files left in --coord-dir by an earlier plan")
+        if name == 'run':
+            sub.add_argument('--workers', type=int, default=os.cpu_count(), help='Local worker processes (default: CPU count)')
+        if name in ('run', 'merge'):
+            sub.add_argument('--output-dir', type=str, default=str(RESULTS_DIR / "distributed"),
+                             help='Directory for merged result files (default: <RESULTS_DIR>/distributed)')
+
+    args = parser.parse_args()
+    coord_dir = Path(args.coord_dir)
+    query_endpoint, health_endpoint = api_endpoints(args.api_base)
+
+    if args.command == 'worker':
+        run_worker(coord_dir, args.api_base)
+        return
+
+    if args.command == 'merge':
+        if not merge_shards(coord_dir, Path(args.output_dir), query_endpoint):
+            sys.exit(1)
+        return
+
+    # plan / run
+    if not check_api_health(health_endpoint):
+        print("\n❌ API is not healthy. Exiting.")
+        sys.exit(1)
+
+    shards = args.shards or (args.workers if args.command == 'run' else 1)
+    try:
+        plan = write_plan(coord_dir, args.test_suite, shards, args.concurrency, args.timeout, args.start_delay,
+                          args.force)
+    except FileExistsError as e:
+        parser.error(str(e))
+    print(f"📝 Plan written to {coord_dir / 'plan.json'}: {shards} shards, {args.concurrency} in flight per worker")
+
+    if args.command == 'plan':
+        return
+
+    if not run_local(coord_dir, args.workers, args.api_base) or not merge_shards(
+            coord_dir, Path(args.output_dir), query_endpoint):
+        sys.exit(1)
+    print(f"\n✅ Distributed run complete: {plan['shards']} shards from {args.workers} local workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Harness Profiling
+
+Measures how much of a run's time goes to the test harness itself rather than
+the API, so latency numbers can be trusted at high load. Enabled with
+--profile on difficulty_stratified_test.py; costs nothing when off.
+
+Two mechanisms, both cheap enough to leave on for a full run:
+
+    phase timers      the runner's functions (run_query / run_query_async,
+                      payload and result construction, Server-Timing parsing,
+                      print, result logging, metrics, report writing) are
+                      swapped for timed wrappers in the runner's namespace for
+                      the duration of the run. Each call costs ~1µs extra and
+                      lands in a per-phase HDR histogram.
+    sampling profiler a daemon thread samples the runner thread's Python stack
+                      every --profile-interval ms, keeping the samples taken
+                      while it is on CPU, and writes the folded stacks in the
+                      collapsed format flamegraph.pl, inferno and speedscope
+                      read.
+
+From these it reports:
+
+    overhead outside latency_seconds   request wall time minus latency_seconds:
+                                       printing, result dicts, timestamps, scheduling
+    harness CPU per request            process CPU time during the run / requests
+    max sustainable QPS                1 / harness CPU per request; the harness
+                                       saturates its single core at this rate
+    harness utilization                achieved QPS / max sustainable QPS. Above
+                                       ~70% queueing in the client inflates latency
+    client CPU inside latency_seconds  (sequential runs) CPU per request minus the
+                                       overhead outside the latency window: HTTP
+                                       session setup, JSON encoding, response parsing
+
+    profiler = HarnessProfiler(interval=0.005)
+    profiler.instrument(globals())           # wrap RUNNER_FUNCTIONS in the runner module
+    profiler.start() ... profiler.end_run(completed) ... profiler.stop()
+    report = profiler.report(concurrency)
+    profiler.write(output_dir, report)       # harness_profile.json / .txt / .folded
+
+Render a flamegraph from the folded stacks with e.g.
+    flamegraph.pl harness_profile.folded > harness_profile.svg
+or open the file in https://www.speedscope.app.
+"""
+
+import builtins
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from latency_histogram import LatencyHistogram
+
+# Runner functions timed by instrument(); the first two are per-request phases
+REQUEST_FUNCTIONS = ('run_query', 'run_query_async')
+RUNNER_FUNCTIONS = REQUEST_FUNCTIONS + (
+    'build_query_payload',
+    'build_success_result',
+    'build_error_result',
+    'build_exception_result',
+    'extract_server_timings',
+    'print',
+    'calculate_metrics',
+    'format_summary',
+    'format_confusion_matrix',
+    'save_reports',
+)
+MAX_STACK_DEPTH = 128
+
+
+class SamplingProfiler:
+    """Periodically samples the calling thread's Python stack into folded-stack counts.
+
+    On Linux a sample only counts when /proc shows the thread running, so
+    the folded stacks are an on-CPU profile and time blocked in sleep() or a
+    socket read (which happens inside C calls, invisible to the Python
+    stack) drops out, as with py-spy's default mode. Elsewhere every sample
+    counts (wall clock).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.cpu_seconds = 0.0
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        try:
+            self._stat_fd: Optional[int] = os.open(f"/proc/self/task/{threading.get_native_id()}/stat", os.O_RDONLY)
+        except OSError:
+            self._stat_fd = None
+        self.on_cpu_only = self._stat_fd is not None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+        return label
+
+    def _running(self) -> bool:
+        # /proc/<pid>/task/<tid>/stat is "tid (comm) STATE ..."; comm may itself contain ')'
+        stat = os.pread(self._stat_fd, 512, 0)
+        return stat[stat.rindex(b")") + 2:stat.rindex(b")") + 3] == b"R"
+
+    def _run(self):
+        cpu_start = time.thread_time()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.samples += 1
+            if self._stat_fd is not None and not self._running():
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+        self.cpu_seconds = time.thread_time() - cpu_start
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="harness-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._stat_fd is not None:
+            os.close(self._stat_fd)
+            self._stat_fd = None
+
+    def write_folded(self, path: Path):
+        """Collapsed stacks, one `frame;frame;frame count` line per distinct stack."""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_frames(self, n: int = 10) -> List[Tuple[str, int]]:
+        """Leaf frames with the most samples (self time)."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+
+class HarnessProfiler:
+    """Phase timers, request overhead accounting and a sampling profiler for one run."""
+
+    def __init__(self, interval: float = 0.005):
+        self.phases: Dict[str, LatencyHistogram] = {}
+        self.phase_totals: Dict[str, List[float]] = {}
+        self.outside_latency = LatencyHistogram()
+        self.sampler = SamplingProfiler(interval)
+        self._originals: Dict[str, Any] = {}
+        self._namespace: Optional[Dict[str, Any]] = None
+        self._wall_start: Optional[float] = None
+        self._cpu_start = 0.0
+        self.stopped = False
+        self.requests = 0
+        self.run_wall = 0.0
+        self.run_cpu = 0.0
+        self.total_wall = 0.0
+        self.total_cpu = 0.0
+
+    def _histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.phases.get(name)
+        if histogram is None:
+            histogram = self.phases[name] = LatencyHistogram()
+        return histogram
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """func with each call's wall time recorded under name; per-request phases also record
+        the time outside the result's latency_seconds."""
+        histogram = self._histogram(name)
+        record = histogram.record
+        # Exact total alongside the histogram, which rounds to whole microseconds
+        total = self.phase_totals.setdefault(name, [0.0])
+        clock = time.perf_counter
+        outside = self.outside_latency.record if name in REQUEST_FUNCTIONS else None
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_async(*args, **kwargs):
+                start = clock()
+                result = await func(*args, **kwargs)
+                elapsed = clock() - start
+                record(elapsed)
+                total[0] += elapsed
+                if outside is not None:
+                    outside(max(elapsed - result['latency_seconds'], 0.0))
+                return result
+            return timed_async
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = clock()
+            result = func(*args, **kwargs)
+            elapsed = clock() - start
+            record(elapsed)
+            total[0] += elapsed
+            if outside is not None:
+                outside(max(elapsed - result['latency_seconds'], 0.0))
+            return result
+        return timed
+
+    def instrument(self, namespace: Dict[str, Any], names: Iterable[str] = RUNNER_FUNCTIONS):
+        """Replace the named functions in a module namespace (e.g. the runner's globals()) with timed wrappers.
+
+        Names missing from the namespace are looked up in builtins, so 'print'
+        shadows the builtin for that module only. restore() undoes it.
+        """
+        self._namespace = namespace
+        for name in names:
+            func = namespace.get(name, getattr(builtins, name, None))
+            if func is None:
+                continue
+            self._originals[name] = namespace.get(name)
+            namespace[name] = self.wrap(name, func)
+
+    def restore(self):
+        """Put the original functions back."""
+        if self._namespace is None:
+            return
+        for name, original in self._originals.items():
+            if original is None:
+                self._namespace.pop(name, None)
+            else:
+                self._namespace[name] = original
+        self._originals.clear()
+
+    def start(self):
+        """Start the sampler and the run's wall/CPU clocks (call right before sending requests)."""
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self.sampler.start()
+
+    def end_run(self, requests: int):
+        """Mark the end of the request phase; metrics and report writing are still timed afterwards."""
+        self.requests = requests
+        self.run_wall = time.perf_counter() - self._wall_start
+        self.run_cpu = time.process_time() - self._cpu_start
+
+    def stop(self):
+        """Stop sampling, restore the runner's functions and close the totals.
+
+        Safe to call more than once and before start(), so callers can also call it from a finally block.
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        self.sampler.stop()
+        self.restore()
+        if self._wall_start is not None:
+            self.total_wall = time.perf_counter() - self._wall_start
+            self.total_cpu = time.process_time() - self._cpu_start
+
+    def report(self, concurrency: int = 1) -> Dict[str, Any]:
+        """Overhead per request, max sustainable QPS and the per-phase table."""
+        # The sampler's own CPU is in process_time(); it isn't harness work, so take it out
+        sampler_share = self.run_wall / self.total_wall if self.total_wall > 0 else 1.0
+        run_cpu = max(self.run_cpu - self.sampler.cpu_seconds * sampler_share, 0.0)
+        cpu_per_request = run_cpu / self.requests if self.requests else 0.0
+        achieved_qps = self.requests / self.run_wall if self.run_wall > 0 else 0.0
+        max_qps = 1 / cpu_per_request if cpu_per_request > 0 else None
+        outside = self.outside_latency.summary() if self.outside_latency.total_count else None
+
+        client_cpu = None
+        if concurrency == 1 and outside is not None:
+            client_cpu = max(cpu_per_request - outside['mean_seconds'], 0.0)
+
+        phases = {}
+        for name, histogram in sorted(self.phases.items(), key=lambda item: -self.phase_totals[item[0]][0]):
+            if histogram.total_count:
+                total = self.phase_totals[name][0]
+                phases[name] = {
+                    "calls": histogram.total_count,
+                    "total_seconds": total,
+                    "mean_us": total / histogram.total_count * 1e6,
+                    "p99_us": histogram.percentile(99) * 1e6,
+                    "max_us": float(histogram.max_us),
+                }
+
+        return {
+            "requests": self.requests,
+            "concurrency": concurrency,
+            "run_wall_seconds": self.run_wall,
+            "run_cpu_seconds": run_cpu,
+            "achieved_qps": achieved_qps,
+            "cpu_per_request_us": cpu_per_request * 1e6,
+            "max_sustainable_qps": max_qps,
+            "harness_utilization": achieved_qps / max_qps if max_qps else None,
+            "outside_latency_us": {key.replace('_seconds', '_us'): value * 1e6
+                                   for key, value in outside.items() if key.endswith('_seconds')} if outside else None,
+            "client_cpu_inside_latency_us": client_cpu * 1e6 if client_cpu is not None else None,
+            "post_run_seconds": self.total_wall - self.run_wall,
+            "phases": phases,
+            "sampler": {
+                "interval_ms": self.sampler.interval * 1000,
+                "samples": self.sampler.samples,
+                "on_cpu_only": self.sampler.on_cpu_only,
+                "counted": sum(self.sampler.stacks.values()),
+                "cpu_seconds": self.sampler.cpu_seconds,
+                "top_frames": [{"frame": frame, "samples": count} for frame, count in self.sampler.top_frames()],
+            },
+        }
+
+    def write(self, output_dir: Path, report: Dict[str, Any]) -> Tuple[Path, Path, Path]:
+        """Write harness_profile.json, harness_profile.txt and harness_profile.folded."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        json_path = output_dir / "harness_profile.json"
+        text_path = output_dir / "harness_profile.txt"
+        folded_path = output_dir / "harness_profile.folded"
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        with open(text_path, 'w') as f:
+            f.write(format_harness_profile(report))
+        self.sampler.write_folded(folded_path)
+        return json_path, text_path, folded_path
+
+
+def format_harness_profile(report: Dict[str, Any]) -> str:
+    """Text report: overhead per request, harness ceiling and where the harness spends its time."""
+    lines = []
+    lines.append("="*80)
+    lines.append("HARNESS PROFILE")
+    lines.append("="*80)
+    lines.append(f"   Requests:             {report['requests']} in {report['run_wall_seconds']:.2f}s "
+                 f"({report['achieved_qps']:.1f} qps, concurrency {report['concurrency']})")
+
+    outside = report['outside_latency_us']
+    if outside:
+        lines.append(f"   Outside latency:      mean {outside['mean_us']:.0f}µs | P50 {outside['p50_us']:.0f}µs | "
+                     f"P99 {outside['p99_us']:.0f}µs per request (not in latency_seconds)")
+    if report['client_cpu_inside_latency_us'] is not None:
+        lines.append(f"   Inside latency:       ~{report['client_cpu_inside_latency_us']:.0f}µs client CPU per request "
+                     f"(counted in latency_seconds)")
+    lines.append(f"   Harness CPU:          {report['cpu_per_request_us']:.0f}µs per request")
+
+    max_qps = report['max_sustainable_qps']
+    if max_qps:
+        utilization = report['harness_utilization']
+        marker = "❌" if utilization > 0.7 else "⚠️ " if utilization > 0.5 else "✅"
+        lines.append(f"   Max sustainable QPS:  {max_qps:,.0f} (one core)")
+        lines.append(f"   Harness utilization:  {marker} {utilization * 100:.1f}%"
+                     + (" - client-side queueing is inflating latency" if utilization > 0.7 else ""))
+    lines.append(f"   After the run:        {report['post_run_seconds']:.2f}s (metrics and reports)")
+    lines.append("")
+
+    lines.append(f"   {'Phase':<26} {'Calls':>8} {'Total (s)':>10} {'Mean (µs)':>10} {'P99 (µs)':>10} {'Max (µs)':>10}")
+    for name, phase in report['phases'].items():
+        lines.append(f"   {name:<26} {phase['calls']:>8} {phase['total_seconds']:>10.3f} {phase['mean_us']:>10.1f} "
+                     f"{phase['p99_us']:>10.1f} {phase['max_us']:>10.1f}")
+    lines.append("")
+
+    sampler = report['sampler']
+    counted = f"{sampler['counted']} on CPU" if sampler['on_cpu_only'] else "wall clock"
+    lines.append(f"   Sampler: {sampler['samples']} samples every {sampler['interval_ms']:g}ms, {counted} "
+                 f"({sampler['cpu_seconds'] * 1000:.0f}ms sampler CPU). Most self time:")
+    for entry in sampler['top_frames']:
+        share = entry['samples'] / sampler['counted'] * 100 if sampler['counted'] else 0.0
+        lines.append(f"      {share:5.1f}%  {entry['frame']}")
+    lines.append("="*80)
+    return "\n".join(lines)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Streaming Latency Histograms
+
+Fixed-memory, mergeable latency histograms in the style of HdrHistogram. Values
+are recorded in integer microseconds into log-linear buckets: every power-of-two
+range is split into enough linear sub-buckets to keep the requested number of
+significant digits, so a 3-digit histogram reports any percentile within 0.1% of
+the true value while using the same ~180KB whether it holds ten samples or ten
+billion.
+
+    hist = LatencyHistogram()
+    hist.record(0.512)               # seconds, O(1)
+    hist.percentile(99)              # seconds, any percentile on demand
+    hist.merge(other_worker_hist)    # exact merge of counts
+    LatencyHistogram.from_dict(hist.to_dict())   # JSON round-trip
+
+LatencyHistogramSet keeps one histogram for the whole run plus one per
+difficulty tier, expected intent and database, fed directly from the per-query
+result dicts produced by difficulty_stratified_test.py.
+"""
+
+import itertools
+import math
+from array import array
+from typing import Any, Dict, Iterable, Optional
+
+MICROS_PER_SECOND = 1_000_000
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of latencies.
+
+    Args:
+        lowest_trackable_us: Smallest distinguishable value in microseconds (>= 1)
+        highest_trackable_us: Largest trackable value in microseconds; larger values are clamped
+        significant_digits: Decimal digits of precision kept across the range (1-5)
+    """
+
+    def __init__(self, lowest_trackable_us: int = 1, highest_trackable_us: int = 3600 * MICROS_PER_SECOND,
+                 significant_digits: int = 3):
+        if lowest_trackable_us < 1:
+            raise ValueError("lowest_trackable_us must be >= 1")
+        if highest_trackable_us < 2 * lowest_trackable_us:
+            raise ValueError("highest_trackable_us must be >= 2 * lowest_trackable_us")
+        if not 1 <= significant_digits <= 5:
+            raise ValueError("significant_digits must be between 1 and 5")
+
+        self.lowest_trackable_us = lowest_trackable_us
+        self.highest_trackable_us = highest_trackable_us
+        self.significant_digits = significant_digits
+
+        largest_single_unit_value = 2 * 10 ** significant_digits
+        sub_bucket_count_magnitude = math.ceil(math.log2(largest_single_unit_value))
+        self._sub_bucket_half_count_magnitude = sub_bucket_count_magnitude - 1
+        self._unit_magnitude = int(math.floor(math.log2(lowest_trackable_us)))
+        self._sub_bucket_count = 1 << sub_bucket_count_magnitude
+        self._sub_bucket_half_count = self._sub_bucket_count // 2
+        self._sub_bucket_mask = (self._sub_bucket_count - 1) << self._unit_magnitude
+
+        smallest_untrackable = self._sub_bucket_count << self._unit_magnitude
+        bucket_count = 1
+        while smallest_untrackable <= highest_trackable_us:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+
+        self._counts = array('q', [0]) * ((bucket_count + 1) * self._sub_bucket_half_count)
+        self.total_count = 0
+        self.sum_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us: Optional[int] = None
+
+    # Index arithmetic (see HdrHistogram's AbstractHistogram)
+
+    def _counts_index(self, value_us: int) -> int:
+        bucket_index = ((value_us | self._sub_bucket_mask).bit_length()
+                        - self._unit_magnitude - self._sub_bucket_half_count_magnitude - 1)
+        sub_bucket_index = value_us >> (bucket_index + self._unit_magnitude)
+        return ((bucket_index + 1) << self._sub_bucket_half_count_magnitude) + (sub_bucket_index - self._sub_bucket_half_count)
+
+    def _highest_equivalent_value(self, index: int) -> int:
+        bucket_index = (index >> self._sub_bucket_half_count_magnitude) - 1
+        sub_bucket_index = (index & (self._sub_bucket_half_count - 1)) + self._sub_bucket_half_count
+        if bucket_index < 0:
+            sub_bucket_index -= self._sub_bucket_half_count
+            bucket_index = 0
+        lowest = sub_bucket_index << (bucket_index + self._unit_magnitude)
+        return lowest + (1 << (bucket_index + self._unit_magnitude)) - 1
+
+    def _compatible_with(self, other: "LatencyHistogram") -> bool:
+        return (self.lowest_trackable_us == other.lowest_trackable_us
+                and self.highest_trackable_us == other.highest_trackable_us
+                and self.significant_digits == other.significant_digits)
+
+    # Recording
+
+    def record(self, latency_seconds: float, count: int = 1):
+        """Record a latency in seconds. Values outside the trackable range are clamped."""
+        value_us = int(round(latency_seconds * MICROS_PER_SECOND))
+        value_us = min(max(value_us, self.lowest_trackable_us), self.highest_trackable_us)
+
+        self._counts[self._counts_index(value_us)] += count
+        self.total_count += count
+        self.sum_us += value_us * count
+        if self.min_us is None or value_us < self.min_us:
+            self.min_us = value_us
+        if self.max_us is None or value_us > self.max_us:
+            self.max_us = value_us
+
+    def record_many(self, latencies_seconds: Iterable[float]):
+        """Record every latency in an iterable of seconds."""
+        for latency in latencies_seconds:
+            self.record(latency)
+
+    def record_array(self, latencies_seconds):
+        """Record a NumPy array of latencies in seconds in one vectorized step.
+
+        Produces exactly the same counts as calling record() on every value, but
+        without a Python-level loop. NumPy is only imported here, so plain
+        record() users don't need it installed.
+        """
+        self.record_indexed(*self.bucket_indexes(latencies_seconds))
+
+    def bucket_indexes(self, latencies_seconds):
+        """(clamped microsecond values, count indexes) for a NumPy array of latencies in seconds.
+
+        The indexes are valid for any histogram with the same range and
+        precision, so slices of one array can be recorded into several
+        histograms with record_indexed() without recomputing them.
+        """
+        import numpy as np
+
+        values = np.rint(np.asarray(latencies_seconds, dtype=np.float64) * MICROS_PER_SECOND).astype(np.int64)
+        values = np.clip(values, self.lowest_trackable_us, self.highest_trackable_us)
+
+        # frexp's exponent of an exactly representable integer is its bit_length()
+        _, bit_lengths = np.frexp((values | self._sub_bucket_mask).astype(np.float64))
+        bucket_index = bit_lengths.astype(np.int64) - self._unit_magnitude - self._sub_bucket_half_count_magnitude - 1
+        sub_bucket_index = values >> (bucket_index + self._unit_magnitude)
+        indexes = ((bucket_index + 1) << self._sub_bucket_half_count_magnitude) + (sub_bucket_index - self._sub_bucket_half_count)
+        return values, indexes
+
+    def record_indexed(self, values, indexes):
+        """Record values already converted by bucket_indexes()."""
+        import numpy as np
+
+        if values.size == 0:
+            return
+        counts = np.bincount(indexes, minlength=len(self._counts))
+        for index in np.flatnonzero(counts):
+            self._counts[index] += int(counts[index])
+
+        self.total_count += int(values.size)
+        self.sum_us += int(values.sum())
+        low, high = int(values.min()), int(values.max())
+        self.min_us = low if self.min_us is None else min(self.min_us, low)
+        self.max_us = high if self.max_us is None else max(self.max_us, high)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Add another histogram's counts into this one (in place) and return self."""
+        if not self._compatible_with(other):
+            raise ValueError("Cannot merge histograms with different ranges or precision")
+
+        for index, count in enumerate(other._counts):
+            if count:
+                self._counts[index] += count
+        self.total_count += other.total_count
+        self.sum_us += other.sum_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+            self.max_us = other.max_us if self.max_us is None else max(self.max_us, other.max_us)
+        return self
+
+    # Queries (all in seconds)
+
+    def percentile(self, pct: float) -> float:
+        """Return the latency at a percentile (0-100), or 0.0 if nothing was recorded."""
+        if self.total_count == 0:
+            return 0.0
+
+        target = max(1, math.ceil(min(max(pct, 0.0), 100.0) / 100 * self.total_count))
+        running = 0
+        for index, count in enumerate(self._counts):
+            running += count
+            if running >= target:
+                value_us = min(max(self._highest_equivalent_value(index), self.min_us), self.max_us)
+                return value_us / MICROS_PER_SECOND
+
+        return self.max_us / MICROS_PER_SECOND
+
+    @property
+    def mean(self) -> float:
+        return self.sum_us / self.total_count / MICROS_PER_SECOND if self.total_count else 0.0
+
+    @property
+    def min(self) -> float:
+        return self.min_us / MICROS_PER_SECOND if self.min_us is not None else 0.0
+
+    @property
+    def max(self) -> float:
+        return self.max_us / MICROS_PER_SECOND if self.max_us is not None else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Return count, mean, min, max and P50/P90/P99 in seconds."""
+        return {
+            "count": self.total_count,
+            "p50_seconds": self.percentile(50),
+            "p90_seconds": self.percentile(90),
+            "p99_seconds": self.percentile(99),
+            "mean_seconds": self.mean,
+            "min_seconds": self.min,
+            "max_seconds": self.max
+        }
+
+    # Serialization
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to a JSON-friendly dict holding only the non-empty buckets."""
+        return {
+            "lowest_trackable_us": self.lowest_trackable_us,
+            "highest_trackable_us": self.highest_trackable_us,
+            "significant_digits": self.significant_digits,
+            "total_count": self.total_count,
+            "sum_us": self.sum_us,
+            "min_us": self.min_us,
+            "max_us": self.max_us,
+            "counts": [[index, count] for index, count in zip(itertools.compress(itertools.count(), self._counts),
+                                                               itertools.compress(self._counts, self._counts))]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        """Rebuild a histogram serialized by to_dict()."""
+        hist = cls(data['lowest_trackable_us'], data['highest_trackable_us'], data['significant_digits'])
+        for index, count in data['counts']:
+            hist._counts[index] = count
+        hist.total_count = data['total_count']
+        hist.sum_us = data['sum_us']
+        hist.min_us = data['min_us']
+        hist.max_us = data['max_us']
+        return hist
+
+
+class LatencyHistogramSet:
+    """One latency histogram for a run, plus slices by difficulty, intent and database."""
+
+    DIMENSIONS = ('difficulty', 'intent', 'database')
+
+    def __init__(self, **histogram_options):
+        self._options = histogram_options
+        self.overall = LatencyHistogram(**histogram_options)
+        self.slices: Dict[str, Dict[str, LatencyHistogram]] = {dim: {} for dim in self.DIMENSIONS}
+
+    def slice(self, dimension: str, value: str) -> LatencyHistogram:
+        """Return (creating if needed) the histogram for one slice, e.g. ('difficulty', 'hard')."""
+        histograms = self.slices[dimension]
+        if value not in histograms:
+            histograms[value] = LatencyHistogram(**self._options)
+        return histograms[value]
+
+    def record_result(self, result: Dict[str, Any]):
+        """Record one per-query result dict. Only successful queries are recorded,
+        matching the latency section of calculate_metrics()."""
+        if result.get('status') != 'success':
+            return
+
+        latency = result['latency_seconds']
+        self.overall.record(latency)
+        self.slice('difficulty', result.get('difficulty', 'unknown')).record(latency)
+        self.slice('intent', result.get('expected_intent', 'unknown')).record(latency)
+        for db in result.get('databases_used', []):
+            self.slice('database', db).record(latency)
+
+    def merge(self, other: "LatencyHistogramSet") -> "LatencyHistogramSet":
+        """Merge another set (e.g. from another worker) into this one and return self."""
+        self.overall.merge(other.overall)
+        for dimension, histograms in other.slices.items():
+            for value, hist in histograms.items():
+                self.slice(dimension, value).merge(hist)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "overall": self.overall.to_dict(),
+            "slices": {
+                dimension: {value: hist.to_dict() for value, hist in histograms.items()}
+                for dimension, histograms in self.slices.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogramSet":
+        overall = LatencyHistogram.from_dict(data['overall'])
+        hist_set = cls(
+            lowest_trackable_us=overall.lowest_trackable_us,
+            highest_trackable_us=overall.highest_trackable_us,
+            significant_digits=overall.significant_digits
+        )
+        hist_set.overall = overall
+        for dimension, histograms in data['slices'].items():
+            for value, hist in histograms.items():
+                hist_set.slices.setdefault(dimension, {})[value] = LatencyHistogram.from_dict(hist)
+        return hist_set
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Production Log Import and Timing-Faithful Replay
+
+Turns production query logs into test material and replays them against the
+API at their original pace (or sped up), so capacity tests see the real
+traffic mix and arrival pattern instead of a handwritten suite at a synthetic
+rate.
+
+`import` reads a query log and writes two files:
+
+    <output>.json          a standard test suite (see suite_loader.py) of the queries that carry an
+                           intent label, usable by every other runner
+    <output>.trace.jsonl   every query in arrival order, labeled or not, one JSON object per line:
+                           {"offset_seconds": 12.873, "id": "log-000042", "query": "...",
+                            "intent": "graph" | null, "difficulty": "hard" | null}
+
+Logs are JSON Lines (.jsonl / .ndjson / .log), a JSON array (.json) or CSV
+(.csv), optionally gzipped (.gz). Field names are detected from common
+spellings (query / q / text, timestamp / ts / time, intent / label) or given
+explicitly. Timestamps may be ISO 8601 strings or epoch seconds/milliseconds.
+
+`replay` dispatches a trace with open_loop_test.py's scheduler: each request
+goes out at its original offset divided by --speed, whether or not earlier
+requests have returned, and latency is charged from that intended send time.
+Accuracy, tier and confusion outputs cover the labeled queries; throughput
+windows, latency and dispatch lag cover all traffic.
+
+Usage:
+    python3 log_replay.py import /var/log/query-api/queries-2025-11-03.jsonl.gz --output ../test-suites/prod-2025-11-03.json
+    python3 log_replay.py import access.csv --output prod.json --query-field q --time-field ts --since 2025-11-03T09:00 --until 2025-11-03T10:00
+    python3 log_replay.py replay ../test-suites/prod-2025-11-03.trace.jsonl --speed 10
+    python3 log_replay.py replay prod.trace.jsonl --speed 1 --start 1800 --duration 600 --max-gap 5
+
+Arguments (import):
+    LOG                     Query log file
+    --output PATH           Suite path to write; the trace goes next to it as <name>.trace.jsonl
+    --query-field NAME      Log field with the query text (default: auto-detect)
+    --time-field NAME       Log field with the request time (default: auto-detect)
+    --intent-field NAME     Log field with a verified intent label (default: auto-detect)
+    --difficulty-field NAME Log field with a difficulty tier (default: auto-detect)
+    --default-difficulty T  Tier for labeled queries without one (default: medium)
+    --since / --until TIME  Only import requests in this time range (ISO 8601 or epoch seconds;
+                            times without an offset are local time, while log timestamps
+                            ending in Z are UTC)
+    --limit N               Import at most N requests
+
+Arguments (replay):
+    TRACE                   Trace written by `import`
+    --speed FACTOR          Replay speed-up, e.g. 10 replays an hour in 6 minutes (default: 1)
+    --start / --duration S  Replay only this slice of the trace, in original seconds
+    --max-gap SECONDS       Shorten idle gaps longer than this (original seconds) to this length
+    --window SECONDS        Reporting window length in replay seconds (default: 10)
+    --connections N         HTTP connection pool size (default: 100)
+    --timeout SECONDS       Per-request timeout (default: 30)
+    --latency-slo SECONDS   P99 latency above which a window counts as saturated (default: 2.0)
+    --api-base URL          Base URL of the query API (default: http://localhost:8000)
+    --output-dir PATH       Where to write results (default: <RESULTS_DIR>/replay)
+
+Outputs (replay):
+    - stratified_results.json: Per-query results (unlabeled ones have expected_intent null)
+    - stratified_summary.txt: Standard summary for labeled queries, plus replay and throughput tables
+    - confusion_matrix.txt: Intent prediction confusion analysis (labeled queries)
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import sys
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from difficulty_stratified_test import (
+    API_BASE,
+    RESULTS_DIR,
+    api_endpoints,
+    calculate_metrics,
+    check_api_health,
+    format_confusion_matrix,
+    format_summary,
+    save_reports,
+)
+from metrics_aggregator import DIFFICULTIES, INTENTS
+from open_loop_test import build_windows, calculate_open_loop_metrics, format_open_loop_report, run_open_loop
+
+FIELD_CANDIDATES = {
+    "query": ("query", "q", "query_text", "text", "question"),
+    "time": ("timestamp", "ts", "time", "@timestamp", "received_at", "created_at", "datetime"),
+    "intent": ("intent", "expected_intent", "label", "intent_label", "verified_intent"),
+    "difficulty": ("difficulty", "difficulty_tier", "tier"),
+}
+TRACE_SUFFIX = ".trace.jsonl"
+
+
+def _open_text(path: Path):
+    """Open a possibly gzipped text file."""
+    if path.suffix == '.gz':
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_log_records(path: Path, skipped: Counter) -> Iterator[Dict[str, Any]]:
+    """Raw log records as dicts, by file type; unparseable lines are counted in skipped."""
+    kind = Path(path.stem).suffix if path.suffix == '.gz' else path.suffix
+    with _open_text(path) as f:
+        if kind == '.csv':
+            yield from csv.DictReader(f)
+        elif kind == '.json':
+            data = json.load(f)
+            records = data.get('queries', data.get('records', [])) if isinstance(data, dict) else data
+            yield from (record for record in records if isinstance(record, dict))
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    skipped['invalid JSON line'] += 1
+                    continue
+                if isinstance(record, dict):
+                    yield record
+                else:
+                    skipped['not a JSON object'] += 1
+
+
+def detect_fields(record: Dict[str, Any], overrides: Dict[str, Optional[str]],
+                  fields: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Optional[str]]:
+    """Pick the log field for query, time, intent and difficulty.
+
+    Roles already found in `fields` are kept; the others are looked up in
+    this record, so each field comes from the first record that has it
+    (labels are often present on only some records).
+    """
+    fields = dict(fields or {})
+    for role, candidates in FIELD_CANDIDATES.items():
+        if fields.get(role):
+            continue
+        if overrides.get(role):
+            fields[role] = overrides[role]
+        else:
+            fields[role] = next((name for name in candidates if name in record), None)
+    return fields
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Epoch seconds from an ISO 8601 string or an epoch number in seconds or milliseconds.
+
+    ISO times without an offset are read as local time; a Z suffix or explicit offset is honored.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            try:
+                return datetime.fromisoformat(value.strip().replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                return None
+    if isinstance(value, (int, float)):
+        # Epoch milliseconds are ~1.7e12 today, epoch seconds ~1.7e9
+        return float(value) / 1000 if value > 1e11 else float(value)
+    return None
+
+
+def read_log(path: Path, overrides: Dict[str, Optional[str]], default_difficulty: str,
+             since: Optional[float] = None, until: Optional[float] = None,
+             limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Optional[str]], Counter]:
+    """Timestamped queries from a log, sorted by arrival, with labels where the log has valid ones.
+
+    Returns (entries, detected fields, skipped-reason counts). Entries are
+    {time, query, intent, difficulty}; intent and difficulty are None for
+    unlabeled queries.
+    """
+    skipped: Counter = Counter()
+    entries = []
+    fields: Dict[str, Optional[str]] = {}
+
+    for record in iter_log_records(path, skipped):
+        if not all(fields.get(role) for role in FIELD_CANDIDATES):
+            fields = detect_fields(record, overrides, fields)
+
+        query = record.get(fields['query']) if fields['query'] else None
+        if not isinstance(query, str) or not query.strip():
+            skipped['no query text'] += 1
+            continue
+        timestamp = parse_timestamp(record.get(fields['time'])) if fields['time'] else None
+        if timestamp is None:
+            skipped['unparseable timestamp'] += 1
+            continue
+        if (since is not None and timestamp < since) or (until is not None and timestamp >= until):
+            continue
+
+        intent = record.get(fields['intent']) if fields['intent'] else None
+        intent = (intent.strip().lower() or None) if isinstance(intent, str) else None
+        if intent is not None and intent not in INTENTS:
+            skipped["unknown intent label (kept unlabeled)"] += 1
+            intent = None
+        difficulty = record.get(fields['difficulty']) if fields['difficulty'] else None
+        difficulty = difficulty.strip().lower() if isinstance(difficulty, str) else None
+        if intent is None:
+            difficulty = None
+        elif difficulty not in DIFFICULTIES:
+            difficulty = default_difficulty
+
+        entries.append({"time": timestamp, "query": query.strip(), "intent": intent, "difficulty": difficulty})
+
+    # Logs are usually but not strictly time-ordered (multiple writers); stable sort keeps ties in log order
+    entries.sort(key=lambda entry: entry['time'])
+    if limit is not None:
+        entries = entries[:limit]
+    return entries, fields, skipped
+
+
+def traffic_profile(offsets: List[float]) -> Dict[str, Any]:
+    """Arrival statistics of a trace: span, mean and peak rate, inter-arrival percentiles."""
+    if not offsets:
+        return {"requests": 0}
+    times = np.asarray(offsets)
+    span = float(times[-1] - times[0])
+    per_second = np.bincount((times - times[0]).astype(np.int64))
+    gaps = np.diff(times)
+    return {
+        "requests": len(offsets),
+        "span_seconds": span,
+        "mean_qps": len(offsets) / span if span > 0 else float(len(offsets)),
+        "peak_qps_1s": int(per_second.max()),
+        "interarrival_p50_seconds": float(np.percentile(gaps, 50)) if gaps.size else 0.0,
+        "interarrival_p99_seconds": float(np.percentile(gaps, 99)) if gaps.size else 0.0,
+        "max_gap_seconds": float(gaps.max()) if gaps.size else 0.0,
+    }
+
+
+def write_import(entries: List[Dict[str, Any]], output: Path, source: Path,
+                 default_difficulty: str) -> Tuple[Path, Path, Dict[str, Any]]:
+    """Write the labeled suite and the full trace. Returns (suite path, trace path, suite metadata)."""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    trace_path = output.with_name(output.stem + TRACE_SUFFIX)
+    start = entries[0]['time'] if entries else 0.0
+    width = max(6, len(str(len(entries))))
+
+    queries = []
+    with open(trace_path, 'w') as f:
+        for position, entry in enumerate(entries, 1):
+            query_id = f"log-{position:0{width}d}"
+            offset = round(entry['time'] - start, 6)
+            f.write(json.dumps({"offset_seconds": offset, "id": query_id, "query": entry['query'],
+                                "intent": entry['intent'], "difficulty": entry['difficulty']}) + "\n")
+            if entry['intent'] is not None:
+                queries.append({
+                    "id": query_id,
+                    "query": entry['query'],
+                    "intent": entry['intent'],
+                    "difficulty": entry['difficulty'],
+                    "difficulty_rationale": "Imported from production log",
+                    "offset_seconds": offset
+                })
+
+    metadata = {
+        "version": "1.0.0",
+        "created": datetime.now().strftime('%Y-%m-%d'),
+        "description": f"Labeled production queries imported from {source.name}; "
+                       f"the full arrival-ordered traffic is in {trace_path.name}",
+        "source_log": str(source),
+        "trace": trace_path.name,
+        "log_start": datetime.fromtimestamp(start).isoformat() if entries else None,
+        "total_queries": len(queries),
+        "unlabeled_queries": len(entries) - len(queries),
+        "default_difficulty": default_difficulty,
+        "difficulty_distribution": {tier: sum(q['difficulty'] == tier for q in queries)
+                                    for tier in DIFFICULTIES},
+        "intent_distribution": {intent: sum(q['intent'] == intent for q in queries) for intent in INTENTS},
+        "traffic": traffic_profile([entry['time'] - start for entry in entries])
+    }
+    with open(output, 'w') as f:
+        json.dump({"metadata": metadata, "queries": queries}, f, indent=2)
+    return output, trace_path, metadata
+
+
+def load_trace(path: Path, start: float = 0.0, duration: Optional[float] = None,
+               max_gap: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Trace entries in a slice of original time, rebased to offset 0, with long idle gaps optionally shortened.
+
+    Each entry keeps its original offset as trace_offset_seconds; offset_seconds
+    becomes the (gap-shortened) offset used for scheduling.
+    """
+    end = start + duration if duration is not None else float('inf')
+    entries = []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if start <= entry['offset_seconds'] < end:
+                    entries.append(entry)
+
+    previous_original = None
+    offset = 0.0
+    for entry in entries:
+        original = entry['offset_seconds']
+        if previous_original is not None:
+            gap = original - previous_original
+            offset += min(gap, max_gap) if max_gap is not None else gap
+        previous_original = original
+        entry['trace_offset_seconds'] = original
+        entry['offset_seconds'] = offset
+    return entries
+
+
+def calculate_replay_metrics(results: List[Dict[str, Any]], trace: List[Dict[str, Any]],
+                             speed: float) -> Dict[str, Any]:
+    """Replay-specific section: labeled share, predicted traffic mix, all-traffic latency and timing fidelity."""
+    success = [r for r in results if r['status'] == 'success']
+    latencies = np.array([r['latency_seconds'] for r in success]) if success else np.zeros(0)
+    lags = np.array([r['send_lag_seconds'] for r in results]) if results else np.zeros(0)
+    predicted = Counter(r.get('actual_intent', 'unknown') for r in success)
+    unlabeled_predicted = Counter(r.get('actual_intent', 'unknown') for r in success if r['expected_intent'] is None)
+
+    return {
+        "speed": speed,
+        "requests": len(results),
+        "labeled": sum(r['expected_intent'] is not None for r in results),
+        "unlabeled": sum(r['expected_intent'] is None for r in results),
+        "errors": len(results) - len(success),
+        "trace_span_seconds": (trace[-1]['trace_offset_seconds'] - trace[0]['trace_offset_seconds']) if trace else 0.0,
+        "scheduled_span_seconds": (trace[-1]['offset_seconds'] / speed) if trace else 0.0,
+        "predicted_intent_mix": {intent: predicted[intent] for intent in list(INTENTS) + ['unknown'] if predicted[intent]},
+        "unlabeled_predicted_mix": {intent: unlabeled_predicted[intent]
+                                    for intent in list(INTENTS) + ['unknown'] if unlabeled_predicted[intent]},
+        "latency_all": {
+            "p50_seconds": float(np.percentile(latencies, 50)) if latencies.size else None,
+            "p90_seconds": float(np.percentile(latencies, 90)) if latencies.size else None,
+            "p99_seconds": float(np.percentile(latencies, 99)) if latencies.size else None,
+        },
+        "dispatch_lag": {
+            "p50_ms": float(np.percentile(lags, 50) * 1000) if lags.size else 0.0,
+            "p99_ms": float(np.percentile(lags, 99) * 1000) if lags.size else 0.0,
+            "max_ms": float(lags.max() * 1000) if lags.size else 0.0,
+            "within_10ms": float((lags <= 0.010).mean() * 100) if lags.size else 100.0,
+        },
+    }
+
+
+def format_replay_report(replay: Dict[str, Any]) -> str:
+    """Replay summary: traffic, predicted mix, all-traffic latency and how faithfully arrivals were reproduced."""
+    lines = []
+    lines.append("="*80)
+    lines.append(f"PRODUCTION LOG REPLAY ({replay['speed']:g}x)")
+    lines.append("="*80)
+    lines.append(f"   Requests:           {replay['requests']} ({replay['labeled']} labeled, "
+                 f"{replay['unlabeled']} unlabeled, {replay['errors']} errors)")
+    lines.append(f"   Trace span:         {replay['trace_span_seconds']:.1f}s original → "
+                 f"{replay['scheduled_span_seconds']:.1f}s replayed")
+    if replay['labeled'] and replay['unlabeled']:
+        lines.append("   Accuracy, tier and confusion sections above cover labeled queries only")
+    mix = replay['predicted_intent_mix']
+    total = sum(mix.values())
+    if total:
+        lines.append("   Predicted mix:      " + ", ".join(f"{intent} {count / total * 100:.1f}%"
+                                                           for intent, count in mix.items()))
+    latency = replay['latency_all']
+    if latency['p50_seconds'] is not None:
+        lines.append(f"   Latency (all):      P50 {latency['p50_seconds']:.3f}s | P90 {latency['p90_seconds']:.3f}s"
+                     f" | P99 {latency['p99_seconds']:.3f}s")
+    lag = replay['dispatch_lag']
+    lines.append(f"   Dispatch lag:       P50 {lag['p50_ms']:.1f}ms | P99 {lag['p99_ms']:.1f}ms | "
+                 f"max {lag['max_ms']:.1f}ms | {lag['within_10ms']:.1f}% within 10ms of the original timing")
+    lines.append("="*80)
+    return "\n".join(lines)
+
+
+def run_import(args: argparse.Namespace) -> int:
+    log_path = Path(args.log)
+    if not log_path.exists():
+        print(f"❌ Log not found: {log_path}")
+        return 1
+
+    overrides = {"query": args.query_field, "time": args.time_field, "intent": args.intent_field,
+                 "difficulty": args.difficulty_field}
+    since = parse_timestamp(args.since) if args.since else None
+    until = parse_timestamp(args.until) if args.until else None
+
+    print(f"📖 Reading {log_path}")
+    entries, fields, skipped = read_log(log_path, overrides, args.default_difficulty, since, until, args.limit)
+    if not fields.get('query') or not fields.get('time'):
+        print(f"❌ Could not find the query text and timestamp fields (detected: {fields}); "
+              f"use --query-field / --time-field")
+        return 1
+    print("   Fields: " + ", ".join(f"{role}={name or '-'}" for role, name in fields.items()))
+    for reason, count in skipped.most_common():
+        print(f"   ⚠️  {count} records: {reason}")
+    if not entries:
+        print("❌ No requests to import")
+        return 1
+
+    suite_path, trace_path, metadata = write_import(entries, Path(args.output), log_path, args.default_difficulty)
+    traffic = metadata['traffic']
+    print(f"✅ {len(entries)} requests over {traffic['span_seconds']:.0f}s "
+          f"(mean {traffic['mean_qps']:.2f} qps, peak {traffic['peak_qps_1s']} in 1s, "
+          f"P99 gap {traffic['interarrival_p99_seconds']:.2f}s)")
+    print(f"✅ Suite ({metadata['total_queries']} labeled queries): {suite_path}")
+    print("   " + ", ".join(f"{intent} {count}" for intent, count in metadata['intent_distribution'].items()))
+    if fields.get('intent') and not metadata['total_queries']:
+        print(f"⚠️  The log has an intent field ({fields['intent']}) but no record carried a valid label; "
+              f"check --intent-field")
+    print(f"✅ Trace ({len(entries)} requests, {metadata['unlabeled_queries']} unlabeled): {trace_path}")
+    return 0
+
+
+def run_replay(args: argparse.Namespace) -> int:
+    trace_path = Path(args.trace)
+    if not trace_path.exists():
+        print(f"❌ Trace not found: {trace_path}")
+        return 1
+
+    trace = load_trace(trace_path, args.start, args.duration, args.max_gap)
+    if not trace:
+        print("❌ No requests in the selected slice of the trace")
+        return 1
+    offsets = [entry['offset_seconds'] / args.speed for entry in trace]
+    query_endpoint, health_endpoint = api_endpoints(args.api_base)
+
+    print("🚀 Starting Production Log Replay")
+    print("="*80)
+    print(f"   Trace: {trace_path.name}")
+    print(f"   Requests: {len(trace)} ({sum(e['intent'] is not None for e in trace)} labeled)")
+    print(f"   Speed: {args.speed:g}x → {offsets[-1]:.1f}s of traffic")
+    print("="*80)
+    print("")
+
+    if not check_api_health(health_endpoint):
+        print("\n❌ API is not healthy. Exiting.")
+        return 1
+
+    print("🧪 Replaying traffic...")
+    results, run_duration = asyncio.run(
+        run_open_loop(trace, offsets, args.connections, args.timeout, query_endpoint)
+    )
+    for result, entry in zip(results, trace):
+        result['trace_offset_seconds'] = entry['trace_offset_seconds']
+
+    print(f"\n⏱️  Completed {len(results)} queries in {run_duration:.2f}s")
+    print("\n📊 Calculating metrics...")
+
+    labeled = [r for r in results if r['expected_intent'] is not None]
+    metrics = calculate_metrics(labeled) if labeled else {"error": "No labeled queries"}
+    # The last request owns one mean inter-arrival gap, so the final window is not a sliver holding one request
+    gap = offsets[-1] / (len(offsets) - 1) if len(offsets) > 1 and offsets[-1] > 0 else args.window
+    span = offsets[-1] + gap
+    metrics['open_loop'] = calculate_open_loop_metrics(
+        results, build_windows([(0.0, 0.0, span)], args.window), args.latency_slo
+    )
+    metrics['replay'] = calculate_replay_metrics(results, trace, args.speed)
+
+    test_run = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "replay",
+        "total_queries": len(results),
+        "test_suite": str(trace_path),
+        "api_endpoint": query_endpoint,
+        "speed": args.speed,
+        "trace_start_seconds": args.start,
+        "trace_duration_seconds": args.duration,
+        "max_gap_seconds": args.max_gap,
+        "connections": args.connections,
+        "duration_seconds": run_duration,
+        "throughput_qps": len(results) / run_duration if run_duration > 0 else 0.0
+    }
+    reports = [format_replay_report(metrics['replay']), format_open_loop_report(metrics['open_loop'])]
+    if labeled:
+        reports.insert(0, format_summary(metrics))
+    summary = "\n\n".join(reports)
+    confusion_text = format_confusion_matrix(metrics['confusion_matrix']) if labeled else "No labeled queries\n"
+    save_reports(Path(args.output_dir), test_run, results, metrics, summary, confusion_text)
+    print("")
+
+    print(summary)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import production query logs and replay them with their original timing')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    importer = subparsers.add_parser('import', help='Convert a query log into a suite and a replay trace')
+    importer.add_argument('log', type=str, help='Query log (.jsonl, .json or .csv, optionally .gz)')
+    importer.add_argument('--output', type=str, required=True, help='Suite path; the trace is written next to it')
+    importer.add_argument('--query-field', type=str, help='Log field with the query text (default: auto-detect)')
+    importer.add_argument('--time-field', type=str, help='Log field with the request time (default: auto-detect)')
+    importer.add_argument('--intent-field', type=str, help='Log field with a verified intent (default: auto-detect)')
+    importer.add_argument('--difficulty-field', type=str, help='Log field with a difficulty tier (default: auto-detect)')
+    importer.add_argument('--default-difficulty', choices=DIFFICULTIES, default='medium',
+                          help='Tier for labeled queries without one (default: medium)')
+    importer.add_argument('--since', type=str, help='Only import requests at or after this time (ISO 8601 or epoch; naive times are local)')
+    importer.add_argument('--until', type=str, help='Only import requests before this time (ISO 8601 or epoch; naive times are local)')
+    importer.add_argument('--limit', type=int, help='Import at most N requests')
+
+    replay = subparsers.add_parser('replay', help='Replay a trace against the API')
+    replay.add_argument('trace', type=str, help=f'Trace written by import (*{TRACE_SUFFIX})')
+    replay.add_argument('--speed', type=float, default=1.0, help='Speed-up factor (default: 1 = original timing)')
+    replay.add_argument('--start', type=float, default=0.0, help='Start of the slice to replay, in trace seconds')
+    replay.add_argument('--duration', type=float, help='Length of the slice to replay, in trace seconds')
+    replay.add_argument('--max-gap', type=float, help='Shorten idle gaps longer than this many trace seconds')
+    replay.add_argument('--window', type=float, default=10, help='Reporting window in replay seconds (default: 10)')
+    replay.add_argument('--connections', type=int, default=100, help='HTTP connection pool size (default: 100)')
+    replay.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+    replay.add_argument('--latency-slo', type=float, default=2.0,
+                        help='P99 latency in seconds above which a window counts as saturated (default: 2.0)')
+    replay.add_argument('--api-base', type=str, default=API_BASE, help=f'Base URL of the query API (default: {API_BASE})')
+    replay.add_argument('--output-dir', type=str, default=str(RESULTS_DIR / "replay"),
+                        help='Directory for result files (default: <RESULTS_DIR>/replay)')
+
+    args = parser.parse_args()
+    if args.command == 'replay' and args.speed <= 0:
+        parser.error('--speed must be positive')
+    if args.command == 'replay' and args.window <= 0:
+        parser.error('--window must be positive')
+    if args.command == 'import':
+        for option in ('since', 'until'):
+            value = getattr(args, option)
+            if value is not None and parse_timestamp(value) is None:
+                parser.error(f'--{option}: cannot parse {value!r} as an ISO 8601 time or epoch seconds')
+
+    sys.exit(run_import(args) if args.command == 'import' else run_replay(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Columnar Metrics Aggregation
+
+Builds every metric section reported by difficulty_stratified_test.py from a
+compact columnar copy of the per-query results. The result dicts are read once,
+a chunk at a time, into NumPy columns (interned codes for status, difficulty,
+intents and databases; a float64 latency column; CSR-style database membership
+and server stage timing lists) with one np.fromiter pass per field,
+after which each section is a handful of vectorized bincounts, masks and sorts
+instead of one list comprehension per tier, intent and tier×intent slice.
+
+The output is identical to the original list-based calculate_metrics(),
+including float values: percentiles use the same interpolation as
+statistics.quantiles() and means are correctly rounded like statistics.mean().
+
+    columns = ResultColumns.from_results(results)
+    metrics = aggregate_metrics(columns)
+"""
+
+import itertools
+import math
+import operator
+from fractions import Fraction
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from latency_histogram import LatencyHistogramSet
+from server_timing import DATABASE_STAGES
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+INTENTS = ['graph', 'temporal', 'semantic', 'metadata']
+_EXACT_SUM_SLICE = 1 << 25
+
+
+class _Interner:
+    """Map strings to small integer codes in first-seen order."""
+
+    __slots__ = ('codes', 'values')
+
+    def __init__(self, initial: Optional[List[str]] = None):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+        for value in initial or []:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ResultColumns:
+    """Columnar storage for per-query result dicts.
+
+    Rows are taken in chunks of CHUNK_ROWS dicts (so a streaming reader never
+    materializes more than one chunk) and each chunk is converted field by
+    field with np.fromiter over C-level map()s rather than per-row list
+    appends. Chunks are kept small enough that their dicts stay in the CPU
+    cache across the per-field passes; with 65536-row chunks every pass
+    went back to main memory and conversion took ~1.5x as long. finalize() concatenates the chunks. Query text and rationale are
+    only kept for the first few failures, which are all the failure examples
+    need, so memory per row stays a few dozen bytes.
+    """
+
+    MAX_FAILURE_EXAMPLES = 10
+    CHUNK_ROWS = 2048
+
+    def __init__(self):
+        self.statuses = _Interner(['success'])
+        self.difficulties = _Interner(DIFFICULTIES)
+        self.intents = _Interner(INTENTS)
+        self.databases = _Interner()
+        self.stages = _Interner()
+
+        self._pending: List[Dict[str, Any]] = []
+        self._chunks: Dict[str, List[np.ndarray]] = {field: [] for field in self._FIELDS}
+        self._rows = 0
+        self.failure_text: Dict[int, Tuple[str, str]] = {}
+
+        self.finalized = False
+
+    _FIELDS = {
+        'status': np.int16, 'difficulty': np.int16, 'expected': np.int16, 'actual': np.int16,
+        'correct': bool, 'cached': bool, 'latency': np.float64,
+        'db_rows': np.int64, 'db_codes': np.int32,
+        'stage_rows': np.int64, 'stage_codes': np.int32, 'stage_seconds': np.float64,
+    }
+
+    def __len__(self) -> int:
+        return self._rows + len(self._pending) if not self.finalized else int(self.status.size)
+
+    def append(self, result: Dict[str, Any]):
+        """Add one result dict as a row (converted with the rest of its chunk)."""
+        self._pending.append(result)
+        if len(self._pending) >= self.CHUNK_ROWS:
+            self._flush()
+
+    def extend(self, results: Iterable[Dict[str, Any]]):
+        """Add every result dict from an iterable, a chunk at a time."""
+        self._flush()
+        iterator = iter(results)
+        while chunk := list(itertools.islice(iterator, self.CHUNK_ROWS)):
+            self._add_chunk(chunk)
+
+    def _flush(self):
+        if self._pending:
+            chunk, self._pending = self._pending, []
+            self._add_chunk(chunk)
+
+    @staticmethod
+    def _codes(interner: _Interner, values, dtype, count: int, none_code: Optional[int] = None) -> np.ndarray:
+        """Codes for a chunk of strings, interning any new ones in first-seen order.
+
+        values is a zero-argument callable returning a fresh iterator, so the
+        common case (every value already interned) is one C-level pass.
+        """
+        while True:
+            lookup = interner.codes if none_code is None else {**interner.codes, None: none_code}
+            try:
+                return np.fromiter(map(lookup.__getitem__, values()), dtype=dtype, count=count)
+            except KeyError:
+                for value in dict.fromkeys(values()):
+                    if value not in lookup:
+                        interner.code(value)
+
+    def _add_chunk(self, chunk: List[Dict[str, Any]]):
+        n = len(chunk)
+        first_row = self._rows
+
+        def get(key: str, default: Any):
+            return lambda: map(dict.get, chunk, itertools.repeat(key), itertools.repeat(default))
+
+        columns = {
+            'status': self._codes(self.statuses, lambda: map(operator.itemgetter('status'), chunk), np.int16, n),
+            'difficulty': self._codes(self.difficulties, get('difficulty', 'unknown'), np.int16, n),
+            'expected': self._codes(self.intents, get('expected_intent', 'unknown'), np.int16, n),
+            'actual': self._codes(self.intents, get('actual_intent', None), np.int16, n, none_code=-1),
+            'correct': np.fromiter(get('intent_correct', False)(), dtype=bool, count=n),
+            'cached': np.fromiter(get('cached', False)(), dtype=bool, count=n),
+            'latency': np.fromiter(map(operator.itemgetter('latency_seconds'), chunk), dtype=np.float64, count=n),
+        }
+
+        # CSR-style lists: one entry per (row, database) and per (row, stage)
+        rows = np.arange(first_row, first_row + n, dtype=np.int64)
+        databases = list(get('databases_used', ())())
+        lengths = np.fromiter(map(len, databases), dtype=np.int64, count=n)
+        columns['db_rows'] = np.repeat(rows, lengths)
+        columns['db_codes'] = self._codes(self.databases, lambda: itertools.chain.from_iterable(databases), np.int32,
+                                          int(lengths.sum()))
+        timings = list(get('server_timings', None)())
+        if any(timings):
+            timings = [t or {} for t in timings]
+            lengths = np.fromiter(map(len, timings), dtype=np.int64, count=n)
+            columns['stage_rows'] = np.repeat(rows, lengths)
+            columns['stage_codes'] = self._codes(self.stages, lambda: itertools.chain.from_iterable(timings), np.int32,
+                                                 int(lengths.sum()))
+            columns['stage_seconds'] = np.fromiter(itertools.chain.from_iterable(t.values() for t in timings),
+                                                   dtype=np.float64, count=int(lengths.sum()))
+        else:
+            for field in ('stage_rows', 'stage_codes', 'stage_seconds'):
+                columns[field] = np.zeros(0, dtype=self._FIELDS[field])
+
+        for field, array in columns.items():
+            self._chunks[field].append(array)
+
+        if len(self.failure_text) < self.MAX_FAILURE_EXAMPLES:
+            failures = np.flatnonzero((columns['status'] == 0) & ~columns['correct'])
+            for i in failures[:self.MAX_FAILURE_EXAMPLES - len(self.failure_text)].tolist():
+                self.failure_text[first_row + i] = (chunk[i]['query'], chunk[i].get('difficulty_rationale', ''))
+
+        self._rows += n
+
+    def finalize(self) -> "ResultColumns":
+        """Convert the pending rows and concatenate the chunks into NumPy arrays. Returns self."""
+        self._flush()
+        for field, dtype in self._FIELDS.items():
+            chunks = self._chunks[field]
+            setattr(self, field, np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype))
+        del self._chunks, self._pending
+        self.finalized = True
+        return self
+
+    @classmethod
+    def from_results(cls, results: Iterable[Dict[str, Any]]) -> "ResultColumns":
+        """Build finalized columns from any iterable of result dicts, a chunk at a time."""
+        columns = cls()
+        columns.extend(results)
+        return columns.finalize()
+
+
+def _exact_mean(values: np.ndarray) -> float:
+    """Correctly rounded mean, matching statistics.mean() without its per-value Fractions.
+
+    Each float is an integer mantissa times a power of two, so the exact sum is
+    built from per-exponent mantissa sums. The mantissas are split into 26-bit
+    halves, which keeps every bincount partial sum an integer below 2**53
+    (exact in float64) for slices of up to 2**25 values.
+    """
+    mantissas, exponents = np.frexp(values)
+    ints = (mantissas * 2.0 ** 53).astype(np.int64)  # values == ints * 2**(exponents - 53), exactly
+    lowest = int(exponents.min())
+    shifts = (exponents - lowest).astype(np.intp)
+    total = 0
+    for start in range(0, len(ints), _EXACT_SUM_SLICE):
+        part, part_shifts = ints[start:start + _EXACT_SUM_SLICE], shifts[start:start + _EXACT_SUM_SLICE]
+        high = np.bincount(part_shifts, weights=part >> 26)
+        low = np.bincount(part_shifts, weights=part & ((1 << 26) - 1))
+        for shift in np.flatnonzero((high != 0) | (low != 0)).tolist():
+            total += ((int(high[shift]) << 26) + int(low[shift])) << shift
+    return float(Fraction(total, len(values)) * Fraction(2) ** (lowest - 53))
+
+
+def _median(sorted_values: np.ndarray) -> float:
+    """statistics.median() of an already sorted array."""
+    n = len(sorted_values)
+    if n % 2 == 1:
+        return float(sorted_values[n // 2])
+    return (float(sorted_values[n // 2 - 1]) + float(sorted_values[n // 2])) / 2
+
+
+def _exclusive_quantile(sorted_values: np.ndarray, i: int, n: int) -> float:
+    """The i-th of statistics.quantiles(data, n=n) cut points (default 'exclusive' method)."""
+    ld = len(sorted_values)
+    m = ld + 1
+    j = i * m // n
+    j = 1 if j < 1 else ld - 1 if j > ld - 1 else j
+    delta = i * m - j * n
+    return (float(sorted_values[j - 1]) * (n - delta) + float(sorted_values[j]) * delta) / n
+
+
+def _first_seen(codes: np.ndarray, cardinality: int) -> List[int]:
+    """Distinct codes ordered by first appearance, like dict insertion order.
+
+    Codes come from an _Interner, so cardinality is small and one argmax per
+    code is much cheaper than sorting the column.
+    """
+    first_index = {}
+    for code in range(cardinality):
+        matches = codes == code
+        if matches.any():
+            first_index[code] = int(np.argmax(matches))
+    return sorted(first_index, key=first_index.get)
+
+
+def aggregate_confusion_matrix(columns: ResultColumns) -> Dict[str, Dict[str, int]]:
+    """Intent confusion matrix over successful rows (see calculate_confusion_matrix)."""
+    k = len(columns.intents.values)
+    success = columns.status == 0
+    expected = columns.expected[success].astype(np.int64)
+    # Rows without an actual intent land in the 'unknown' column, as do intents outside INTENTS
+    actual = columns.actual[success].astype(np.int64)
+    pairs = np.bincount(expected * (k + 1) + (actual + 1), minlength=k * (k + 1)).reshape(k, k + 1)
+
+    confusion = {}
+    for e, expected_intent in enumerate(INTENTS):
+        row = {other: int(pairs[e, a + 1]) for a, other in enumerate(INTENTS)}
+        row['unknown'] = int(pairs[e].sum()) - sum(row.values())
+        confusion[expected_intent] = row
+    return confusion
+
+
+def latency_summary(values: np.ndarray) -> Dict[str, float]:
+    """P50/P90/P99/mean of a latency sample, computed like the top-level latency section."""
+    ordered = np.sort(values)
+    n = len(ordered)
+    return {
+        "p50_seconds": _median(ordered),
+        "p90_seconds": _exclusive_quantile(ordered, 9, 10) if n > 1 else float(ordered[0]),
+        "p99_seconds": _exclusive_quantile(ordered, 99, 100) if n > 2 else float(ordered[-1]),
+        "mean_seconds": _exact_mean(ordered)
+    }
+
+
+def aggregate_cache_performance(columns: ResultColumns, use_cache: bool = False) -> Dict[str, Any]:
+    """Cache hit rate and hit vs miss latency over successful rows, from the responses' `cached` flag.
+
+    Runs that did not request the cache (the runner sends use_cache=False by
+    default) and got no cached responses keep the original placeholder
+    section. With use_cache the section is always computed, so a cold pass
+    with no hits still reports its miss latency.
+    """
+    success = columns.status == 0
+    hits = success & columns.cached
+    if not use_cache and not hits.any():
+        return {
+            "hit_rate": 0.0,
+            "note": "Cache disabled for testing"
+        }
+
+    misses = success & ~columns.cached
+    hit_count = int(hits.sum())
+    miss_count = int(misses.sum())
+    hit_latency = latency_summary(columns.latency[hits]) if hit_count else None
+    miss_latency = latency_summary(columns.latency[misses]) if miss_count else None
+
+    by_difficulty = {}
+    for d, tier in enumerate(DIFFICULTIES):
+        in_tier = columns.difficulty == d
+        tier_hits = columns.latency[hits & in_tier]
+        tier_misses = columns.latency[misses & in_tier]
+        if tier_hits.size or tier_misses.size:
+            hit_p50 = _median(np.sort(tier_hits)) if tier_hits.size else None
+            miss_p50 = _median(np.sort(tier_misses)) if tier_misses.size else None
+            by_difficulty[tier] = {
+                "hits": int(tier_hits.size),
+                "misses": int(tier_misses.size),
+                "hit_rate": (tier_hits.size / (tier_hits.size + tier_misses.size)) * 100,
+                "hit_p50_seconds": hit_p50,
+                "miss_p50_seconds": miss_p50,
+                "speedup": miss_p50 / hit_p50 if hit_p50 and miss_p50 is not None else None
+            }
+
+    return {
+        "hit_rate": (hit_count / (hit_count + miss_count)) * 100 if hit_count + miss_count else 0.0,
+        "hits": hit_count,
+        "misses": miss_count,
+        "hit_latency": hit_latency,
+        "miss_latency": miss_latency,
+        "speedup": (miss_latency['p50_seconds'] / hit_latency['p50_seconds']
+                    if miss_latency and hit_latency and hit_latency['p50_seconds'] > 0 else None),
+        "by_difficulty": by_difficulty
+    }
+
+
+def aggregate_server_timing(columns: ResultColumns) -> Optional[Dict[str, Any]]:
+    """Per-stage server timing over successful rows that reported timings, or None if none did.
+
+    Stage means are over the queries that ran the stage. by_difficulty holds
+    the mean time per timed query in each tier, counting a skipped stage as
+    zero. These are per-stage averages: database stages run in parallel, so
+    a tier's stage means (and the stages' share_of_latency) do not sum to
+    its mean latency.
+    """
+    if not columns.stage_rows.size:
+        return None
+
+    keep = (columns.status == 0)[columns.stage_rows]
+    rows = columns.stage_rows[keep]
+    codes = columns.stage_codes[keep]
+    seconds = columns.stage_seconds[keep]
+    if not rows.size:
+        return None
+
+    timed_rows = np.unique(rows)
+    timed_latency = math.fsum(columns.latency[timed_rows].tolist())
+    stage_order = _first_seen(codes, len(columns.stages.values))
+
+    stages = {}
+    for c in stage_order:
+        values = seconds[codes == c]
+        stages[columns.stages.values[c]] = {
+            "count": int(values.size),
+            "mean_seconds": float(values.mean()),
+            "p50_seconds": float(np.quantile(values, 0.50)),
+            "p90_seconds": float(np.quantile(values, 0.90)),
+            "p99_seconds": float(np.quantile(values, 0.99)),
+            "share_of_latency": (math.fsum(values.tolist()) / timed_latency) * 100 if timed_latency > 0 else 0.0
+        }
+
+    row_difficulty = columns.difficulty[rows]
+    timed_difficulty = columns.difficulty[timed_rows]
+    by_difficulty = {}
+    for d, tier in enumerate(DIFFICULTIES):
+        tier_count = int((timed_difficulty == d).sum())
+        if tier_count:
+            in_tier = row_difficulty == d
+            by_difficulty[tier] = {
+                columns.stages.values[c]: float(seconds[in_tier & (codes == c)].sum()) / tier_count
+                for c in stage_order
+            }
+
+    by_database = {
+        stage: {"count": data["count"], "mean_seconds": data["mean_seconds"], "p90_seconds": data["p90_seconds"]}
+        for stage, data in stages.items() if stage in DATABASE_STAGES
+    }
+
+    return {
+        "queries_with_timings": int(timed_rows.size),
+        "stages": stages,
+        "by_difficulty": by_difficulty,
+        "by_database": by_database
+    }
+
+
+def aggregate_metrics(columns: ResultColumns, use_cache: bool = False) -> Dict[str, Any]:
+    """Compute every section of calculate_metrics() from finalized columns.
+
+    use_cache says the run asked the API for cached answers (see aggregate_cache_performance).
+    """
+    total_rows = len(columns)
+    success = columns.status == 0
+    successful_count = int(success.sum())
+
+    if successful_count == 0:
+        return {"error": "No successful queries"}
+
+    latencies = columns.latency[success]
+    difficulty = columns.difficulty[success].astype(np.int64)
+    expected = columns.expected[success].astype(np.int64)
+    correct = columns.correct[success]
+    correct_count = int(correct.sum())
+
+    n_difficulties = len(columns.difficulties.values)
+    n_intents = len(columns.intents.values)
+
+    # Overall metrics
+    overall_metrics = {
+        "total_queries": total_rows,
+        "successful_queries": successful_count,
+        "failed_queries": total_rows - successful_count,
+        "success_rate": (successful_count / total_rows) * 100,
+        "overall_accuracy": (correct_count / successful_count) * 100,
+        "correct_count": correct_count,
+        "total_count": successful_count
+    }
+
+    # Latency metrics
+    sorted_latencies = np.sort(latencies)
+    latency_metrics = {
+        "p50_seconds": _median(sorted_latencies),
+        "p90_seconds": _exclusive_quantile(sorted_latencies, 9, 10) if successful_count > 1 else float(latencies[0]),
+        "p99_seconds": _exclusive_quantile(sorted_latencies, 99, 100) if successful_count > 2 else float(sorted_latencies[-1]),
+        "mean_seconds": _exact_mean(latencies),
+        "min_seconds": float(sorted_latencies[0]),
+        "max_seconds": float(sorted_latencies[-1])
+    }
+
+    # Counts per tier, per intent and per tier×intent in one bincount each
+    tier_total = np.bincount(difficulty, minlength=n_difficulties)
+    tier_correct = np.bincount(difficulty, weights=correct, minlength=n_difficulties).astype(np.int64)
+    cell = difficulty * n_intents + expected
+    cell_total = np.bincount(cell, minlength=n_difficulties * n_intents).reshape(n_difficulties, n_intents)
+    cell_correct = np.bincount(cell, weights=correct, minlength=n_difficulties * n_intents)
+    cell_correct = cell_correct.astype(np.int64).reshape(n_difficulties, n_intents)
+    intent_total = cell_total.sum(axis=0)
+    intent_correct = cell_correct.sum(axis=0)
+
+    # Metrics by difficulty tier
+    difficulty_metrics = {}
+    for d, tier in enumerate(DIFFICULTIES):
+        total = int(tier_total[d])
+        if total:
+            tier_latencies = latencies[difficulty == d]
+            difficulty_metrics[tier] = {
+                "total": total,
+                "correct": int(tier_correct[d]),
+                "accuracy": (int(tier_correct[d]) / total) * 100,
+                "avg_latency": _exact_mean(tier_latencies),
+                "median_latency": _median(np.sort(tier_latencies))
+            }
+
+    # Metrics by intent within each difficulty tier
+    intent_by_difficulty = {}
+    for d, tier in enumerate(DIFFICULTIES):
+        intent_by_difficulty[tier] = {}
+        for i, intent in enumerate(INTENTS):
+            total = int(cell_total[d, i])
+            if total:
+                intent_by_difficulty[tier][intent] = {
+                    'total': total,
+                    'correct': int(cell_correct[d, i]),
+                    'accuracy': (int(cell_correct[d, i]) / total) * 100
+                }
+
+    # Overall intent accuracy (across all difficulties)
+    intent_accuracy = {}
+    for i, intent in enumerate(INTENTS):
+        total = int(intent_total[i])
+        if total:
+            intent_accuracy[intent] = {
+                'total': total,
+                'correct': int(intent_correct[i]),
+                'accuracy': (int(intent_correct[i]) / total) * 100
+            }
+
+    # Database usage, in first-seen order so ties in most_used resolve as before
+    db_success = success[columns.db_rows] if columns.db_rows.size else np.zeros(0, dtype=bool)
+    db_codes = columns.db_codes[db_success]
+    db_counts = np.bincount(db_codes, minlength=len(columns.databases.values))
+    db_usage_codes = _first_seen(db_codes, len(columns.databases.values))
+    db_usage = {columns.databases.values[c]: int(db_counts[c]) for c in db_usage_codes}
+
+    # Failure analysis (incorrect predictions by difficulty)
+    failure_rows = np.flatnonzero(success & ~columns.correct)
+    tier_failures = tier_total - tier_correct
+    failure_analysis = {
+        'total_failures': int(failure_rows.size),
+        'by_difficulty': {},
+        'examples': []
+    }
+
+    for d, tier in enumerate(DIFFICULTIES):
+        count = int(tier_failures[d])
+        if count:
+            failure_analysis['by_difficulty'][tier] = {
+                'count': count,
+                'percentage': (count / int(tier_total[d])) * 100
+            }
+
+    for row in failure_rows[:ResultColumns.MAX_FAILURE_EXAMPLES]:
+        query, rationale = columns.failure_text[row]
+        failure_analysis['examples'].append({
+            'query': query,
+            'expected': columns.intents.values[columns.expected[row]],
+            'actual': columns.intents.values[columns.actual[row]] if columns.actual[row] >= 0 else None,
+            'difficulty': columns.difficulties.values[columns.difficulty[row]],
+            'rationale': rationale
+        })
+
+    # Latency histograms, sliced in first-seen order like LatencyHistogramSet.record_result()
+    # (bucket indexes are computed once and shared by every slice)
+    histograms = LatencyHistogramSet()
+    row_values_us, row_indexes = histograms.overall.bucket_indexes(columns.latency)
+    values_us, indexes = row_values_us[success], row_indexes[success]
+    histograms.overall.record_indexed(values_us, indexes)
+    for d in _first_seen(difficulty, n_difficulties):
+        in_tier = difficulty == d
+        histograms.slice('difficulty', columns.difficulties.values[d]).record_indexed(values_us[in_tier], indexes[in_tier])
+    for i in _first_seen(expected, n_intents):
+        in_intent = expected == i
+        histograms.slice('intent', columns.intents.values[i]).record_indexed(values_us[in_intent], indexes[in_intent])
+    db_rows = columns.db_rows[db_success]
+    db_values_us, db_indexes = row_values_us[db_rows], row_indexes[db_rows]
+    for c in db_usage_codes:
+        in_db = db_codes == c
+        histograms.slice('database', columns.databases.values[c]).record_indexed(db_values_us[in_db], db_indexes[in_db])
+
+    metrics = {
+        "overall": overall_metrics,
+        "latency": latency_metrics,
+        "by_difficulty": difficulty_metrics,
+        "intent_by_difficulty": intent_by_difficulty,
+        "intent_overall": intent_accuracy,
+        "confusion_matrix": aggregate_confusion_matrix(columns),
+        "database_routing": {
+            "usage_counts": db_usage,
+            "most_used": max(db_usage, key=db_usage.get) if db_usage else None
+        },
+        "failure_analysis": failure_analysis,
+        "cache_performance": aggregate_cache_performance(columns, use_cache),
+        "latency_histograms": histograms.to_dict()
+    }
+
+    server_timing = aggregate_server_timing(columns)
+    if server_timing is not None:
+        metrics["server_timing"] = server_timing
+
+    return metrics
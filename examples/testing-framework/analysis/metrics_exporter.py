@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Prometheus / OpenMetrics Exporter for Test Runs
+
+Exports live run metrics while a test is in progress, so harness load can be
+lined up with the API's own dashboards on the same timeline:
+
+    router_test_requests_total{status,difficulty,expected_intent}     counter
+    router_test_predictions_total{expected_intent,actual_intent}       counter
+    router_test_database_requests_total{database}                      counter
+    router_test_cache_hits_total                                       counter
+    router_test_request_duration_seconds{difficulty}                   histogram (successful requests)
+    router_test_accuracy_ratio{difficulty}                             gauge, difficulty="all" for overall
+    router_test_run_info{mode,test_suite}                              gauge = 1
+    router_test_start_time_seconds                                     gauge
+
+Two outputs, both without external services or client libraries:
+
+    exporter.serve(9464)                         GET /metrics on an embedded HTTP server (own thread),
+                                                 loopback only unless a host is given
+    exporter.start_textfile(path, interval=5)    node_exporter textfile collector, rewritten atomically
+
+record() only bumps a few integers under an uncontended lock and bisects a
+fixed bucket list; all formatting happens at scrape/write time, off the
+request path.
+
+    exporter = RunMetricsExporter({"mode": "stratified", "test_suite": "suite.json"})
+    exporter.serve(9464)
+    on_result = exporter.tee(log.write)          # record and pass the result on
+    ...
+    exporter.close()                             # final textfile write, stop the server
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+PREFIX = "router_test"
+
+# Seconds; spans cache hits to the README's 2s P99 target and timeouts beyond it
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels: Any) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class RunMetricsExporter:
+    """Counters, histograms and gauges for one test run, rendered in Prometheus text format."""
+
+    def __init__(self, run_labels: Optional[Dict[str, str]] = None):
+        self.run_labels = run_labels or {}
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+        self._requests: Dict[tuple, int] = defaultdict(int)
+        self._predictions: Dict[tuple, int] = defaultdict(int)
+        self._databases: Dict[str, int] = defaultdict(int)
+        self._cache_hits = 0
+        self._buckets: Dict[str, List[int]] = {}
+        self._duration_sum: Dict[str, float] = defaultdict(float)
+        self._tier_total: Dict[str, int] = defaultdict(int)
+        self._tier_correct: Dict[str, int] = defaultdict(int)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._textfile: Optional[Path] = None
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+
+    def record(self, result: Dict[str, Any]):
+        """Count one per-query result dict. Cheap enough to call on every completion."""
+        status = result['status']
+        difficulty = result.get('difficulty', 'unknown')
+        expected = result.get('expected_intent', 'unknown')
+
+        with self._lock:
+            self._requests[(status, difficulty, expected)] += 1
+            if status != 'success':
+                return
+
+            self._predictions[(expected, result.get('actual_intent') or 'unknown')] += 1
+            for db in result.get('databases_used', ()):
+                self._databases[db] += 1
+            if result.get('cached'):
+                self._cache_hits += 1
+
+            latency = result['latency_seconds']
+            buckets = self._buckets.get(difficulty)
+            if buckets is None:
+                buckets = self._buckets[difficulty] = [0] * (len(DURATION_BUCKETS) + 1)
+            buckets[bisect_left(DURATION_BUCKETS, latency)] += 1
+            self._duration_sum[difficulty] += latency
+
+            self._tier_total[difficulty] += 1
+            if result.get('intent_correct'):
+                self._tier_correct[difficulty] += 1
+
+    def tee(self, callback: Callable[[Dict[str, Any]], None]) -> Callable[[Dict[str, Any]], None]:
+        """Wrap an on_result callback so every result is also recorded here."""
+        def on_result(result: Dict[str, Any]):
+            callback(result)
+            self.record(result)
+        return on_result
+
+    def render(self, openmetrics: bool = False) -> str:
+        """The current metrics in Prometheus text format (or OpenMetrics when asked)."""
+        with self._lock:
+            requests = dict(self._requests)
+            predictions = dict(self._predictions)
+            databases = dict(self._databases)
+            cache_hits = self._cache_hits
+            buckets = {tier: list(counts) for tier, counts in self._buckets.items()}
+            duration_sum = dict(self._duration_sum)
+            tier_total = dict(self._tier_total)
+            tier_correct = dict(self._tier_correct)
+
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            # OpenMetrics names counter families without the _total suffix
+            family_name = name[:-len("_total")] if openmetrics and kind == "counter" else name
+            lines.append(f"# HELP {family_name} {help_text}")
+            lines.append(f"# TYPE {family_name} {kind}")
+
+        family(f"{PREFIX}_run_info", "gauge", "Test run metadata")
+        lines.append(f"{PREFIX}_run_info{_labels(**self.run_labels)} 1")
+        family(f"{PREFIX}_start_time_seconds", "gauge", "Unix time the run started")
+        lines.append(f"{PREFIX}_start_time_seconds {self.start_time:.3f}")
+
+        family(f"{PREFIX}_requests_total", "counter", "Completed queries by status, difficulty and expected intent")
+        for (status, difficulty, expected), count in sorted(requests.items()):
+            lines.append(f"{PREFIX}_requests_total"
+                         f"{_labels(status=status, difficulty=difficulty, expected_intent=expected)} {count}")
+
+        family(f"{PREFIX}_predictions_total", "counter", "Successful queries by expected and predicted intent")
+        for (expected, actual), count in sorted(predictions.items()):
+            lines.append(f"{PREFIX}_predictions_total{_labels(expected_intent=expected, actual_intent=actual)} {count}")
+
+        family(f"{PREFIX}_database_requests_total", "counter", "Successful queries that used each database")
+        for db, count in sorted(databases.items()):
+            lines.append(f"{PREFIX}_database_requests_total{_labels(database=db)} {count}")
+
+        family(f"{PREFIX}_cache_hits_total", "counter", "Successful queries answered from cache")
+        lines.append(f"{PREFIX}_cache_hits_total {cache_hits}")
+
+        family(f"{PREFIX}_request_duration_seconds", "histogram", "Client-side latency of successful queries")
+        for tier, counts in sorted(buckets.items()):
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, counts):
+                cumulative += count
+                lines.append(f"{PREFIX}_request_duration_seconds_bucket{_labels(difficulty=tier, le=bound)} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{PREFIX}_request_duration_seconds_bucket{_labels(difficulty=tier, le='+Inf')} {cumulative}")
+            lines.append(f"{PREFIX}_request_duration_seconds_sum{_labels(difficulty=tier)} {duration_sum[tier]}")
+            lines.append(f"{PREFIX}_request_duration_seconds_count{_labels(difficulty=tier)} {cumulative}")
+
+        family(f"{PREFIX}_accuracy_ratio", "gauge", "Fraction of successful queries with the expected intent")
+        total = sum(tier_total.values())
+        if total:
+            lines.append(f"{PREFIX}_accuracy_ratio{_labels(difficulty='all')} {sum(tier_correct.values()) / total}")
+        for tier in sorted(tier_total):
+            lines.append(f"{PREFIX}_accuracy_ratio{_labels(difficulty=tier)} {tier_correct.get(tier, 0) / tier_total[tier]}")
+
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve GET /metrics from a daemon thread (loopback only by default)."""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0].rstrip('/') not in ("/metrics", ""):
+                    self.send_error(404)
+                    return
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                data = exporter.render(openmetrics).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+        self._server = server
+        return server
+
+    def write_textfile(self, path: Path):
+        """Write the metrics for a textfile collector, atomically (write to .tmp, then rename)."""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.render(), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def start_textfile(self, path: Path, interval: float = 5.0):
+        """Rewrite the textfile every `interval` seconds from a daemon thread."""
+        self._textfile = Path(path)
+        self._textfile.parent.mkdir(parents=True, exist_ok=True)
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.write_textfile(self._textfile)
+
+        self.write_textfile(self._textfile)
+        self._writer = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+        self._writer.start()
+
+    def close(self):
+        """Write the final textfile and stop the server and writer thread."""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+        if self._textfile is not None:
+            self.write_textfile(self._textfile)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def add_exporter_arguments(parser):
+    """Add --metrics-port / --metrics-host / --metrics-textfile / --metrics-interval to a runner's argument parser."""
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve live Prometheus metrics on this port at /metrics')
+    parser.add_argument('--metrics-host', type=str, default='127.0.0.1',
+                        help='Interface for --metrics-port (default: 127.0.0.1; use 0.0.0.0 to let a remote Prometheus scrape)')
+    parser.add_argument('--metrics-textfile', type=str,
+                        help='Write live metrics to this .prom file for a textfile collector')
+    parser.add_argument('--metrics-interval', type=float, default=5.0,
+                        help='Seconds between textfile rewrites (default: 5)')
+
+
+def exporter_from_args(args, run_labels: Dict[str, str]) -> Optional[RunMetricsExporter]:
+    """Start an exporter when either output was requested, else return None."""
+    if args.metrics_port is None and not args.metrics_textfile:
+        return None
+    exporter = RunMetricsExporter(run_labels)
+    if args.metrics_port is not None:
+        exporter.serve(args.metrics_port, args.metrics_host)
+        print(f"📡 Metrics on http://{args.metrics_host}:{args.metrics_port}/metrics")
+    if args.metrics_textfile:
+        exporter.start_textfile(Path(args.metrics_textfile), args.metrics_interval)
+        print(f"📡 Metrics textfile: {args.metrics_textfile} (every {args.metrics_interval:g}s)")
+    return exporter
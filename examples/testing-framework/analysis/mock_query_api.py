@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Local Mock Query API
+
+A stand-in for /api/v1/query/ and /api/v1/query/health so the test runners can
+be exercised on one box without Docker or the four databases. Intents are
+answered from a test suite: a known query gets its expected intent with the
+configured accuracy (deterministically per query text), anything else gets a
+random intent. Databases follow the routing table in the testing-framework
+README. Each response carries a Server-Timing header splitting the service
+time into classification, the (parallel) database calls and merging.
+
+Requests with "use_cache": true are answered from an in-memory cache after
+the first time a query is seen, with "cached": true and --cache-latency-ms
+service time, so cache_benchmark.py has something to measure.
+DELETE /api/v1/query/cache empties that cache.
+
+--replay answers from a recorded stratified_results.json instead: each query
+gets its recorded intent, databases, cached flag and latency, and recorded
+errors are returned with their status code.
+
+--profile gives latency, error rate and cached ratio per difficulty tier
+(missing tiers fall back to "default"):
+
+    {
+      "default": {"latency": 20},
+      "easy":    {"latency": {"median_ms": 300, "sigma": 0.4}, "cached_ratio": 0.2},
+      "medium":  {"latency": {"uniform_ms": [400, 900]}, "error_rate": 0.01},
+      "hard":    {"latency": "replay", "error_rate": 0.05, "error_status": 503}
+    }
+
+    latency: a number or {"fixed_ms": MS}, {"median_ms": MS, "sigma": S} (lognormal),
+             {"uniform_ms": [LOW, HIGH]}, or "replay" (the query's recorded latency,
+             else a recorded latency from the same tier)
+
+Random choices are seeded by --seed, the query text and how many times that
+query has been asked, so a run is reproducible request for request.
+
+For load-generator and metrics work without any network, --bench drives the
+suite through the async runner over an in-process httpx transport and
+reports harness throughput; mock_transport() gives the same transport to
+other scripts.
+
+Usage:
+    python3 mock_query_api.py --test-suite ../test-suites/difficulty-stratified-250-queries.json
+    python3 mock_query_api.py --port 8001 --latency-ms 20 --accuracy 0.8
+    python3 mock_query_api.py --replay ../results/stratified/2025-10-08-stratified-results.json --latency-scale 0.1
+    python3 mock_query_api.py --replay RESULTS --latency-scale 0 --bench --requests 100000 --concurrency 256
+
+Arguments:
+    --host HOST          Interface to bind (default: 127.0.0.1)
+    --port PORT          Port to listen on (default: 8000)
+    --test-suite PATH    Suite whose expected intents (and difficulties) answer known queries
+    --replay PATH        Recorded results file to answer from
+    --profile PATH       JSON latency / error / cached profile per difficulty
+    --latency-ms MS      Fixed service time per query when no profile or recording applies (default: 20)
+    --latency-scale X    Multiply every service time (0 = no sleeping) (default: 1.0)
+    --accuracy FRACTION  Probability a known query gets its expected intent (default: 0.9)
+    --cache-latency-ms MS
+                         Service time for cache hits (default: 2)
+    --seed N             Seed for per-request randomness (default: 0)
+    --bench              Run the suite in-process through the async runner instead of serving
+    --requests N         Requests for --bench, cycling through the suite (default: suite size)
+    --concurrency N      In-flight requests for --bench (default: 64)
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from suite_loader import load_suite
+
+INTENTS = ['graph', 'temporal', 'semantic', 'metadata']
+
+INTENT_DATABASES = {
+    'graph': ['neo4j', 'graphiti'],
+    'temporal': ['graphiti'],
+    'semantic': ['qdrant', 'postgres'],
+    'metadata': ['postgres']
+}
+
+
+class MockQueryAPI:
+    """Answers query requests the way the real router's response body looks."""
+
+    def __init__(self, expected_intents: Optional[Dict[str, str]] = None, latency_ms: float = 20,
+                 accuracy: float = 0.9, cache_latency_ms: float = 2,
+                 difficulties: Optional[Dict[str, str]] = None,
+                 replay: Optional[Dict[str, Dict[str, Any]]] = None,
+                 profiles: Optional[Dict[str, Dict[str, Any]]] = None,
+                 latency_scale: float = 1.0, seed: int = 0):
+        self.expected_intents = expected_intents or {}
+        self.latency_ms = latency_ms
+        self.accuracy = accuracy
+        self.cache_latency_ms = cache_latency_ms
+        self.difficulties = difficulties or {}
+        self.replay = replay or {}
+        self.profiles = profiles or {}
+        self.latency_scale = latency_scale
+        self.seed = seed
+        self.cache: Dict[str, Dict[str, Any]] = {}
+
+        # Recorded latencies per tier, for "replay" latency on queries that were not recorded
+        self.tier_latencies_ms: Dict[str, List[float]] = {}
+        for query, recorded in self.replay.items():
+            self.difficulties.setdefault(query, recorded.get('difficulty'))
+            self.tier_latencies_ms.setdefault(recorded.get('difficulty'), []).append(recorded['latency_seconds'] * 1000)
+
+        self._asked: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def classify(self, query: str) -> str:
+        """Deterministic per query text, so repeated runs agree."""
+        rng = random.Random(hashlib.sha256(query.encode('utf-8')).digest())
+        expected = self.expected_intents.get(query)
+        if expected and rng.random() < self.accuracy:
+            return expected
+        return rng.choice([intent for intent in INTENTS if intent != expected])
+
+    def request_rng(self, query: str) -> random.Random:
+        """Random source for one request: seed, query text and the query's occurrence count."""
+        with self._lock:
+            occurrence = self._asked.get(query, 0)
+            self._asked[query] = occurrence + 1
+        return random.Random(hashlib.sha256(f"{self.seed}:{occurrence}:{query}".encode('utf-8')).digest())
+
+    def profile_for(self, query: str) -> Dict[str, Any]:
+        """The profile for the query's difficulty tier, over the "default" profile."""
+        profile = dict(self.profiles.get('default', {}))
+        profile.update(self.profiles.get(self.difficulties.get(query), {}))
+        return profile
+
+    def sample_latency_ms(self, query: str, profile: Dict[str, Any], rng: random.Random) -> float:
+        """Service time for one (uncached) request, before --latency-scale."""
+        spec = profile.get('latency')
+        recorded = self.replay.get(query)
+
+        if spec is None:
+            return recorded['latency_seconds'] * 1000 if recorded else self.latency_ms
+        if isinstance(spec, (int, float)):
+            return float(spec)
+        if spec == 'replay':
+            if recorded:
+                return recorded['latency_seconds'] * 1000
+            tier_latencies = self.tier_latencies_ms.get(self.difficulties.get(query))
+            return rng.choice(tier_latencies) if tier_latencies else self.latency_ms
+        if 'fixed_ms' in spec:
+            return float(spec['fixed_ms'])
+        if 'median_ms' in spec:
+            return rng.lognormvariate(0, spec.get('sigma', 0.5)) * spec['median_ms']
+        if 'uniform_ms' in spec:
+            return rng.uniform(*spec['uniform_ms'])
+        raise ValueError(f"Unknown latency spec: {spec!r}")
+
+    def stage_timings(self, query: str, intent: str, latency_ms: float) -> Dict[str, float]:
+        """Split the service time into stages (milliseconds), deterministically per query.
+
+        The databases run in parallel, so the slowest one plus classification
+        and merging adds up to the service time.
+        """
+        rng = random.Random(hashlib.sha256(b"stages:" + query.encode('utf-8')).digest())
+        parallel = latency_ms * 0.85
+        databases = INTENT_DATABASES.get(intent) or ['postgres']
+        slowest = rng.randrange(len(databases))
+        timings = {"classify": latency_ms * 0.10}
+        for i, db in enumerate(databases):
+            timings[db] = parallel if i == slowest else parallel * rng.uniform(0.4, 1.0)
+        timings["merge"] = latency_ms * 0.05
+        timings["total"] = latency_ms
+        return timings
+
+    def respond(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, float], float]:
+        """Decide the response without sleeping: (status, body, stage timings in ms, service seconds)."""
+        query = payload.get('query', '')
+        use_cache = payload.get('use_cache', False)
+        rng = self.request_rng(query)
+
+        if use_cache and query in self.cache:
+            latency_ms = self.cache_latency_ms * self.latency_scale
+            return 200, dict(self.cache[query], cached=True), {"cache": latency_ms, "total": latency_ms}, latency_ms / 1000
+
+        profile = self.profile_for(query)
+        recorded = self.replay.get(query)
+        latency_ms = self.sample_latency_ms(query, profile, rng) * self.latency_scale
+
+        if rng.random() < profile.get('error_rate', 0):
+            status = profile.get('error_status', 500)
+            return status, {"detail": "Mock query execution failed"}, {}, latency_ms / 1000
+        if recorded and recorded.get('status', 'success') != 'success':
+            status = recorded.get('error_code') or 500
+            return status, {"detail": recorded.get('error_message', "Recorded failure")}, {}, latency_ms / 1000
+
+        if recorded:
+            intent = recorded.get('actual_intent') or self.classify(query)
+            databases = recorded.get('databases_used', INTENT_DATABASES.get(intent, []))
+            cached = recorded.get('cached', False)
+            result_count = recorded.get('result_count', payload.get('limit', 10))
+        else:
+            intent = self.classify(query)
+            databases = INTENT_DATABASES[intent]
+            cached = False
+            result_count = payload.get('limit', 10)
+
+        if 'cached_ratio' in profile:
+            cached = rng.random() < profile['cached_ratio']
+        if cached:
+            latency_ms = self.cache_latency_ms * self.latency_scale
+            timings = {"cache": latency_ms, "total": latency_ms}
+        else:
+            timings = self.stage_timings(query, intent, latency_ms)
+
+        body = {
+            "intent": intent,
+            "databases_used": databases,
+            "result_count": result_count,
+            "cached": cached
+        }
+        if use_cache:
+            self.cache[query] = body
+        return 200, body, timings, latency_ms / 1000
+
+    def handle_query(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, float]]:
+        """Return (status, body, stage timings in ms) after sleeping for the service time."""
+        status, body, timings, seconds = self.respond(payload)
+        if seconds > 0:
+            time.sleep(seconds)
+        return status, body, timings
+
+    async def handle_query_async(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, float]]:
+        """handle_query() for an event loop: the service time is an asyncio sleep."""
+        status, body, timings, seconds = self.respond(payload)
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+        return status, body, timings
+
+    def clear_cache(self) -> Dict[str, Any]:
+        cleared = len(self.cache)
+        self.cache.clear()
+        return {"cleared": cleared}
+
+    def handle_health(self) -> Dict[str, Any]:
+        return {
+            "overall": "healthy",
+            "components": {db: {"status": "healthy"} for db in ['neo4j', 'graphiti', 'qdrant', 'postgres']}
+        }
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items())
+
+
+def make_handler(api: MockQueryAPI):
+    """Build a request handler class bound to one MockQueryAPI."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, body: Dict[str, Any], timings: Optional[Dict[str, float]] = None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if timings:
+                self.send_header("Server-Timing", format_server_timing(timings))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == "/api/v1/query/health":
+                self._send_json(200, api.handle_health())
+            else:
+                self._send_json(404, {"detail": "Not Found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path.rstrip('/') == "/api/v1/query":
+                self._send_json(*api.handle_query(payload))
+            else:
+                self._send_json(404, {"detail": "Not Found"})
+
+        def do_DELETE(self):
+            if self.path.rstrip('/') == "/api/v1/query/cache":
+                self._send_json(200, api.clear_cache())
+            else:
+                self._send_json(404, {"detail": "Not Found"})
+
+    return Handler
+
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded server with a listen backlog large enough for concurrent load tests."""
+
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def mock_transport(api: MockQueryAPI) -> httpx.MockTransport:
+    """An httpx transport that answers in-process, for httpx.AsyncClient(transport=...)."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.rstrip('/')
+        if request.method == 'POST' and path == "/api/v1/query":
+            status, body, timings = await api.handle_query_async(json.loads(request.content or b"{}"))
+            headers = {"Server-Timing": format_server_timing(timings)} if timings else {}
+            return httpx.Response(status, json=body, headers=headers)
+        if request.method == 'GET' and path == "/api/v1/query/health":
+            return httpx.Response(200, json=api.handle_health())
+        if request.method == 'DELETE' and path == "/api/v1/query/cache":
+            return httpx.Response(200, json=api.clear_cache())
+        return httpx.Response(404, json={"detail": "Not Found"})
+
+    return httpx.MockTransport(handler)
+
+
+def load_suite_index(suite_path: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Map query text to expected intent and to difficulty for every query in a test suite."""
+    queries = load_suite(Path(suite_path)).queries
+    intents = {q['query']: q['intent'] for q in queries}
+    difficulties = {q['query']: q['difficulty'] for q in queries}
+    return intents, difficulties
+
+
+def load_replay(results_path: str) -> Dict[str, Dict[str, Any]]:
+    """Map query text to its recorded result from a stratified_results.json file."""
+    with open(results_path, 'r') as f:
+        data = json.load(f)
+    return {r['query']: r for r in data['results']}
+
+
+def run_bench(api: MockQueryAPI, queries: List[Dict[str, Any]], requests: int, concurrency: int):
+    """Drive the suite through the async runner in-process and report harness throughput."""
+    from difficulty_stratified_test import calculate_metrics, run_queries_async
+
+    endpoint = "http://mock-query-api/api/v1/query/"
+    workload = ((i % len(queries) + 1, queries[i % len(queries)]) for i in range(requests))
+    results: List[Dict[str, Any]] = []
+
+    start = time.perf_counter()
+    asyncio.run(run_queries_async(workload, requests, concurrency, results.append, endpoint=endpoint,
+                                  transport=mock_transport(api), quiet=True))
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    metrics = calculate_metrics(results)
+    metrics_elapsed = time.perf_counter() - start
+
+    print(f"⚡ {requests} requests in {elapsed:.2f}s: {requests / elapsed:,.0f} requests/s "
+          f"({concurrency} in flight, latency scale {api.latency_scale})")
+    print(f"📊 calculate_metrics() over {len(results)} results: {metrics_elapsed * 1000:.1f}ms")
+    if 'error' not in metrics:
+        print(f"   Success rate {metrics['overall']['success_rate']:.1f}% | "
+              f"Accuracy {metrics['overall']['overall_accuracy']:.1f}% | "
+              f"P50 {metrics['latency']['p50_seconds'] * 1000:.1f}ms | "
+              f"P99 {metrics['latency']['p99_seconds'] * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local mock of the query API')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--test-suite', type=str, help='Suite whose expected intents answer known queries')
+    parser.add_argument('--replay', type=str, help='Recorded stratified_results.json to answer from')
+    parser.add_argument('--profile', type=str, help='JSON latency / error / cached profile per difficulty')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Fixed service time per query (default: 20)')
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='Multiply every service time, 0 for no sleeping (default: 1.0)')
+    parser.add_argument('--accuracy', type=float, default=0.9,
+                        help='Probability a known query gets its expected intent (default: 0.9)')
+    parser.add_argument('--cache-latency-ms', type=float, default=2,
+                        help='Service time for cache hits (default: 2)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for per-request randomness (default: 0)')
+    parser.add_argument('--bench', action='store_true', help='Run the suite in-process instead of serving')
+    parser.add_argument('--requests', type=int, help='Requests for --bench (default: suite size)')
+    parser.add_argument('--concurrency', type=int, default=64, help='In-flight requests for --bench (default: 64)')
+    args = parser.parse_args()
+
+    expected, difficulties = load_suite_index(args.test_suite) if args.test_suite else ({}, {})
+    replay = load_replay(args.replay) if args.replay else {}
+    profiles = json.loads(open(args.profile).read()) if args.profile else {}
+    api = MockQueryAPI(expected, latency_ms=args.latency_ms, accuracy=args.accuracy,
+                       cache_latency_ms=args.cache_latency_ms, difficulties=difficulties, replay=replay,
+                       profiles=profiles, latency_scale=args.latency_scale, seed=args.seed)
+
+    if args.bench:
+        if args.test_suite:
+            queries = load_suite(Path(args.test_suite)).queries
+        else:
+            queries = [
+                {"id": r['query_id'], "query": r['query'], "intent": r['expected_intent'],
+                 "difficulty": r['difficulty']}
+                for r in replay.values()
+            ]
+        if not queries:
+            parser.error("--bench needs --test-suite or --replay")
+        run_bench(api, queries, args.requests or len(queries), args.concurrency)
+        return
+
+    server = MockServer((args.host, args.port), make_handler(api))
+
+    known = len(expected) or len(replay)
+    print(f"🧪 Mock query API on http://{args.host}:{args.port} ({known} known queries)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Open-Loop Constant-Arrival-Rate Load Test
+
+Fires queries from a stratified test suite at a target rate (constant, stepped or
+linearly ramped) regardless of how fast the API answers. Unlike the closed-loop
+runner in difficulty_stratified_test.py, a slow response never delays the next
+request, so queueing delay shows up in the measured latencies.
+
+Latency is measured from each request's *intended* send time, not the moment it
+actually left the client. This corrects for coordinated omission: if the API (or
+the client's connection pool) falls behind, the time requests spend waiting is
+charged to the latency numbers instead of silently disappearing.
+
+Usage:
+    python3 open_loop_test.py --rate 20 --duration 60
+    python3 open_loop_test.py --steps 10:30,20:30,40:30,80:30
+    python3 open_loop_test.py --ramp 5:200 --duration 120 --window 10
+
+Arguments:
+    --test-suite PATH       Path to test suite JSON file (queries are cycled as needed)
+    --rate QPS              Constant offered rate (requires --duration)
+    --steps RATE:SECS,...   Step schedule, one phase per RATE:SECS pair
+    --ramp START:END        Linear ramp from START to END qps over --duration
+    --duration SECONDS      Duration for --rate and --ramp
+    --window SECONDS        Reporting window length (default: 10, never crosses a phase)
+    --connections N         HTTP connection pool size (default: 100)
+    --timeout SECONDS       Per-request timeout once a connection is acquired (default: 30)
+    --latency-slo SECONDS   P99 latency above which a window counts as saturated (default: 2.0)
+    --api-base URL          Base URL of the query API (default: http://localhost:8000)
+    --output-dir PATH       Where to write results (default: <RESULTS_DIR>/open-loop)
+
+Outputs:
+    - stratified_results.json: Per-query results; latency_seconds is the corrected latency
+    - stratified_summary.txt: Standard summary plus the offered-vs-achieved throughput table
+    - confusion_matrix.txt: Intent prediction confusion analysis
+"""
+
+import argparse
+import asyncio
+import itertools
+import math
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from server_timing import extract_server_timings
+from difficulty_stratified_test import (
+    API_BASE,
+    RESULTS_DIR,
+    api_endpoints,
+    build_error_result,
+    build_exception_result,
+    build_query_payload,
+    build_success_result,
+    calculate_metrics,
+    check_api_health,
+    format_confusion_matrix,
+    format_summary,
+    load_queries,
+    save_reports,
+)
+
+# A window is saturated when achieved throughput falls this far below the offered rate
+THROUGHPUT_TOLERANCE = 0.05
+
+
+def parse_schedule(args: argparse.Namespace) -> List[Tuple[float, float, float]]:
+    """Turn CLI arguments into a list of (start_qps, end_qps, duration_seconds) phases.
+
+    Raises ValueError for a malformed schedule, a phase that is not longer than
+    zero seconds, or a negative rate.
+    """
+    if args.steps:
+        phases = []
+        for step in args.steps.split(','):
+            try:
+                rate, seconds = step.split(':')
+                phases.append((float(rate), float(rate), float(seconds)))
+            except ValueError:
+                raise ValueError(f"--steps: expected RATE:SECONDS, got {step!r}") from None
+    elif args.ramp:
+        try:
+            start_rate, end_rate = (float(v) for v in args.ramp.split(':'))
+        except ValueError:
+            raise ValueError(f"--ramp: expected START_QPS:END_QPS, got {args.ramp!r}") from None
+        phases = [(start_rate, end_rate, args.duration)]
+    else:
+        phases = [(args.rate, args.rate, args.duration)]
+
+    for start_rate, end_rate, duration in phases:
+        if duration is None or duration <= 0:
+            raise ValueError(f"phase durations must be positive, got {duration}")
+        if start_rate < 0 or end_rate < 0:
+            raise ValueError(f"rates must not be negative, got {start_rate}:{end_rate}")
+    return phases
+
+
+def arrival_offsets(phases: List[Tuple[float, float, float]]) -> List[float]:
+    """Compute the intended send time (seconds from start) of every request.
+
+    Within a phase the rate changes linearly from start_qps to end_qps, so the
+    cumulative number of arrivals is N(t) = r0*t + (r1 - r0)*t^2 / (2*D). The
+    k-th arrival is placed where N(t) = k, which gives evenly spaced requests for
+    a constant rate and smoothly tightening spacing for a ramp.
+    """
+    offsets = []
+    phase_start = 0.0
+
+    for start_rate, end_rate, duration in phases:
+        slope = (end_rate - start_rate) / duration
+        expected = start_rate * duration + slope * duration * duration / 2
+
+        for k in range(int(expected)):
+            if slope == 0:
+                t = k / start_rate
+            else:
+                # Solve slope/2 * t^2 + start_rate * t - k = 0 for the positive root
+                t = (-start_rate + math.sqrt(start_rate * start_rate + 2 * slope * k)) / slope
+            offsets.append(phase_start + t)
+
+        phase_start += duration
+
+    return offsets
+
+
+def build_windows(phases: List[Tuple[float, float, float]], window: float) -> List[Dict[str, Any]]:
+    """Split the schedule into reporting windows that never straddle a phase boundary."""
+    if window <= 0:
+        raise ValueError(f"window must be positive, got {window}")
+    windows = []
+    phase_start = 0.0
+
+    for phase_index, (_, _, duration) in enumerate(phases, 1):
+        window_start = phase_start
+        phase_end = phase_start + duration
+        while window_start < phase_end - 1e-9:
+            window_end = min(window_start + window, phase_end)
+            windows.append({"phase": phase_index, "start": window_start, "end": window_end})
+            window_start = window_end
+        phase_start = phase_end
+
+    return windows
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def fire_query(client: httpx.AsyncClient, endpoint: str, query_data: Dict[str, Any], query_index: int,
+                     run_start: float, intended: float) -> Dict[str, Any]:
+    """Send one request and charge its latency from the intended send time."""
+    sent = time.perf_counter()
+
+    try:
+        response = await client.post(endpoint, json=build_query_payload(query_data))
+        completed = time.perf_counter()
+        latency = completed - intended
+
+        if response.status_code == 200:
+            body = response.json()
+            result = build_success_result(query_data, query_index, body, latency,
+                                          extract_server_timings(response.headers, body, latency))
+        else:
+            result = build_error_result(query_data, query_index, response.status_code, response.text, latency)
+
+    except Exception as e:
+        completed = time.perf_counter()
+        result = build_exception_result(query_data, query_index, e, completed - intended)
+
+    result.update({
+        "intended_offset_seconds": intended - run_start,
+        "send_lag_seconds": sent - intended,
+        "service_latency_seconds": completed - sent,
+        "completed_offset_seconds": completed - run_start
+    })
+    return result
+
+
+async def run_open_loop(queries: List[Dict[str, Any]], offsets: List[float], connections: int,
+                        timeout: float, endpoint: str) -> Tuple[List[Dict[str, Any]], float]:
+    """Dispatch queries at their intended offsets without waiting for responses.
+
+    The connection pool has no acquisition timeout: when every connection is
+    busy, requests queue inside the client and that wait is counted in their
+    latency, exactly as it would be for a real user.
+
+    Returns the results in dispatch order and the total wall-clock duration.
+    """
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    client_timeout = httpx.Timeout(timeout, pool=None)
+    query_cycle = itertools.cycle(queries)
+    tasks = []
+
+    async with httpx.AsyncClient(limits=limits, timeout=client_timeout) as client:
+        run_start = time.perf_counter()
+
+        for query_index, offset in enumerate(offsets, 1):
+            intended = run_start + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(
+                fire_query(client, endpoint, next(query_cycle), query_index, run_start, intended)
+            ))
+
+        results = await asyncio.gather(*tasks)
+
+    return list(results), time.perf_counter() - run_start
+
+
+def calculate_open_loop_metrics(results: List[Dict[str, Any]], windows: List[Dict[str, Any]],
+                                latency_slo: float) -> Dict[str, Any]:
+    """Compare offered and achieved throughput per window and locate saturation.
+
+    Offered rate counts requests *scheduled* in a window; achieved throughput
+    counts successful responses *completed* in it. Latency percentiles are the
+    corrected latencies of requests scheduled in the window.
+    """
+    window_rows = []
+    saturation: Optional[Dict[str, Any]] = None
+    max_sustained = 0.0
+
+    for window in windows:
+        start, end = window['start'], window['end']
+        length = end - start
+
+        scheduled = [r for r in results if start <= r['intended_offset_seconds'] < end]
+        completed = [
+            r for r in results
+            if r['status'] == 'success' and start <= r['completed_offset_seconds'] < end
+        ]
+        latencies = sorted(r['latency_seconds'] for r in scheduled)
+        errors = len([r for r in scheduled if r['status'] != 'success'])
+
+        offered = len(scheduled) / length
+        achieved = len(completed) / length
+        p99 = _percentile(latencies, 99)
+
+        saturated = (
+            achieved < offered * (1 - THROUGHPUT_TOLERANCE)
+            or p99 > latency_slo
+            or (scheduled and errors / len(scheduled) > THROUGHPUT_TOLERANCE)
+        )
+        if saturated and saturation is None:
+            saturation = {
+                "phase": window['phase'],
+                "window_start_seconds": start,
+                "offered_qps": offered,
+                "achieved_qps": achieved,
+                "p99_seconds": p99
+            }
+        if not saturated:
+            max_sustained = max(max_sustained, achieved)
+
+        window_rows.append({
+            "phase": window['phase'],
+            "start_seconds": start,
+            "end_seconds": end,
+            "offered_qps": offered,
+            "achieved_qps": achieved,
+            "error_rate": (errors / len(scheduled)) * 100 if scheduled else 0.0,
+            "p50_seconds": _percentile(latencies, 50),
+            "p99_seconds": p99,
+            "saturated": bool(saturated)
+        })
+
+    send_lags = sorted(r['send_lag_seconds'] for r in results)
+    service = sorted(r['service_latency_seconds'] for r in results)
+    corrected = sorted(r['latency_seconds'] for r in results)
+
+    return {
+        "windows": window_rows,
+        "saturation": saturation,
+        "max_sustained_qps": max_sustained,
+        "latency_slo_seconds": latency_slo,
+        "corrected_p99_seconds": _percentile(corrected, 99),
+        "from_dispatch_p99_seconds": _percentile(service, 99),
+        "dispatch_lag_p99_seconds": _percentile(send_lags, 99)
+    }
+
+
+def format_open_loop_report(open_loop: Dict[str, Any]) -> str:
+    """Format the offered-vs-achieved throughput table."""
+    lines = []
+    lines.append("="*80)
+    lines.append("OPEN-LOOP THROUGHPUT (latency measured from intended send time)")
+    lines.append("="*80)
+    lines.append("")
+    lines.append(" Phase |   Window (s)  | Offered qps | Achieved qps |  P50 (s) |  P99 (s) | Err % |")
+    lines.append("-" * 83)
+
+    for row in open_loop['windows']:
+        marker = " ❌" if row['saturated'] else ""
+        lines.append(
+            f" {row['phase']:5d} | {row['start_seconds']:5.0f} - {row['end_seconds']:5.0f} |"
+            f" {row['offered_qps']:11.1f} | {row['achieved_qps']:12.1f} |"
+            f" {row['p50_seconds']:8.3f} | {row['p99_seconds']:8.3f} | {row['error_rate']:5.1f} |{marker}"
+        )
+
+    lines.append("")
+    lines.append(f"   P99 corrected:      {open_loop['corrected_p99_seconds']:.3f}s")
+    lines.append(f"   P99 from dispatch:  {open_loop['from_dispatch_p99_seconds']:.3f}s (excludes dispatcher lag)")
+    lines.append(f"   Dispatch lag P99:   {open_loop['dispatch_lag_p99_seconds'] * 1000:.1f}ms")
+    lines.append(f"   Max sustained:      {open_loop['max_sustained_qps']:.1f} qps")
+
+    saturation = open_loop['saturation']
+    if saturation:
+        lines.append(
+            f"   Saturation:         ❌ at {saturation['offered_qps']:.1f} qps offered"
+            f" (phase {saturation['phase']}, t={saturation['window_start_seconds']:.0f}s):"
+            f" achieved {saturation['achieved_qps']:.1f} qps, P99 {saturation['p99_seconds']:.3f}s"
+        )
+    else:
+        lines.append("   Saturation:         ✅ not reached at any offered rate")
+    lines.append("="*80)
+
+    return "\n".join(lines)
+
+
+def main():
+    """Open-loop test execution."""
+    parser = argparse.ArgumentParser(
+        description='Run an open-loop (constant arrival rate) load test against the query router'
+    )
+    parser.add_argument(
+        '--test-suite',
+        type=str,
+        default='/Users/richardglaubitz/Projects/Apex-Memory-System-Development/tests/test-suites/difficulty-stratified-balanced-250.json',
+        help='Path to test suite JSON file (default: difficulty-stratified-balanced-250.json)'
+    )
+    schedule = parser.add_mutually_exclusive_group(required=True)
+    schedule.add_argument('--rate', type=float, help='Constant offered rate in queries/s')
+    schedule.add_argument('--steps', type=str, help='Step schedule as RATE:SECONDS,RATE:SECONDS,...')
+    schedule.add_argument('--ramp', type=str, help='Linear ramp as START_QPS:END_QPS over --duration')
+    parser.add_argument('--duration', type=float, help='Duration in seconds for --rate and --ramp')
+    parser.add_argument('--window', type=float, default=10, help='Reporting window in seconds (default: 10)')
+    parser.add_argument('--connections', type=int, default=100, help='HTTP connection pool size (default: 100)')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+    parser.add_argument(
+        '--latency-slo',
+        type=float,
+        default=2.0,
+        help='P99 latency in seconds above which a window counts as saturated (default: 2.0)'
+    )
+    parser.add_argument('--api-base', type=str, default=API_BASE, help=f'Base URL of the query API (default: {API_BASE})')
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(RESULTS_DIR / "open-loop"),
+        help='Directory for result files (default: <RESULTS_DIR>/open-loop)'
+    )
+
+    args = parser.parse_args()
+    if (args.rate is not None or args.ramp) and args.duration is None:
+        parser.error('--rate and --ramp require --duration')
+    if args.window <= 0:
+        parser.error('--window must be positive')
+
+    try:
+        phases = parse_schedule(args)
+    except ValueError as e:
+        parser.error(str(e))
+    offsets = arrival_offsets(phases)
+    queries_path = Path(args.test_suite)
+    query_endpoint, health_endpoint = api_endpoints(args.api_base)
+
+    print("🚀 Starting Open-Loop Load Test")
+    print("="*80)
+    print(f"   Test Suite: {queries_path.name}")
+    for i, (start_rate, end_rate, duration) in enumerate(phases, 1):
+        rate = f"{start_rate:.1f}" if start_rate == end_rate else f"{start_rate:.1f} → {end_rate:.1f}"
+        print(f"   Phase {i}: {rate} qps for {duration:.0f}s")
+    print(f"   Scheduled Requests: {len(offsets)}")
+    print("="*80)
+    print("")
+
+    if not check_api_health(health_endpoint):
+        print("\n❌ API is not healthy. Exiting.")
+        return
+
+    if not queries_path.exists():
+        print(f"❌ Test suite not found: {queries_path}")
+        return
+
+    queries = load_queries(queries_path)
+    print(f"✅ Loaded {len(queries)} test queries (cycled to fill the schedule)")
+    print("")
+    print("🧪 Dispatching open-loop traffic...")
+
+    results, run_duration = asyncio.run(
+        run_open_loop(queries, offsets, args.connections, args.timeout, query_endpoint)
+    )
+
+    print(f"\n⏱️  Completed {len(results)} queries in {run_duration:.2f}s")
+    print("\n📊 Calculating metrics...")
+
+    metrics = calculate_metrics(results)
+    metrics['open_loop'] = calculate_open_loop_metrics(
+        results, build_windows(phases, args.window), args.latency_slo
+    )
+
+    test_run = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "open_loop",
+        "total_queries": len(results),
+        "test_suite": str(queries_path),
+        "api_endpoint": query_endpoint,
+        "schedule": [
+            {"start_qps": start_rate, "end_qps": end_rate, "duration_seconds": duration}
+            for start_rate, end_rate, duration in phases
+        ],
+        "connections": args.connections,
+        "duration_seconds": run_duration
+    }
+    summary = format_summary(metrics) + "\n\n" + format_open_loop_report(metrics['open_loop'])
+    confusion_text = format_confusion_matrix(metrics['confusion_matrix'])
+    save_reports(Path(args.output_dir), test_run, results, metrics, summary, confusion_text)
+    print("")
+
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
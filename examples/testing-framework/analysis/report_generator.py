@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+HTML Report and Trend Generator
+
+Builds one self-contained static HTML page (inline CSS and SVG, no scripts
+or external assets) from any number of stored runs:
+
+    - accuracy (overall and per tier) and latency (P50/P90/P99) trends over time,
+      with the README success targets as dashed lines
+    - a table of every run with its success-criteria result
+    - per run: latency CDFs per difficulty tier, an intent confusion heatmap
+      and the tier / intent accuracy tables
+
+Runs are summarized in parallel worker processes. Each run's summary and its
+rendered HTML section are cached in <output-dir>/report_cache.json under a
+fingerprint of its source (file size and mtime, then content hash; for a
+result store, the run's metadata and latency column), so regenerating the
+page after a new run only processes that run.
+
+Run sources:
+    results.json          a stratified_results.json (any *results.json name)
+    results.jsonl         an append-only result log
+    history.rstore        every run in a result store (see result_store.py)
+    history.rstore#RUN    one run from a result store
+    DIRECTORY             every *results.json and *.rstore below it, plus result logs of
+                          interrupted runs (a stratified_results.jsonl with no .json beside it)
+
+Usage:
+    python3 report_generator.py ../results/ /path/to/monitoring/ --output-dir ../reports
+    python3 report_generator.py history.rstore --workers 8
+    python3 report_generator.py ../results/ --full      # ignore the cache
+
+Arguments:
+    SOURCES             Result files, stores or directories (see above)
+    --output-dir PATH   Where to write index.html and the cache (default: <RESULTS_DIR>/reports)
+    --workers N         Worker processes (default: CPU count)
+    --title TEXT        Page title (default: Query Router Test Runs)
+    --full              Reprocess every run, ignoring the cache
+
+Outputs:
+    - index.html: The report
+    - report_cache.json: Per-run summaries and HTML sections for incremental regeneration
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import time
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compare_runs import SUCCESS_CRITERIA, check_criteria, load_run
+from difficulty_stratified_test import RESULT_LOG_NAME, RESULTS_DIR
+from metrics_aggregator import DIFFICULTIES, INTENTS, ResultColumns, aggregate_metrics
+from result_store import ResultStore
+
+CACHE_NAME = "report_cache.json"
+CACHE_VERSION = 1  # bump when the summary fields or the per-run HTML change
+CDF_POINTS = 200
+TIER_COLORS = {"overall": "#555555", "easy": "#2e7d32", "medium": "#f9a825", "hard": "#c62828"}
+PERCENTILE_COLORS = {"p50": "#1565c0", "p90": "#6a1b9a", "p99": "#c62828"}
+
+
+# Run discovery and fingerprints
+
+def discover_sources(paths: List[str]) -> List[str]:
+    """Expand directories and stores into individual run sources (paths or STORE#RUN specs)."""
+    sources = []
+    for spec in paths:
+        # Absolute paths keep cache keys stable whatever directory the report is built from
+        spec = os.path.abspath(spec.partition('#')[0]) + ''.join(spec.partition('#')[1:])
+        path = Path(spec.partition('#')[0])
+        if path.is_dir():
+            for found in sorted(path.rglob('*')):
+                # A result log is only a run of its own while its results.json has not been written
+                if (found.name.endswith('results.json') or found.suffix == '.rstore' or (
+                        found.name == RESULT_LOG_NAME and not found.with_suffix('.json').exists())):
+                    sources.extend(discover_sources([str(found)]))
+        elif path.suffix == '.rstore' and '#' not in spec:
+            sources.extend(f"{path}#{run}" for run in _open_store(str(path)).runs)
+        else:
+            sources.append(spec)
+    return list(dict.fromkeys(sources))
+
+
+@lru_cache(maxsize=None)
+def _open_store(path: str) -> ResultStore:
+    """Stores are opened once per process; their header is parsed on open and shared by every run."""
+    return ResultStore(Path(path))
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(source: str, cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cheap identity of a run's content; hashes only when the cheap check says it might have changed."""
+    path_part, _, run = source.partition('#')
+    path = Path(path_part)
+    if run:
+        store = _open_store(path_part)
+        info = store.run(run)
+        digest = hashlib.sha256(json.dumps({k: v for k, v in info.items() if k not in ('start', 'stop')},
+                                           sort_keys=True, default=str).encode())
+        digest.update(np.ascontiguousarray(store.column('latency_seconds')[info['start']:info['stop']]).tobytes())
+        return {"content": digest.hexdigest()}
+
+    stat = path.stat()
+    quick = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if cached and all(cached.get(key) == value for key, value in quick.items()):
+        return cached
+    return dict(quick, content=_file_digest(path))
+
+
+def _same_content(a: Dict[str, Any], b: Optional[Dict[str, Any]]) -> bool:
+    return b is not None and a.get('content') == b.get('content')
+
+
+# Per-run summary (runs in worker processes)
+
+def summarize_run(source: str) -> Dict[str, Any]:
+    """Load one run, compute its metrics and latency CDFs, and render its HTML section."""
+    try:
+        path_part, _, run = source.partition('#')
+        if run:
+            store = _open_store(path_part)
+            test_run = store.run(run)["document"].get('test_run', {})
+            columns = ResultColumns.from_results(store.results(run))
+        else:
+            test_run, columns = load_run(Path(source))
+    except (KeyError, ValueError) as e:
+        # e.g. a sweep_results.json picked up by a directory scan
+        return {"source": source, "skipped": f"not a result file ({type(e).__name__}: {e})"}
+    metrics = aggregate_metrics(columns)
+    path = Path(source.partition('#')[0])
+    timestamp = test_run.get('timestamp') or datetime.fromtimestamp(path.stat().st_mtime).isoformat()
+    name = source.partition('#')[2] or (path.parent.name if path.name in ('stratified_results.json', RESULT_LOG_NAME)
+                                        else path.stem)
+
+    success = columns.status == 0
+    cdfs = {}
+    grid = np.linspace(0, 1, CDF_POINTS)
+    for label, mask in [("overall", success)] + [(tier, success & (columns.difficulty == d))
+                                                 for d, tier in enumerate(DIFFICULTIES)]:
+        latencies = columns.latency[mask]
+        if latencies.size:
+            cdfs[label] = [float(f"{v:.6g}") for v in np.quantile(latencies, grid)]
+
+    summary = {
+        "source": source,
+        "name": name,
+        "timestamp": timestamp,
+        "mode": test_run.get('mode', 'stratified'),
+        "test_suite": Path(test_run['test_suite']).name if test_run.get('test_suite') else None,
+        "queries": len(columns),
+        "cdfs": cdfs,
+    }
+    if 'error' in metrics:
+        summary["error"] = metrics['error']
+    else:
+        criteria = check_criteria(metrics, 'target', {})
+        summary.update({
+            "success_rate": metrics['overall']['success_rate'],
+            "accuracy": metrics['overall']['overall_accuracy'],
+            "tiers": {tier: data['accuracy'] for tier, data in metrics['by_difficulty'].items()},
+            "intents": {intent: data['accuracy'] for intent, data in metrics['intent_overall'].items()},
+            "latency": {p: metrics['latency'][f"{p}_seconds"] for p in ("p50", "p90", "p99")},
+            "confusion": metrics['confusion_matrix'],
+            "criteria_passed": sum(1 for c in criteria if c['passed']),
+            "criteria_total": sum(1 for c in criteria if c['passed'] is not None),
+        })
+    summary["html"] = render_run_section(summary)
+    return summary
+
+
+# SVG and HTML rendering
+
+def _svg_line_chart(series: List[Tuple[str, str, List[float], List[float]]], x_range: Tuple[float, float],
+                    y_range: Tuple[float, float], x_ticks: List[Tuple[float, str]], y_ticks: List[Tuple[float, str]],
+                    log_x: bool = False, guides: Optional[List[Tuple[float, str]]] = None,
+                    width: int = 560, height: int = 260, markers: bool = False) -> str:
+    """An inline SVG line chart. series: (label, color, xs, ys); guides: dashed horizontal (y, color) lines."""
+    left, right, top, bottom = 52, 110, 12, 30
+    plot_w, plot_h = width - left - right, height - top - bottom
+    x0, x1 = (np.log10(x_range[0]), np.log10(x_range[1])) if log_x else x_range
+    y0, y1 = y_range
+
+    def sx(x: float) -> float:
+        x = np.log10(max(x, x_range[0])) if log_x else x
+        return left + (x - x0) / ((x1 - x0) or 1) * plot_w
+
+    def sy(y: float) -> float:
+        return top + plot_h - (min(max(y, y0), y1) - y0) / ((y1 - y0) or 1) * plot_h
+
+    parts = [f'<svg viewBox="0 0 {width} {height}" width="{width}" height="{height}" class="chart">',
+             f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" class="plot"/>']
+    for y, label in y_ticks:
+        parts.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{sy(y):.1f}" y2="{sy(y):.1f}" class="grid"/>'
+                     f'<text x="{left - 6}" y="{sy(y) + 4:.1f}" class="tick" text-anchor="end">{html.escape(label)}</text>')
+    for x, label in x_ticks:
+        parts.append(f'<text x="{sx(x):.1f}" y="{top + plot_h + 18}" class="tick" text-anchor="middle">'
+                     f'{html.escape(label)}</text>')
+    for y, color in guides or []:
+        parts.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{sy(y):.1f}" y2="{sy(y):.1f}" '
+                     f'stroke="{color}" class="guide"/>')
+    for i, (label, color, xs, ys) in enumerate(series):
+        points = " ".join(f"{sx(x):.1f},{sy(y):.1f}" for x, y in zip(xs, ys))
+        parts.append(f'<polyline points="{points}" stroke="{color}" class="series"/>')
+        if markers:
+            parts.extend(f'<circle cx="{sx(x):.1f}" cy="{sy(y):.1f}" r="2.5" fill="{color}"/>' for x, y in zip(xs, ys))
+        parts.append(f'<text x="{left + plot_w + 10}" y="{top + 14 + i * 16}" fill="{color}" class="legend">'
+                     f'{html.escape(label)}</text>')
+    parts.append('</svg>')
+    return "".join(parts)
+
+
+def _latency_ticks(low: float, high: float) -> List[Tuple[float, str]]:
+    """Decade ticks (and 2x / 5x when few decades) between low and high seconds, labelled in ms or s."""
+    ticks = []
+    for exponent in range(int(np.floor(np.log10(low))), int(np.ceil(np.log10(high))) + 1):
+        for mantissa in ((1,) if np.log10(high / low) > 3 else (1, 2, 5)):
+            value = mantissa * 10.0 ** exponent
+            if low <= value <= high:
+                ticks.append((value, f"{value * 1000:g}ms" if value < 1 else f"{value:g}s"))
+    return ticks
+
+
+def render_cdf_chart(cdfs: Dict[str, List[float]]) -> str:
+    """Latency CDF per tier on a log latency axis."""
+    values = [v for cdf in cdfs.values() for v in cdf if v > 0]
+    if not values:
+        return '<p class="muted">No successful queries</p>'
+    low, high = min(values), max(values)
+    low, high = 10 ** np.floor(np.log10(low)), 10 ** np.ceil(np.log10(high))
+    probabilities = np.linspace(0, 100, CDF_POINTS).tolist()
+    series = [(label, TIER_COLORS[label], cdf, probabilities) for label, cdf in cdfs.items()]
+    return _svg_line_chart(series, (low, high), (0, 100), _latency_ticks(low, high),
+                           [(p, f"{p}%") for p in (0, 25, 50, 75, 90, 100)], log_x=True,
+                           guides=[(99, "#999999")])
+
+
+def render_confusion_heatmap(confusion: Dict[str, Dict[str, int]]) -> str:
+    """Confusion matrix as a table shaded by row share: green on the diagonal, red off it."""
+    columns = INTENTS + (['unknown'] if any(row.get('unknown') for row in confusion.values()) else [])
+    rows = ['<table class="heatmap"><tr><th>expected ↓ / actual →</th>'
+            + "".join(f"<th>{intent}</th>" for intent in columns) + "</tr>"]
+    for expected in INTENTS:
+        row = confusion.get(expected, {})
+        total = sum(row.values())
+        cells = []
+        for actual in columns:
+            count = row.get(actual, 0)
+            share = count / total if total else 0.0
+            # sqrt keeps a few percent of misroutes visible next to a ~90% diagonal
+            rgb = "46,125,50" if actual == expected else "198,40,40"
+            cells.append(f'<td style="background: rgba({rgb},{np.sqrt(share) * 0.85:.2f})" '
+                         f'title="{share * 100:.1f}%">{count}</td>')
+        rows.append(f"<tr><th>{expected}</th>{''.join(cells)}</tr>")
+    rows.append("</table>")
+    return "".join(rows)
+
+
+def _fmt_pct(value: Optional[float]) -> str:
+    return "–" if value is None else f"{value:.1f}%"
+
+
+def _fmt_latency(seconds: Optional[float]) -> str:
+    return "–" if seconds is None else f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+def render_run_section(run: Dict[str, Any]) -> str:
+    """The <details> block for one run: CDF, heatmap and accuracy tables."""
+    title = (f"{html.escape(run['name'])} <span class=\"muted\">{html.escape(run['timestamp'][:19])} · "
+             f"{run['queries']} queries · {html.escape(run['mode'])}</span>")
+    if 'error' in run:
+        return f'<details id="{_anchor(run)}"><summary>{title}</summary><p>{html.escape(run["error"])}</p></details>'
+
+    tiers = "".join(f"<tr><th>{tier}</th><td>{_fmt_pct(run['tiers'].get(tier))}</td></tr>" for tier in DIFFICULTIES)
+    intents = "".join(f"<tr><th>{intent}</th><td>{_fmt_pct(run['intents'].get(intent))}</td></tr>"
+                      for intent in INTENTS)
+    latency = " · ".join(f"{p.upper()} {_fmt_latency(v)}" for p, v in run['latency'].items())
+    return (
+        f'<details id="{_anchor(run)}"><summary>{title}</summary>'
+        f'<p>Accuracy {_fmt_pct(run["accuracy"])} · success {_fmt_pct(run["success_rate"])} · {latency} · '
+        f'criteria {run["criteria_passed"]}/{run["criteria_total"]}'
+        f'{" · suite " + html.escape(run["test_suite"]) if run.get("test_suite") else ""}</p>'
+        f'<div class="row"><div><h4>Latency CDF by tier</h4>{render_cdf_chart(run["cdfs"])}</div>'
+        f'<div><h4>Confusion matrix</h4>{render_confusion_heatmap(run["confusion"])}'
+        f'<div class="row"><table class="small"><tr><th colspan="2">By tier</th></tr>{tiers}</table>'
+        f'<table class="small"><tr><th colspan="2">By intent</th></tr>{intents}</table></div></div></div>'
+        f'<p class="muted">Source: {html.escape(run["source"])}</p></details>'
+    )
+
+
+def _anchor(run: Dict[str, Any]) -> str:
+    return "run-" + hashlib.sha1(run['source'].encode()).hexdigest()[:10]
+
+
+def _run_label(run: Dict[str, Any]) -> str:
+    return run['timestamp'][5:16].replace('T', ' ')
+
+
+def _nice_step(span: float, max_ticks: int = 6) -> float:
+    """The smallest 1/2/5 x 10^k step that covers span in at most max_ticks intervals."""
+    magnitude = 10 ** np.floor(np.log10(span / max_ticks))
+    return next(m * magnitude for m in (1, 2, 5, 10) if span / (m * magnitude) <= max_ticks)
+
+
+def render_trends(runs: List[Dict[str, Any]]) -> str:
+    """Accuracy and latency percentile trends across runs, oldest first."""
+    runs = [run for run in runs if 'error' not in run]
+    if len(runs) < 2:
+        return '<p class="muted">Trends need at least two runs.</p>'
+    xs = list(range(len(runs)))
+    step = max(1, len(runs) // 8)
+    x_ticks = [(i, _run_label(runs[i])) for i in range(0, len(runs), step)]
+
+    accuracy_series = [("overall", TIER_COLORS["overall"], xs, [run['accuracy'] for run in runs])]
+    for tier in DIFFICULTIES:
+        points = [(i, run['tiers'][tier]) for i, run in enumerate(runs) if tier in run['tiers']]
+        if points:
+            accuracy_series.append((tier, TIER_COLORS[tier], [p[0] for p in points], [p[1] for p in points]))
+    low = min(min(ys) for _, _, _, ys in accuracy_series)
+    y_low = max(0, int(low // 10) * 10)
+    targets = {name.split()[0].lower(): target for name, _, _, target, _ in SUCCESS_CRITERIA if name.endswith("Tier")}
+    accuracy_chart = _svg_line_chart(
+        accuracy_series, (0, len(runs) - 1), (y_low, 100), x_ticks,
+        [(y, f"{y}%") for y in range(y_low, 101, 10)],
+        guides=[(target, TIER_COLORS[tier]) for tier, target in targets.items() if target >= y_low],
+        width=900, markers=len(runs) <= 60)
+
+    latency_series = [(p.upper(), color, xs, [run['latency'][p] for run in runs])
+                      for p, color in PERCENTILE_COLORS.items()]
+    top = max(max(ys) for _, _, _, ys in latency_series)
+    step = _nice_step(top) if top > 0 else 0.2
+    y_high = float(np.ceil(top / step) * step) or step
+    latency_targets = {name.split()[0].lower(): target for name, _, _, target, _ in SUCCESS_CRITERIA
+                       if name.endswith("Latency")}
+    latency_chart = _svg_line_chart(
+        latency_series, (0, len(runs) - 1), (0, y_high), x_ticks,
+        [(y, _fmt_latency(y)) for y in np.arange(0, y_high + step / 2, step)],
+        guides=[(target, PERCENTILE_COLORS[p]) for p, target in latency_targets.items() if target <= y_high],
+        width=900, markers=len(runs) <= 60)
+
+    return f"<h3>Accuracy</h3>{accuracy_chart}<h3>Latency</h3>{latency_chart}"
+
+
+def render_run_table(runs: List[Dict[str, Any]]) -> str:
+    """One row per run, newest first, linking to its section."""
+    rows = ['<table class="runs"><tr><th>Run</th><th>Date</th><th>Mode</th><th>Queries</th><th>Accuracy</th>'
+            + "".join(f"<th>{tier.title()}</th>" for tier in DIFFICULTIES)
+            + '<th>P50</th><th>P90</th><th>P99</th><th>Criteria</th></tr>']
+    for run in reversed(runs):
+        link = f'<a href="#{_anchor(run)}">{html.escape(run["name"])}</a>'
+        if 'error' in run:
+            rows.append(f'<tr><td>{link}</td><td>{html.escape(run["timestamp"][:16])}</td>'
+                        f'<td colspan="11">{html.escape(run["error"])}</td></tr>')
+            continue
+        passed = run['criteria_passed'] == run['criteria_total']
+        rows.append(
+            f'<tr><td>{link}</td><td>{html.escape(run["timestamp"][:16].replace("T", " "))}</td>'
+            f'<td>{html.escape(run["mode"])}</td><td>{run["queries"]}</td><td>{_fmt_pct(run["accuracy"])}</td>'
+            + "".join(f"<td>{_fmt_pct(run['tiers'].get(tier))}</td>" for tier in DIFFICULTIES)
+            + "".join(f"<td>{_fmt_latency(v)}</td>" for v in run['latency'].values())
+            + f'<td class="{"pass" if passed else "fail"}">{run["criteria_passed"]}/{run["criteria_total"]}</td></tr>'
+        )
+    rows.append("</table>")
+    return "".join(rows)
+
+
+STYLE = """
+body { font: 14px/1.45 -apple-system, "Segoe UI", Helvetica, Arial, sans-serif; margin: 24px; color: #222; }
+h1 { margin-bottom: 4px; } h4 { margin: 8px 0 4px; }
+.muted { color: #777; font-weight: normal; }
+table { border-collapse: collapse; margin: 6px 12px 6px 0; }
+th, td { border: 1px solid #ddd; padding: 3px 8px; text-align: right; }
+th:first-child, td:first-child { text-align: left; }
+.runs tr:nth-child(even) { background: #fafafa; }
+.pass { color: #2e7d32; font-weight: bold; } .fail { color: #c62828; font-weight: bold; }
+.heatmap td { min-width: 56px; text-align: center; }
+.small td, .small th { font-size: 12px; }
+.row { display: flex; flex-wrap: wrap; gap: 16px; align-items: flex-start; }
+details { border: 1px solid #e3e3e3; border-radius: 4px; padding: 6px 10px; margin: 8px 0; }
+summary { cursor: pointer; font-weight: bold; }
+.chart .plot { fill: #fff; stroke: #ccc; } .chart .grid { stroke: #eee; }
+.chart .guide { stroke-dasharray: 4 3; opacity: 0.6; }
+.chart .series { fill: none; stroke-width: 1.8; }
+.chart .tick { font-size: 11px; fill: #666; } .chart .legend { font-size: 12px; }
+"""
+
+
+def render_page(runs: List[Dict[str, Any]], title: str) -> str:
+    """The full HTML document; runs are oldest first, the newest run's section starts open."""
+    sections = [run['html'] for run in reversed(runs)]
+    if sections:
+        sections[0] = sections[0].replace("<details ", "<details open ", 1)
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+        f'<style>{STYLE}</style></head><body>'
+        f'<h1>{html.escape(title)}</h1>'
+        f'<p class="muted">{len(runs)} runs · generated {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>'
+        f'<h2>Trends</h2>{render_trends(runs)}'
+        f'<h2>Runs</h2>{render_run_table(runs)}'
+        f'<h2>Run details</h2>{"".join(sections)}'
+        f'</body></html>'
+    )
+
+
+# Incremental generation
+
+def load_cache(path: Path) -> Dict[str, Any]:
+    """Cached entries by source, or an empty cache if the file is missing, unreadable or from another version."""
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache['runs']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def generate(sources: List[str], output_dir: Path, workers: int, title: str,
+             full: bool = False) -> Tuple[Path, int, int]:
+    """Summarize changed runs in parallel, reuse cached ones, and write index.html.
+
+    Returns (page path, runs processed, runs reused).
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache_path = output_dir / CACHE_NAME
+    cache = {} if full else load_cache(cache_path)
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    stale = []
+    for source in sources:
+        cached = cache.get(source)
+        current = fingerprint(source, cached['fingerprint'] if cached else None)
+        if cached and _same_content(current, cached['fingerprint']):
+            entries[source] = {"fingerprint": current, "summary": cached['summary']}
+        else:
+            stale.append((source, current))
+
+    if stale:
+        if workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as pool:
+                chunksize = max(1, len(stale) // (workers * 4))
+                summaries = list(pool.map(summarize_run, [source for source, _ in stale], chunksize=chunksize))
+        else:
+            summaries = [summarize_run(source) for source, _ in stale]
+        for (source, current), summary in zip(stale, summaries):
+            entries[source] = {"fingerprint": current, "summary": summary}
+
+    # Runs no longer among the sources drop out of the cache
+    tmp_path = cache_path.with_name(cache_path.name + f".{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({"version": CACHE_VERSION, "runs": entries}, f)
+    os.replace(tmp_path, cache_path)
+
+    skipped = [entry['summary'] for entry in entries.values() if 'skipped' in entry['summary']]
+    for run in skipped:
+        print(f"⚠️  Skipped {run['source']}: {run['skipped']}")
+    runs = sorted((entry['summary'] for entry in entries.values() if 'skipped' not in entry['summary']),
+                  key=lambda run: run['timestamp'])
+    page_path = output_dir / "index.html"
+    with open(page_path, 'w') as f:
+        f.write(render_page(runs, title))
+    return page_path, len(stale), len(entries) - len(stale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate an HTML report with trends from stored test runs')
+    parser.add_argument('sources', type=str, nargs='+', help='Result files, result stores or directories')
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(RESULTS_DIR / "reports"),
+        help='Directory for index.html and the cache (default: <RESULTS_DIR>/reports)'
+    )
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes (default: CPU count)')
+    parser.add_argument('--title', type=str, default='Query Router Test Runs', help='Page title')
+    parser.add_argument('--full', action='store_true', help='Reprocess every run, ignoring the cache')
+    args = parser.parse_args()
+
+    sources = discover_sources(args.sources)
+    if not sources:
+        parser.error('no runs found in the given sources')
+    print(f"📖 {len(sources)} runs from {len(args.sources)} sources")
+
+    start = time.perf_counter()
+    page_path, processed, reused = generate(sources, Path(args.output_dir), max(1, args.workers), args.title,
+                                            args.full)
+    print(f"⚡ Processed {processed} runs, reused {reused} from cache in {time.perf_counter() - start:.2f}s")
+    print(f"✅ Report saved to: {page_path}")
+
+
+if __name__ == "__main__":
+    main()
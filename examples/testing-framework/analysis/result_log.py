@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Append-Only Result Log
+
+Streams per-query result dicts to a JSON Lines file as they complete, so a
+crashed or interrupted run loses at most the results written since the last
+fsync, and memory no longer grows with the size of the suite.
+
+    with ResultLog(path, resume=True) as log:
+        done = log.completed_ids          # query IDs already on disk
+        log.write(result)                 # one line per result, fsync'd periodically
+
+    for result in iter_results(path):     # stream results back for reporting
+        ...
+
+On resume, a trailing partial line left by a crash mid-write is truncated
+before appending, so the log always stays valid JSON Lines.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Set
+
+
+class ResultLog:
+    """Append-only JSON Lines writer with periodic fsync and resume support.
+
+    Args:
+        path: Log file path (created if missing)
+        resume: Keep existing complete lines and expose their query IDs; otherwise start empty
+        fsync_every: fsync after this many results...
+        fsync_interval: ...or after this many seconds, whichever comes first
+    """
+
+    def __init__(self, path: Path, resume: bool = False, fsync_every: int = 50,
+                 fsync_interval: float = 1.0):
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.completed_ids: Set[Any] = set()
+        self.written = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists():
+            self.completed_ids = self._recover()
+        else:
+            self.path.write_text("")
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _recover(self) -> Set[Any]:
+        """Collect query IDs from complete lines and truncate any partial trailing line."""
+        completed = set()
+        valid_bytes = 0
+
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                completed.add(result.get('query_id'))
+                valid_bytes += len(line)
+
+        if valid_bytes < self.path.stat().st_size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+        return completed
+
+    def write(self, result: Dict[str, Any]):
+        """Append one result as a single JSON line."""
+        self._file.write(json.dumps(result) + "\n")
+        self._file.flush()
+        self.completed_ids.add(result.get('query_id'))
+        self.written += 1
+        self._unsynced += 1
+
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """Force buffered results to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self) -> "ResultLog":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_results(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream result dicts back from a log, skipping a partial trailing line."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            yield json.loads(line)
+
+
+def _indent_tail(text: str, prefix: str) -> str:
+    """Indent every line but the first, so nested json.dumps() output lines up."""
+    return text.replace("\n", "\n" + prefix)
+
+
+def write_results_json(path: Path, test_run: Dict[str, Any], results: Iterable[Dict[str, Any]],
+                       metrics: Dict[str, Any]):
+    """Write stratified_results.json by streaming over results.
+
+    Produces the same bytes as json.dump({"test_run", "results", "metrics"},
+    indent=2) without holding the results list in memory. The file is written
+    to a temporary name and renamed into place, so a crash never leaves a
+    truncated report behind.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{\n  "test_run": ' + _indent_tail(json.dumps(test_run, indent=2), "  ") + ',\n')
+
+        f.write('  "results": [')
+        first = True
+        for result in results:
+            f.write(("\n" if first else ",\n") + "    " + _indent_tail(json.dumps(result, indent=2), "    "))
+            first = False
+        f.write(']' if first else '\n  ]')
+
+        f.write(',\n  "metrics": ' + _indent_tail(json.dumps(metrics, indent=2), "  "))
+        f.write('\n}')
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Columnar Result Store for Historical Runs
+
+Packs any number of stratified_results.json files into one compact binary
+file. Trending the router over months of runs then means memory-mapping a few
+NumPy columns instead of parsing every pretty-printed JSON report, where each
+row repeats its query text and rationale.
+
+Layout of a .rstore file:
+
+    b"RSTORE01" | header length (uint64 LE) | JSON header | 64-byte aligned arrays
+
+The header holds the run table (name, row range, test_run, metrics), the
+array directory and a small index. Each array is read with np.memmap, so only
+the columns a caller touches are paged in:
+
+    - one column per known result field and value type: int64, float64, bool,
+      or int32 codes into a shared string pool (query text, intents,
+      difficulties, statuses, timestamps, database names...)
+    - databases_used as CSR offsets + string codes
+    - a per-row layout code (key order and which column holds each key) and a
+      JSON blob for anything that doesn't fit a column (server_timings, None
+      values, unknown keys), which is what keeps conversion lossless
+    - row lists per difficulty and expected intent, so rows(run, difficulty,
+      expected_intent) is an intersection of sorted arrays
+
+Converting a run back produces the original document; for files written by
+the runners (json.dump indent=2) that is byte-for-byte the same file.
+
+Usage:
+    python3 result_store.py pack history.rstore ../results/*/*-stratified-results.json
+    python3 result_store.py pack history.rstore NEW/stratified_results.json --append --name 2025-11-02
+    python3 result_store.py trend history.rstore
+    python3 result_store.py unpack history.rstore 2025-10-08-stratified-results -o restored.json
+
+In code:
+    store = ResultStore("history.rstore")
+    latency = store.column("latency_seconds")                 # float64 memmap over every run
+    rows = store.rows(run="2025-10-08-stratified-results", difficulty="hard", expected_intent="graph")
+    for result in store.results(run): ...                     # the original result dicts
+
+compare_runs.py accepts a run inside a store as history.rstore#RUN.
+"""
+
+import argparse
+import json
+import struct
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from result_log import write_results_json
+
+MAGIC = b"RSTORE01"
+ALIGNMENT = 64
+FORMAT_VERSION = 1
+
+# Value types each known result field may be stored as, tried in order;
+# anything else (None, dicts, unexpected types, unknown keys) goes to the JSON blob
+FIELD_KINDS = {
+    'query_id': ('int', 'str'),
+    'query': ('str',),
+    'expected_intent': ('str',),
+    'actual_intent': ('str',),
+    'intent_correct': ('bool',),
+    'difficulty': ('str',),
+    'difficulty_rationale': ('str',),
+    'databases_used': ('strlist',),
+    'result_count': ('int',),
+    'cached': ('bool',),
+    'latency_seconds': ('float',),
+    'status': ('str',),
+    'timestamp': ('str',),
+    'error_code': ('int',),
+    'error_message': ('str',),
+    'phase': ('str',),
+}
+
+INDEXED_FIELDS = ('difficulty', 'expected_intent')
+
+_ACCEPTS = {
+    'int': lambda v: type(v) is int and -2**63 <= v < 2**63,
+    'float': lambda v: type(v) is float,
+    'bool': lambda v: type(v) is bool,
+    'str': lambda v: type(v) is str,
+    'strlist': lambda v: type(v) is list and all(type(x) is str for x in v),
+}
+_DTYPES = {'int': np.int64, 'float': np.float64, 'bool': np.bool_, 'str': np.int32}
+_MISSING = {'int': 0, 'float': float('nan'), 'bool': False, 'str': -1}
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _column_name(field: str, kind: str) -> str:
+    return f"{field}:{kind}"
+
+
+def _pack_strings(values: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate byte strings into (offsets, data) arrays."""
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in values], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(values), dtype=np.uint8)
+
+
+class _StoreBuilder:
+    """Accumulates runs row by row and writes the finished store."""
+
+    def __init__(self):
+        self.string_codes: Dict[str, int] = {}
+        self.layout_codes: Dict[Tuple[Tuple[str, str], ...], int] = {}
+        self.runs: List[Dict[str, Any]] = []
+        self.columns: Dict[str, List[Any]] = {
+            _column_name(field, kind): []
+            for field, kinds in FIELD_KINDS.items() for kind in kinds if kind != 'strlist'
+        }
+        self.used_columns = set()
+        self.list_offsets: Dict[str, List[int]] = {
+            field: [0] for field, kinds in FIELD_KINDS.items() if 'strlist' in kinds
+        }
+        self.list_codes: Dict[str, List[int]] = {field: [] for field in self.list_offsets}
+        self.run_codes: List[int] = []
+        self.layouts: List[int] = []
+        self.extras: List[bytes] = []
+
+    def string(self, value: str) -> int:
+        code = self.string_codes.get(value)
+        if code is None:
+            code = self.string_codes[value] = len(self.string_codes)
+        return code
+
+    def add_run(self, name: str, document: Dict[str, Any]):
+        if 'results' not in document:
+            raise ValueError(f"{name}: no 'results' list")
+        if any(run['name'] == name for run in self.runs):
+            raise ValueError(f"Duplicate run name: {name}")
+
+        run_code = len(self.runs)
+        start = len(self.run_codes)
+        for result in document['results']:
+            self.add_result(run_code, result)
+        self.runs.append({
+            "name": name,
+            "start": start,
+            "stop": len(self.run_codes),
+            "keys": list(document),
+            "document": {key: value for key, value in document.items() if key != 'results'},
+        })
+
+    def add_result(self, run_code: int, result: Dict[str, Any]):
+        layout = []
+        row_values = {}
+        extras = {}
+        for key, value in result.items():
+            kind = next((k for k in FIELD_KINDS.get(key, ()) if _ACCEPTS[k](value)), 'json')
+            layout.append((key, kind))
+            if kind == 'json':
+                extras[key] = value
+            elif kind == 'strlist':
+                codes = self.list_codes[key]
+                codes.extend(self.string(v) for v in value)
+                row_values[key] = len(codes)
+            else:
+                row_values[_column_name(key, kind)] = self.string(value) if kind == 'str' else value
+
+        for name, values in self.columns.items():
+            value = row_values.get(name)
+            if value is None:
+                values.append(_MISSING[name.rsplit(':', 1)[1]])
+            else:
+                values.append(value)
+                self.used_columns.add(name)
+        for field, offsets in self.list_offsets.items():
+            offsets.append(row_values.get(field, offsets[-1]))
+
+        layout_key = tuple(layout)
+        code = self.layout_codes.get(layout_key)
+        if code is None:
+            code = self.layout_codes[layout_key] = len(self.layout_codes)
+        self.layouts.append(code)
+        self.extras.append(json.dumps(extras).encode('utf-8') if extras else b"")
+        self.run_codes.append(run_code)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {
+            "run": np.array(self.run_codes, dtype=np.int32),
+            "layout": np.array(self.layouts, dtype=np.int32),
+        }
+        for name in sorted(self.used_columns):
+            arrays[name] = np.array(self.columns[name], dtype=_DTYPES[name.rsplit(':', 1)[1]])
+        for field, offsets in self.list_offsets.items():
+            if self.list_codes[field]:
+                arrays[f"{field}:offsets"] = np.array(offsets, dtype=np.int64)
+                arrays[f"{field}:codes"] = np.array(self.list_codes[field], dtype=np.int32)
+        arrays["extras:offsets"], arrays["extras:data"] = _pack_strings(self.extras)
+        arrays["strings:offsets"], arrays["strings:data"] = _pack_strings(
+            [value.encode('utf-8') for value in self.string_codes])
+        return arrays
+
+    def index(self, arrays: Dict[str, np.ndarray]) -> Dict[str, Dict[str, List[int]]]:
+        """Row lists per value of each indexed field, stored as index:FIELD arrays."""
+        strings = list(self.string_codes)
+        index = {}
+        for field in INDEXED_FIELDS:
+            codes = arrays.get(_column_name(field, 'str'))
+            if codes is None:
+                continue
+            order = np.argsort(codes, kind='stable')
+            order = order[codes[order] >= 0]
+            sorted_codes = codes[order]
+            bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+            starts = np.concatenate(([0], bounds)) if order.size else np.array([], dtype=np.int64)
+            stops = np.concatenate((bounds, [order.size])) if order.size else np.array([], dtype=np.int64)
+            index[field] = {strings[sorted_codes[s]]: [int(s), int(e)] for s, e in zip(starts, stops)}
+            arrays[f"index:{field}"] = order.astype(np.int64)
+        return index
+
+    def write(self, path: Path):
+        arrays = self.arrays()
+        index = self.index(arrays)
+
+        directory = {}
+        offset = 0
+        for name, array in arrays.items():
+            directory[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = _align(offset + array.nbytes)
+
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "rows": len(self.run_codes),
+            "runs": self.runs,
+            "layouts": [[list(entry) for entry in layout] for layout in self.layout_codes],
+            "index": index,
+            "arrays": directory,
+        }).encode('utf-8')
+        data_start = _align(len(MAGIC) + 8 + len(header))
+
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+            for name, array in arrays.items():
+                f.seek(data_start + directory[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + offset)
+        tmp_path.replace(path)
+
+
+def write_store(path: Path, runs: Iterable[Tuple[str, Dict[str, Any]]]):
+    """Write (name, document) pairs, each a parsed stratified_results.json, to a new store."""
+    builder = _StoreBuilder()
+    for name, document in runs:
+        builder.add_run(name, document)
+    builder.write(path)
+
+
+class ResultStore:
+    """Read-only, memory-mapped view of a .rstore file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a result store")
+            (header_len,) = struct.unpack('<Q', f.read(8))
+            self.header = json.loads(f.read(header_len))
+        if self.header["version"] != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: unsupported store version {self.header['version']}")
+
+        self._data_start = _align(len(MAGIC) + 8 + header_len)
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._strings: Optional[List[str]] = None
+        self._string_codes: Optional[Dict[str, int]] = None
+        self._runs = {run["name"]: run for run in self.header["runs"]}
+        self.layouts = [[tuple(entry) for entry in layout] for layout in self.header["layouts"]]
+
+    def __len__(self) -> int:
+        return self.header["rows"]
+
+    @property
+    def runs(self) -> List[str]:
+        return [run["name"] for run in self.header["runs"]]
+
+    def run(self, name: str) -> Dict[str, Any]:
+        try:
+            return self._runs[name]
+        except KeyError:
+            raise KeyError(f"No run named {name!r} in {self.path}") from None
+
+    def array(self, name: str) -> np.ndarray:
+        """A stored array, memory-mapped on first use."""
+        array = self._arrays.get(name)
+        if array is None:
+            spec = self.header["arrays"][name]
+            dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+            if 0 in shape:
+                array = np.empty(shape, dtype=dtype)
+            else:
+                array = np.memmap(self.path, dtype=dtype, mode='r', offset=self._data_start + spec["offset"],
+                                  shape=shape)
+            self._arrays[name] = array
+        return array
+
+    def column(self, field: str, kind: Optional[str] = None) -> np.ndarray:
+        """Row-aligned column for a field: float64/int64/bool values, or int32 string codes.
+
+        Rows where the field is missing (or held another type) have NaN, 0,
+        False or -1 respectively.
+        """
+        kind = kind or FIELD_KINDS[field][0]
+        name = _column_name(field, kind)
+        if name in self.header["arrays"]:
+            return self.array(name)
+        return np.full(len(self), _MISSING[kind], dtype=_DTYPES[kind])
+
+    @property
+    def strings(self) -> List[str]:
+        """The decoded string pool (code -> string)."""
+        if self._strings is None:
+            offsets = self.array("strings:offsets").tolist()
+            data = self.array("strings:data").tobytes()
+            self._strings = [data[a:b].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+        return self._strings
+
+    def code(self, value: str) -> int:
+        """String pool code for a value, or -1 if no row has it."""
+        if self._string_codes is None:
+            self._string_codes = {value: code for code, value in enumerate(self.strings)}
+        return self._string_codes.get(value, -1)
+
+    def rows(self, run: Optional[str] = None, **where: str) -> np.ndarray:
+        """Sorted row numbers matching a run and/or indexed fields (difficulty=..., expected_intent=...)."""
+        if run is not None:
+            info = self.run(run)
+            selected = np.arange(info["start"], info["stop"], dtype=np.int64)
+        else:
+            selected = None
+
+        for field, value in where.items():
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f"{field} is not indexed; filter column({field!r}) instead")
+            start, stop = self.header["index"].get(field, {}).get(value, (0, 0))
+            matching = self.array(f"index:{field}")[start:stop] if stop > start else np.empty(0, dtype=np.int64)
+            selected = matching if selected is None else np.intersect1d(selected, matching, assume_unique=True)
+
+        return np.arange(len(self), dtype=np.int64) if selected is None else np.asarray(selected)
+
+    def results(self, run: str) -> Iterator[Dict[str, Any]]:
+        """The run's result dicts, exactly as they were packed."""
+        info = self.run(run)
+        start, stop = info["start"], info["stop"]
+        if stop == start:
+            return
+
+        columns = {_column_name(field, kind): self.column(field, kind)[start:stop].tolist()
+                   for field, kinds in FIELD_KINDS.items() for kind in kinds if kind in _DTYPES}
+        lists = {field: (self.array(f"{field}:offsets")[start:stop + 1].tolist(), self.array(f"{field}:codes"))
+                 for field, kinds in FIELD_KINDS.items() if 'strlist' in kinds
+                 and f"{field}:offsets" in self.header["arrays"]}
+        layouts = self.array("layout")[start:stop].tolist()
+        extra_offsets = self.array("extras:offsets")[start:stop + 1].tolist()
+        extra_data = self.array("extras:data")
+        strings = self.strings
+
+        for i in range(stop - start):
+            extras = None
+            if extra_offsets[i + 1] > extra_offsets[i]:
+                extras = json.loads(extra_data[extra_offsets[i]:extra_offsets[i + 1]].tobytes())
+
+            result = {}
+            for key, kind in self.layouts[layouts[i]]:
+                if kind == 'json':
+                    result[key] = extras[key]
+                elif kind == 'strlist':
+                    offsets, codes = lists[key]
+                    result[key] = [strings[c] for c in codes[offsets[i]:offsets[i + 1]].tolist()]
+                elif kind == 'str':
+                    result[key] = strings[columns[_column_name(key, kind)][i]]
+                else:
+                    result[key] = columns[_column_name(key, kind)][i]
+            yield result
+
+    def document(self, run: str) -> Dict[str, Any]:
+        """The full stratified_results.json document for a run."""
+        info = self.run(run)
+        return {key: list(self.results(run)) if key == 'results' else info["document"][key]
+                for key in info["keys"]}
+
+    def to_json(self, run: str, path: Path):
+        """Write a run back out as JSON (indent=2, like the runners write it)."""
+        info = self.run(run)
+        if info["keys"] == ['test_run', 'results', 'metrics']:
+            write_results_json(path, info["document"]["test_run"], self.results(run), info["document"]["metrics"])
+        else:
+            with open(path, 'w') as f:
+                json.dump(self.document(run), f, indent=2)
+
+    def run_summary(self, run: str) -> Dict[str, Any]:
+        """Query count, error rate, accuracy and latency percentiles (linear interpolation) straight from the columns."""
+        info = self.run(run)
+        rows = slice(info["start"], info["stop"])
+        total = info["stop"] - info["start"]
+        success = self.column("status")[rows] == self.code("success")
+        latency = self.column("latency_seconds")[rows][success]
+        correct = self.column("intent_correct")[rows][success]
+        summary = {"run": run, "queries": total, "successful": int(success.sum()),
+                   "error_rate": float(1 - success.mean()) if total else 0.0,
+                   "accuracy": float(correct.mean()) if correct.size else 0.0}
+        for p in (50, 90, 99):
+            summary[f"p{p}"] = float(np.percentile(latency, p)) if latency.size else 0.0
+        return summary
+
+
+def load_store_run(spec: str) -> Tuple[ResultStore, str]:
+    """Open STORE#RUN (or a store with a single run) and return the store and run name."""
+    path, _, run = spec.partition('#')
+    store = ResultStore(Path(path))
+    if not run:
+        if len(store.runs) != 1:
+            raise ValueError(f"{path} holds {len(store.runs)} runs; select one as {path}#RUN")
+        run = store.runs[0]
+    store.run(run)
+    return store, run
+
+
+def _load_documents(paths: List[Path], names: Optional[List[str]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for i, path in enumerate(paths):
+        with open(path, 'r') as f:
+            yield (names[i] if names else path.stem), json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack result JSON files into a columnar store and read them back')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack = subparsers.add_parser('pack', help='Pack stratified_results.json files into a store')
+    pack.add_argument('store', type=str, help='Store file to write (.rstore)')
+    pack.add_argument('inputs', type=str, nargs='+', help='Result JSON files, one run each')
+    pack.add_argument('--name', type=str, action='append',
+                      help='Run name for each input, in order (default: file name without extension)')
+    pack.add_argument('--append', action='store_true', help='Keep the runs already in the store')
+    pack.add_argument('--verify', action='store_true', help='Check every input round-trips exactly')
+
+    unpack = subparsers.add_parser('unpack', help='Write one run back out as JSON')
+    unpack.add_argument('store', type=str)
+    unpack.add_argument('run', type=str)
+    unpack.add_argument('-o', '--output', type=str, required=True, help='JSON file to write')
+
+    for name in ('info', 'trend'):
+        sub = subparsers.add_parser(name)
+        sub.add_argument('store', type=str)
+
+    args = parser.parse_args()
+    store_path = Path(args.store)
+
+    if args.command == 'pack':
+        inputs = [Path(p) for p in args.inputs]
+        if args.name and len(args.name) != len(inputs):
+            parser.error('--name must be given once per input')
+
+        runs: Iterable[Tuple[str, Dict[str, Any]]] = _load_documents(inputs, args.name)
+        if args.append and store_path.exists():
+            existing = ResultStore(store_path)
+            runs = [(name, existing.document(name)) for name in existing.runs] + list(runs)
+
+        write_store(store_path, runs)
+        store = ResultStore(store_path)
+        input_bytes = sum(p.stat().st_size for p in inputs)
+        print(f"✅ {store_path}: {len(store.runs)} runs, {len(store)} rows, {len(store.strings)} distinct strings, "
+              f"{store_path.stat().st_size / 1024:.1f} KiB ({input_bytes / 1024:.1f} KiB of new JSON)")
+
+        if args.verify:
+            for (name, document) in _load_documents(inputs, args.name):
+                if store.document(name) != document:
+                    print(f"❌ {name} did not round-trip")
+                    sys.exit(1)
+            print(f"✅ All {len(inputs)} inputs round-trip exactly")
+
+    elif args.command == 'unpack':
+        ResultStore(store_path).to_json(args.run, Path(args.output))
+        print(f"✅ Wrote {args.output}")
+
+    elif args.command == 'info':
+        store = ResultStore(store_path)
+        print(f"{store_path}: {len(store)} rows, {len(store.strings)} distinct strings, {len(store.layouts)} row layouts")
+        for name in store.runs:
+            info = store.run(name)
+            print(f"  {name:<45} rows {info['start']}–{info['stop']}")
+        for name, spec in store.header["arrays"].items():
+            nbytes = int(np.prod(spec["shape"])) * np.dtype(spec["dtype"]).itemsize
+            print(f"  {name:<30} {spec['dtype']:<5} {nbytes:>10,} bytes")
+
+    else:
+        store = ResultStore(store_path)
+        print(f"{'Run':<45} {'Queries':>8} {'Errors':>7} {'Accuracy':>9} {'P50':>8} {'P90':>8} {'P99':>8}")
+        for name in store.runs:
+            s = store.run_summary(name)
+            print(f"{name:<45} {s['queries']:>8} {s['error_rate']:>6.1%} {s['accuracy']:>8.1%} "
+                  f"{s['p50'] * 1000:>6.0f}ms {s['p90'] * 1000:>6.0f}ms {s['p99'] * 1000:>6.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Router Configuration Sweep (Accuracy vs Latency vs Throughput)
+
+--use-hybrid only labels a report; the classifier mode is set when the API
+starts. This runner sends the same suite through several router
+configurations in one invocation and puts the results side by side, so a
+cascade setting can be picked against the latency SLOs.
+
+A configuration reaches the router either through extra request fields (for
+an API that accepts per-request router options) or through its own endpoint
+(one API instance per configuration), or both:
+
+    [
+      {"name": "semantic-only", "request_fields": {"router_config": {"mode": "semantic"}}},
+      {"name": "hybrid-0.75",   "request_fields": {"router_config": {"mode": "hybrid", "keyword_threshold": 0.75}}},
+      {"name": "hybrid-server", "api_base": "http://localhost:8002", "description": "enable_hybrid_classification=True"}
+    ]
+
+Each configuration gets the full standard report in its own directory. The
+sweep table lists accuracy overall and by tier, P50/P99 latency and QPS,
+marks the Pareto-optimal configurations (not beaten on every one of: tier
+accuracies, P50, P99 and QPS by some other configuration), and recommends
+the most accurate configuration that meets the P50/P99 SLOs without failing
+more than --max-error-rate of its requests.
+
+Usage:
+    python3 router_sweep.py --configs sweep.json --test-suite ../test-suites/difficulty-stratified-balanced-250.json
+    python3 router_sweep.py --configs sweep.json --concurrency 16 --warmup 20 --p99-slo 1.5
+
+Arguments:
+    --configs PATH         JSON list of configurations (see above)
+    --test-suite PATH      Path to test suite JSON file
+    --concurrency N        In-flight requests per configuration (default: 8)
+    --warmup N             Queries sent and discarded before each configuration's run (default: 20),
+                           so the first configuration doesn't pay for cold connections and caches
+    --timeout SECONDS      Per-request timeout (default: 30)
+    --p50-slo SECONDS      P50 latency SLO (default: 0.5, README target)
+    --p99-slo SECONDS      P99 latency SLO (default: 2.0, README target)
+    --max-error-rate FRAC  Highest error rate a recommended configuration may have (default: 0.05)
+    --api-base URL         Default base URL for configurations without api_base (default: http://localhost:8000)
+    --output-dir PATH      Where to write results (default: <RESULTS_DIR>/sweep)
+
+Outputs:
+    - <config>/stratified_results.json, stratified_summary.txt, confusion_matrix.txt per configuration
+    - sweep_results.json: One row per configuration, Pareto flags and the recommendation
+    - sweep_summary.txt: The sweep table
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from difficulty_stratified_test import (
+    API_BASE,
+    RESULT_LOG_NAME,
+    RESULTS_DIR,
+    api_endpoints,
+    calculate_metrics,
+    check_api_health,
+    format_confusion_matrix,
+    format_summary,
+    run_queries_async,
+    save_reports,
+)
+from metrics_aggregator import DIFFICULTIES
+from result_log import ResultLog, iter_results
+from suite_loader import load_suite
+
+# (row key, direction) for Pareto dominance: +1 higher is better, -1 lower is better
+PARETO_OBJECTIVES = [
+    ("easy_accuracy", +1),
+    ("medium_accuracy", +1),
+    ("hard_accuracy", +1),
+    ("p50_seconds", -1),
+    ("p99_seconds", -1),
+    ("qps", +1),
+]
+
+
+def load_configs(path: Path, default_api_base: str) -> List[Dict[str, Any]]:
+    """Read and check the configuration list; fills in api_base and request_fields defaults."""
+    with open(path, 'r') as f:
+        configs = json.load(f)
+    if not isinstance(configs, list) or not configs:
+        raise ValueError(f"{path}: expected a non-empty JSON list of configurations")
+
+    seen = set()
+    for i, config in enumerate(configs, 1):
+        if not isinstance(config, dict) or not isinstance(config.get('name'), str):
+            raise ValueError(f"{path}: configuration {i} needs a 'name'")
+        if not re.fullmatch(r"[A-Za-z0-9._-]+", config['name']):
+            raise ValueError(f"{path}: configuration name {config['name']!r} must be usable as a directory name")
+        if config['name'] in seen:
+            raise ValueError(f"{path}: duplicate configuration name {config['name']!r}")
+        if not isinstance(config.get('request_fields', {}), dict):
+            raise ValueError(f"{path}: request_fields of {config['name']!r} must be an object")
+        seen.add(config['name'])
+        config.setdefault('api_base', default_api_base)
+        config.setdefault('request_fields', {})
+    return configs
+
+
+def sweep_row(config: Dict[str, Any], metrics: Dict[str, Any], completed: int, duration: float) -> Dict[str, Any]:
+    """The sweep table row for one configuration's metrics."""
+    by_difficulty = metrics.get('by_difficulty', {})
+    latency = metrics.get('latency', {})
+    overall = metrics.get('overall', {})
+    row = {
+        "name": config['name'],
+        "api_base": config['api_base'],
+        "request_fields": config['request_fields'],
+        "queries": completed,
+        "error_rate": 1 - overall.get('success_rate', 0.0) / 100,
+        "overall_accuracy": overall.get('overall_accuracy'),
+        "p50_seconds": latency.get('p50_seconds'),
+        "p99_seconds": latency.get('p99_seconds'),
+        "qps": completed / duration if duration > 0 else 0.0,
+        "duration_seconds": duration,
+    }
+    for tier in DIFFICULTIES:
+        row[f"{tier}_accuracy"] = by_difficulty.get(tier, {}).get('accuracy')
+    return row
+
+
+def _dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """a is at least as good as b on every objective and better on one.
+
+    Objectives neither row measured (e.g. a tier the suite doesn't have) are
+    skipped; a value missing on one side only never wins.
+    """
+    strictly_better = False
+    for key, direction in PARETO_OBJECTIVES:
+        if a[key] is None and b[key] is None:
+            continue
+        if a[key] is None or b[key] is None:
+            return False
+        if (a[key] - b[key]) * direction < 0:
+            return False
+        if a[key] != b[key]:
+            strictly_better = True
+    return strictly_better
+
+
+def mark_pareto(rows: List[Dict[str, Any]], p50_slo: float, p99_slo: float):
+    """Add pareto_optimal, dominated_by and meets_slo to every row."""
+    for row in rows:
+        row['dominated_by'] = [other['name'] for other in rows if other is not row and _dominates(other, row)]
+        row['pareto_optimal'] = not row['dominated_by']
+        row['meets_slo'] = (row['p50_seconds'] is not None and row['p99_seconds'] is not None
+                            and row['p50_seconds'] < p50_slo and row['p99_seconds'] < p99_slo)
+
+
+def recommend(rows: List[Dict[str, Any]], max_error_rate: float) -> Optional[str]:
+    """Most accurate configuration within the latency SLOs and error budget (higher QPS breaks ties).
+
+    overall_accuracy only counts successful queries, so without the error
+    budget a configuration failing most requests could still win.
+    """
+    candidates = [row for row in rows if row['meets_slo'] and row['error_rate'] <= max_error_rate
+                  and row['overall_accuracy'] is not None]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda row: (row['overall_accuracy'], row['qps']))['name']
+
+
+def _pct(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}%"
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+
+def format_sweep(rows: List[Dict[str, Any]], recommendation: Optional[str], p50_slo: float, p99_slo: float,
+                 max_error_rate: float) -> str:
+    """The sweep table, most accurate configuration first."""
+    lines = []
+    lines.append("="*100)
+    lines.append(f"ROUTER CONFIGURATION SWEEP (SLO: P50 < {p50_slo * 1000:g}ms, P99 < {p99_slo * 1000:g}ms)")
+    lines.append("="*100)
+    lines.append(f"{'Configuration':<22} {'Overall':>8} {'Easy':>7} {'Medium':>7} {'Hard':>7} "
+                 f"{'P50':>8} {'P99':>8} {'QPS':>7} {'Errors':>7}  Pareto SLO")
+    lines.append("-"*100)
+    ordered = sorted(rows, key=lambda row: -(row['overall_accuracy'] or 0))
+    for row in ordered:
+        lines.append(f"{row['name'][:22]:<22} {_pct(row['overall_accuracy']):>8} {_pct(row['easy_accuracy']):>7} "
+                     f"{_pct(row['medium_accuracy']):>7} {_pct(row['hard_accuracy']):>7} "
+                     f"{_ms(row['p50_seconds']):>8} {_ms(row['p99_seconds']):>8} {row['qps']:>7.1f} "
+                     f"{row['error_rate'] * 100:>6.1f}%  {'  ★   ' if row['pareto_optimal'] else '      '} "
+                     f"{'✅' if row['meets_slo'] else '❌'}")
+    lines.append("")
+
+    dominated = [row for row in ordered if row['dominated_by']]
+    if dominated:
+        lines.append("Dominated configurations:")
+        for row in dominated:
+            lines.append(f"   {row['name']}: beaten on every axis by {', '.join(row['dominated_by'])}")
+        lines.append("")
+
+    if recommendation:
+        lines.append(f"🏆 Recommended: {recommendation} (most accurate within the latency SLOs "
+                     f"and {max_error_rate * 100:g}% errors)")
+    else:
+        lines.append(f"⚠️  No configuration meets the latency SLOs with at most {max_error_rate * 100:g}% errors")
+    lines.append("="*100)
+    return "\n".join(lines)
+
+
+def run_config(config: Dict[str, Any], queries: List[Dict[str, Any]], args, output_dir: Path) -> Optional[Dict[str, Any]]:
+    """Run the suite against one configuration and write its standard reports. None if its API is down."""
+    query_endpoint, health_endpoint = api_endpoints(config['api_base'])
+    print(f"\n⚙️  {config['name']}: {query_endpoint}"
+          + (f" with {json.dumps(config['request_fields'])}" if config['request_fields'] else "")
+          + (f" ({config['description']})" if config.get('description') else ""))
+    if not check_api_health(health_endpoint):
+        print(f"   ❌ API for {config['name']} is not healthy; skipping")
+        return None
+
+    if args.warmup:
+        warmup = [(i, queries[(i - 1) % len(queries)]) for i in range(1, args.warmup + 1)]
+        asyncio.run(run_queries_async(warmup, len(queries), args.concurrency, lambda result: None,
+                                      timeout=args.timeout, endpoint=query_endpoint, quiet=True,
+                                      request_fields=config['request_fields']))
+
+    config_dir = output_dir / config['name']
+    config_dir.mkdir(parents=True, exist_ok=True)
+    log_path = config_dir / RESULT_LOG_NAME
+    run_start = time.perf_counter()
+    with ResultLog(log_path) as log:
+        asyncio.run(run_queries_async(enumerate(queries, 1), len(queries), args.concurrency, log.write,
+                                      timeout=args.timeout, endpoint=query_endpoint, quiet=True,
+                                      request_fields=config['request_fields']))
+        completed = log.written
+    run_duration = time.perf_counter() - run_start
+
+    metrics = calculate_metrics(iter_results(log_path))
+    test_run = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "sweep",
+        "configuration": config,
+        "total_queries": completed,
+        "test_suite": str(args.test_suite),
+        "api_endpoint": query_endpoint,
+        "concurrency": args.concurrency,
+        "duration_seconds": run_duration,
+        "throughput_qps": completed / run_duration if run_duration > 0 else 0.0
+    }
+    if 'error' in metrics:
+        # Every request failed (e.g. the API rejects the request fields): keep the sweep going, show it as failed
+        print(f"   ❌ {metrics['error']}")
+        save_reports(config_dir, test_run, iter_results(log_path), metrics,
+                     f"❌ {config['name']}: {metrics['error']}\n", "")
+    else:
+        save_reports(config_dir, test_run, iter_results(log_path), metrics, format_summary(metrics),
+                     format_confusion_matrix(metrics['confusion_matrix']))
+    row = sweep_row(config, metrics, completed, run_duration)
+    print(f"   Accuracy {_pct(row['overall_accuracy'])} | P50 {_ms(row['p50_seconds'])} | "
+          f"P99 {_ms(row['p99_seconds'])} | {row['qps']:.1f} QPS")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the suite against several router configurations and compare them')
+    parser.add_argument('--configs', type=str, required=True, help='JSON list of router configurations')
+    parser.add_argument(
+        '--test-suite',
+        type=str,
+        default='/Users/richardglaubitz/Projects/Apex-Memory-System-Development/tests/test-suites/difficulty-stratified-balanced-250.json',
+        help='Path to test suite JSON file (default: difficulty-stratified-balanced-250.json)'
+    )
+    parser.add_argument('--concurrency', type=int, default=8, help='In-flight requests per configuration (default: 8)')
+    parser.add_argument('--warmup', type=int, default=20,
+                        help='Discarded warm-up queries per configuration, 0 to disable (default: 20)')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+    parser.add_argument('--p50-slo', type=float, default=0.5, help='P50 latency SLO in seconds (default: 0.5)')
+    parser.add_argument('--p99-slo', type=float, default=2.0, help='P99 latency SLO in seconds (default: 2.0)')
+    parser.add_argument('--max-error-rate', type=float, default=0.05,
+                        help='Highest error rate a recommended configuration may have (default: 0.05)')
+    parser.add_argument('--api-base', type=str, default=API_BASE,
+                        help=f'Base URL for configurations without api_base (default: {API_BASE})')
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(RESULTS_DIR / "sweep"),
+        help='Directory for result files (default: <RESULTS_DIR>/sweep)'
+    )
+    args = parser.parse_args()
+
+    try:
+        configs = load_configs(Path(args.configs), args.api_base)
+        queries = load_suite(Path(args.test_suite)).queries
+    except (OSError, ValueError) as e:  # SuiteError is a ValueError
+        print(f"❌ {e}")
+        sys.exit(1)
+    output_dir = Path(args.output_dir)
+
+    print("🚀 Starting Router Configuration Sweep")
+    print("="*80)
+    print(f"   Test Suite: {Path(args.test_suite).name} ({len(queries)} queries)")
+    print(f"   Configurations: {', '.join(config['name'] for config in configs)}")
+    print(f"   Concurrency: {args.concurrency}")
+    print("="*80)
+
+    rows = [row for row in (run_config(config, queries, args, output_dir) for config in configs) if row]
+    if not rows:
+        print("\n❌ No configuration could be run.")
+        sys.exit(1)
+
+    mark_pareto(rows, args.p50_slo, args.p99_slo)
+    recommendation = recommend(rows, args.max_error_rate)
+    table = format_sweep(rows, recommendation, args.p50_slo, args.p99_slo, args.max_error_rate)
+
+    sweep = {
+        "timestamp": datetime.now().isoformat(),
+        "test_suite": str(args.test_suite),
+        "concurrency": args.concurrency,
+        "slo": {"p50_seconds": args.p50_slo, "p99_seconds": args.p99_slo, "max_error_rate": args.max_error_rate},
+        "configurations": rows,
+        "recommendation": recommendation
+    }
+    with open(output_dir / "sweep_results.json", 'w') as f:
+        json.dump(sweep, f, indent=2)
+    with open(output_dir / "sweep_summary.txt", 'w') as f:
+        f.write(table)
+
+    print("")
+    print(table)
+    print(f"\n✅ Sweep results: {output_dir / 'sweep_results.json'}")
+
+
+if __name__ == "__main__":
+    main()
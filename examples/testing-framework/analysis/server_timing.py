@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Server-Side Stage Timings
+
+Extracts per-stage server timings from a query response so each result can
+say where its latency went: intent classification, each backend (neo4j,
+graphiti, qdrant, postgres), result merging, and the network/client remainder.
+
+Two sources are read, and merged if both are present:
+
+    Server-Timing: classify;dur=3.1, neo4j;dur=20.5, qdrant;dur=11.0, merge;dur=1.2, total;dur=36.4
+    {"intent": ..., "timings": {"classification": 3.1, "neo4j": 20.5, ...}}     # milliseconds
+
+Stage names are normalized (e.g. "classify"/"intent" -> "classification",
+"postgresql"/"pg" -> "postgres"). Values are stored in seconds, like
+latency_seconds. "network" is derived client-side: the client latency minus
+the server's total, or, when no total is sent, minus the non-database stages
+plus the slowest database (backends are queried in parallel).
+"""
+
+from typing import Any, Dict, List, Mapping, Optional
+
+DATABASE_STAGES = ['neo4j', 'graphiti', 'qdrant', 'postgres']
+
+# Display order for waterfalls; unknown stages are listed after these, before network
+STAGE_ORDER = ['classification'] + DATABASE_STAGES + ['merge']
+
+STAGE_ALIASES = {
+    'classify': 'classification',
+    'classifier': 'classification',
+    'intent': 'classification',
+    'router': 'classification',
+    'routing': 'classification',
+    'postgresql': 'postgres',
+    'pg': 'postgres',
+    'merging': 'merge',
+    'aggregate': 'merge',
+    'aggregation': 'merge',
+    'app': 'total',
+    'server': 'total',
+    'server_total': 'total'
+}
+
+
+def normalize_stage(name: str) -> str:
+    name = name.strip().lower().replace('-', '_')
+    return STAGE_ALIASES.get(name, name)
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Parse a Server-Timing header into {stage: milliseconds}. Entries without dur are skipped."""
+    timings: Dict[str, float] = {}
+    for entry in header.split(','):
+        parts = [part.strip() for part in entry.split(';')]
+        if not parts[0]:
+            continue
+        for param in parts[1:]:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'dur':
+                try:
+                    stage = normalize_stage(parts[0])
+                    timings[stage] = timings.get(stage, 0.0) + float(value.strip().strip('"'))
+                except ValueError:
+                    pass
+    return timings
+
+
+def extract_server_timings(headers: Mapping[str, str], body: Dict[str, Any],
+                           latency_seconds: float) -> Optional[Dict[str, float]]:
+    """Return {stage: seconds} for one response, or None if the server sent no timings."""
+    timings_ms: Dict[str, float] = {}
+
+    header = headers.get('server-timing')
+    if header:
+        timings_ms.update(parse_server_timing(header))
+
+    field = body.get('timings')
+    if isinstance(field, dict):
+        for stage, value in field.items():
+            if isinstance(value, (int, float)):
+                timings_ms[normalize_stage(stage)] = float(value)
+
+    if not timings_ms:
+        return None
+
+    timings = {stage: ms / 1000 for stage, ms in timings_ms.items()}
+
+    total = timings.pop('total', None)
+    if total is None:
+        databases = [timings[db] for db in timings if db in DATABASE_STAGES]
+        total = sum(v for stage, v in timings.items() if stage not in DATABASE_STAGES) + max(databases, default=0.0)
+    timings['network'] = max(latency_seconds - total, 0.0)
+
+    return timings
+
+
+def ordered_stages(stages: List[str]) -> List[str]:
+    """Sort stage names into waterfall order: classification, databases, merge, others, network."""
+    known = [stage for stage in STAGE_ORDER if stage in stages]
+    others = sorted(stage for stage in stages if stage not in STAGE_ORDER and stage != 'network')
+    return known + others + (['network'] if 'network' in stages else [])
+
+
+def format_stage_waterfall(server_timing: Dict[str, Any], width: int = 40) -> str:
+    """Format mean per-stage time by difficulty tier as a text waterfall."""
+    lines = []
+    lines.append("🧭 Server-Side Latency Waterfall (mean per query)")
+    lines.append(f"   Queries with timings: {server_timing['queries_with_timings']}")
+
+    stage_summary = server_timing['stages']
+    lines.append("")
+    lines.append("   Stage             Mean      P90    Share")
+    for stage in ordered_stages(list(stage_summary)):
+        data = stage_summary[stage]
+        lines.append(f"   {stage:14s} {data['mean_seconds'] * 1000:7.1f}ms {data['p90_seconds'] * 1000:7.1f}ms "
+                     f"{data['share_of_latency']:6.1f}%")
+
+    for tier, stages in server_timing['by_difficulty'].items():
+        lines.append("")
+        lines.append(f"   {tier.capitalize()} tier:")
+        # Databases run in parallel: they share a start offset and only the slowest extends the path
+        db_max = max((mean for stage, mean in stages.items() if stage in DATABASE_STAGES), default=0.0)
+        total = sum(mean for stage, mean in stages.items() if stage not in DATABASE_STAGES) + db_max
+        offset = 0.0
+        db_start = None
+        for stage in ordered_stages(list(stages)):
+            mean = stages[stage]
+            if stage in DATABASE_STAGES:
+                if db_start is None:
+                    db_start = offset
+                    offset += db_max
+                start_at = db_start
+            else:
+                start_at = offset
+                offset += mean
+            start = int(round(start_at / total * width)) if total else 0
+            length = max(1, int(round(mean / total * width))) if total and mean > 0 else 0
+            lines.append(f"      {stage:14s} {' ' * start}{'█' * length}{' ' * max(width - start - length, 0)} "
+                         f"{mean * 1000:7.1f}ms")
+
+    if server_timing['by_database']:
+        lines.append("")
+        lines.append("   Backend time (queries that used the backend):")
+        slowest = sorted(server_timing['by_database'].items(), key=lambda x: x[1]['mean_seconds'], reverse=True)
+        for db, data in slowest:
+            lines.append(f"      {db:12s}: mean {data['mean_seconds'] * 1000:7.1f}ms | "
+                         f"P90 {data['p90_seconds'] * 1000:7.1f}ms ({data['count']} queries)")
+
+    return "\n".join(lines)
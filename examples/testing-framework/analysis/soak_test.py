@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Soak Test with Time-Windowed Metrics
+
+Cycles through a test suite for a fixed duration with a constant number of
+requests in flight, and reports metrics per time window (QPS, P50/P99, error
+rate, accuracy by tier, harness RSS) so problems that a single 250-query pass
+hides show up: latency drifting upward, memory growing, a connection pool
+running dry (windows with no completions), error bursts.
+
+Per-query print() lines are replaced by a compact dashboard redrawn in place
+about once a second (or one line per window when stdout is not a terminal).
+Windows are closed by a clock tick, not only by completions, so a stalled
+API still produces (empty) windows.
+
+Usage:
+    python3 soak_test.py --duration 30m --window 10 --concurrency 16
+    python3 soak_test.py --duration 2h --window 60 --api-base http://127.0.0.1:8001
+
+Arguments:
+    --test-suite PATH    Path to test suite JSON file
+    --duration SPEC      How long to run: seconds, or with s/m/h suffix (default: 10m)
+    --window SECONDS     Width of each metrics window (default: 10)
+    --concurrency N      In-flight requests (default: 8)
+    --timeout SECONDS    Per-request timeout (default: 30)
+    --api-base URL       Base URL of the query API (default: http://localhost:8000)
+    --output-dir PATH    Where to write results (default: <RESULTS_DIR>/soak)
+
+Outputs:
+    - stratified_results.jsonl: Append-only per-query result log
+    - soak_timeseries.jsonl: One line of metrics per window, appended as each window closes
+    - stratified_results.json: Per-query results, overall metrics and the drift analysis
+    - stratified_summary.txt: Standard summary plus the soak report
+    - confusion_matrix.txt: Intent prediction confusion analysis
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from difficulty_stratified_test import (
+    API_BASE,
+    RESULT_LOG_NAME,
+    RESULTS_DIR,
+    api_endpoints,
+    calculate_metrics,
+    check_api_health,
+    format_confusion_matrix,
+    format_summary,
+    load_queries,
+    run_queries_async,
+    save_reports,
+)
+from latency_histogram import LatencyHistogram
+from metrics_aggregator import DIFFICULTIES
+from metrics_exporter import RunMetricsExporter, add_exporter_arguments, exporter_from_args
+from result_log import ResultLog, iter_results
+
+TIMESERIES_NAME = "soak_timeseries.jsonl"
+DASHBOARD_ROWS = 12
+
+
+def parse_duration(spec: str) -> float:
+    """'90', '90s', '30m' or '2h' to seconds."""
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    spec = spec.strip().lower()
+    if spec and spec[-1] in units:
+        return float(spec[:-1]) * units[spec[-1]]
+    return float(spec)
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def cycle_queries(queries: List[Dict[str, Any]], deadline: float) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (query_index, query_data) round-robin through the suite until the deadline."""
+    while True:
+        for i, query_data in enumerate(queries, 1):
+            if time.monotonic() >= deadline:
+                return
+            yield i, query_data
+
+
+class WindowStats:
+    """Counters and a latency histogram for one time window."""
+
+    def __init__(self, index: int, start_offset: float, width: float):
+        self.index = index
+        self.start_offset = start_offset
+        self.width = width
+        self.partial = False
+        self.latency = LatencyHistogram()
+        self.completed = 0
+        self.errors = 0
+        self.tier_total = dict.fromkeys(DIFFICULTIES, 0)
+        self.tier_correct = dict.fromkeys(DIFFICULTIES, 0)
+
+    def record(self, result: Dict[str, Any]):
+        self.completed += 1
+        if result['status'] != 'success':
+            self.errors += 1
+            return
+        self.latency.record(result['latency_seconds'])
+        tier = result.get('difficulty')
+        if tier in self.tier_total:
+            self.tier_total[tier] += 1
+            self.tier_correct[tier] += bool(result.get('intent_correct'))
+
+    def summary(self) -> Dict[str, Any]:
+        successes = self.completed - self.errors
+        correct = sum(self.tier_correct.values())
+        return {
+            "window": self.index,
+            "start_offset_seconds": self.start_offset,
+            "end_offset_seconds": self.start_offset + self.width,
+            "completed": self.completed,
+            "partial": self.partial,
+            "qps": self.completed / self.width,
+            "errors": self.errors,
+            "error_rate": (self.errors / self.completed) * 100 if self.completed else 0.0,
+            "p50_seconds": self.latency.percentile(50) if successes else None,
+            "p99_seconds": self.latency.percentile(99) if successes else None,
+            "accuracy": (correct / successes) * 100 if successes else None,
+            "accuracy_by_difficulty": {
+                tier: (self.tier_correct[tier] / self.tier_total[tier]) * 100
+                for tier in DIFFICULTIES if self.tier_total[tier]
+            },
+            "rss_mb": current_rss_mb()
+        }
+
+
+class WindowedMetrics:
+    """Assigns results to fixed-width windows by completion time and appends closed windows to a file."""
+
+    def __init__(self, width: float, timeseries_path: Path):
+        self.width = width
+        self.start = time.monotonic()
+        self.current = WindowStats(0, 0.0, width)
+        self.closed: List[Dict[str, Any]] = []
+        self.total_completed = 0
+        self.last_completion = self.start
+        self._file = open(timeseries_path, 'w', encoding='utf-8')
+
+    def advance(self, now: Optional[float] = None):
+        """Close every window that has ended by `now`, including empty ones."""
+        index = int(((now or time.monotonic()) - self.start) // self.width)
+        while self.current.index < index:
+            row = self.current.summary()
+            self.closed.append(row)
+            self._file.write(json.dumps(row) + "\n")
+            self._file.flush()
+            next_index = self.current.index + 1
+            self.current = WindowStats(next_index, next_index * self.width, self.width)
+
+    def record(self, result: Dict[str, Any]):
+        self.last_completion = time.monotonic()
+        self.advance(self.last_completion)
+        self.current.record(result)
+        self.total_completed += 1
+
+    def close(self):
+        """Close the final (possibly partial) window and the time series file.
+
+        The final window only runs until the last completion, so its QPS is
+        taken over that span and it is marked partial (left out of the drift fit).
+        """
+        if self.current.completed:
+            elapsed = self.last_completion - self.start - self.current.start_offset
+            self.current.width = max(elapsed, 1e-9)
+            self.current.partial = True
+            row = self.current.summary()
+            self.closed.append(row)
+            self._file.write(json.dumps(row) + "\n")
+        self._file.close()
+
+
+def analyze_drift(windows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Least-squares trend per minute of P50, P99, QPS and RSS across full windows, plus first vs last.
+
+    The partial final window (shorter, and draining in-flight requests) is left out of the fit.
+    """
+    active = [w for w in windows if w['p50_seconds'] is not None and not w.get('partial')]
+    drift: Dict[str, Any] = {"windows": len(windows), "empty_windows": sum(1 for w in windows if not w['completed']),
+                             "partial_windows": sum(1 for w in windows if w.get('partial'))}
+    if len(active) < 2:
+        return drift
+
+    minutes = np.array([(w['start_offset_seconds'] + w['end_offset_seconds']) / 120 for w in active])
+    for key, scale, name in [('p50_seconds', 1000, 'p50_ms_per_minute'), ('p99_seconds', 1000, 'p99_ms_per_minute'),
+                             ('qps', 1, 'qps_per_minute'), ('rss_mb', 1, 'rss_mb_per_minute')]:
+        values = np.array([w[key] for w in active]) * scale
+        drift[name] = float(np.polyfit(minutes, values, 1)[0])
+
+    drift["first_window_p99_seconds"] = active[0]['p99_seconds']
+    drift["last_window_p99_seconds"] = active[-1]['p99_seconds']
+    drift["rss_growth_mb"] = active[-1]['rss_mb'] - active[0]['rss_mb']
+    return drift
+
+
+def _cell(value: Optional[float], fmt: str, scale: float = 1) -> str:
+    return format(value * scale, fmt) if value is not None else "-"
+
+
+def format_window_row(w: Dict[str, Any]) -> str:
+    tiers = w['accuracy_by_difficulty']
+    return (f" {w['start_offset_seconds']:7.0f}s | {w['qps']:7.1f} | {_cell(w['p50_seconds'], '7.1f', 1000):>7s} |"
+            f" {_cell(w['p99_seconds'], '7.1f', 1000):>7s} | {w['error_rate']:5.1f}% |"
+            f" {_cell(w['accuracy'], '5.1f'):>5s}% | {_cell(tiers.get('easy'), '5.1f'):>5s} |"
+            f" {_cell(tiers.get('medium'), '5.1f'):>5s} | {_cell(tiers.get('hard'), '5.1f'):>5s} | {w['rss_mb']:6.1f}")
+
+
+WINDOW_HEADER = "   Window |     QPS | P50(ms) | P99(ms) |  Err% |   Acc% |  Easy |   Med |  Hard | RSS MB"
+
+
+def render_dashboard(metrics: WindowedMetrics, duration: float) -> List[str]:
+    """Lines of the live view: progress, the last few windows and the running drift."""
+    elapsed = time.monotonic() - metrics.start
+    lines = [
+        f"🔥 Soak {time.strftime('%H:%M:%S', time.gmtime(elapsed))} / {time.strftime('%H:%M:%S', time.gmtime(duration))}"
+        f" | completed {metrics.total_completed:,} | current window {metrics.current.completed:,} "
+        f"({metrics.current.errors} errors)",
+        WINDOW_HEADER
+    ]
+    lines.extend(format_window_row(w) for w in metrics.closed[-(DASHBOARD_ROWS - 4):])
+    drift = analyze_drift(metrics.closed)
+    if 'p50_ms_per_minute' in drift:
+        lines.append(f"   Drift: P50 {drift['p50_ms_per_minute']:+.2f} ms/min | P99 {drift['p99_ms_per_minute']:+.2f} ms/min"
+                     f" | RSS {drift['rss_mb_per_minute']:+.2f} MB/min")
+    return lines
+
+
+async def dashboard_loop(metrics: WindowedMetrics, duration: float, done: asyncio.Event, interactive: bool):
+    """Close windows on the clock and redraw the dashboard about once a second."""
+    drawn = 0
+    printed_windows = 0
+    while not done.is_set():
+        try:
+            await asyncio.wait_for(done.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+        metrics.advance()
+
+        if interactive:
+            lines = render_dashboard(metrics, duration)
+            # Move to the top of the previous frame and clear it
+            if drawn:
+                sys.stdout.write(f"\x1b[{drawn}F\x1b[J")
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+            drawn = len(lines)
+        else:
+            if printed_windows == 0 and metrics.closed:
+                print(WINDOW_HEADER)
+            for w in metrics.closed[printed_windows:]:
+                print(format_window_row(w), flush=True)
+            printed_windows = len(metrics.closed)
+
+
+async def run_soak(queries: List[Dict[str, Any]], duration: float, concurrency: int, timeout: float,
+                   endpoint: str, log: ResultLog, metrics: WindowedMetrics,
+                   exporter: Optional[RunMetricsExporter] = None):
+    """Run the suite in a loop until the deadline, feeding the log, the windows and the exporter."""
+    done = asyncio.Event()
+
+    def on_result(result: Dict[str, Any]):
+        log.write(result)
+        metrics.record(result)
+        if exporter:
+            exporter.record(result)
+
+    dashboard = asyncio.create_task(dashboard_loop(metrics, duration, done, sys.stdout.isatty()))
+    try:
+        await run_queries_async(cycle_queries(queries, time.monotonic() + duration), len(queries), concurrency,
+                                on_result, timeout=timeout, endpoint=endpoint, quiet=True)
+    finally:
+        done.set()
+        await dashboard
+
+
+def format_soak_report(windows: List[Dict[str, Any]], drift: Dict[str, Any]) -> str:
+    """Format every window plus the drift analysis."""
+    lines = []
+    lines.append("="*80)
+    lines.append("SOAK TEST TIME SERIES")
+    lines.append("="*80)
+    lines.append(WINDOW_HEADER)
+    lines.append("-" * len(WINDOW_HEADER))
+    for w in windows:
+        lines.append(format_window_row(w))
+    lines.append("")
+
+    lines.append(f"📈 Drift ({drift['windows']} windows, {drift['empty_windows']} with no completions"
+                 f"{', final partial window not fitted' if drift.get('partial_windows') else ''})")
+    if 'p50_ms_per_minute' in drift:
+        lines.append(f"   P50:  {drift['p50_ms_per_minute']:+.3f} ms/min")
+        lines.append(f"   P99:  {drift['p99_ms_per_minute']:+.3f} ms/min "
+                     f"(first window {drift['first_window_p99_seconds'] * 1000:.1f}ms → "
+                     f"last {drift['last_window_p99_seconds'] * 1000:.1f}ms)")
+        lines.append(f"   QPS:  {drift['qps_per_minute']:+.3f} /min")
+        lines.append(f"   RSS:  {drift['rss_mb_per_minute']:+.3f} MB/min ({drift['rss_growth_mb']:+.1f} MB overall)")
+    else:
+        lines.append("   Not enough windows with successful queries to estimate drift")
+    lines.append("="*80)
+    return "\n".join(lines)
+
+
+def main():
+    """Soak test execution."""
+    parser = argparse.ArgumentParser(description='Cycle through a test suite for a fixed duration with windowed metrics')
+    parser.add_argument(
+        '--test-suite',
+        type=str,
+        default='/Users/richardglaubitz/Projects/Apex-Memory-System-Development/tests/test-suites/difficulty-stratified-balanced-250.json',
+        help='Path to test suite JSON file (default: difficulty-stratified-balanced-250.json)'
+    )
+    parser.add_argument('--duration', type=str, default='10m', help='Run time: seconds or with s/m/h suffix (default: 10m)')
+    parser.add_argument('--window', type=float, default=10, help='Metrics window in seconds (default: 10)')
+    parser.add_argument('--concurrency', type=int, default=8, help='In-flight requests (default: 8)')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+    parser.add_argument('--api-base', type=str, default=API_BASE, help=f'Base URL of the query API (default: {API_BASE})')
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(RESULTS_DIR / "soak"),
+        help='Directory for result files (default: <RESULTS_DIR>/soak)'
+    )
+    add_exporter_arguments(parser)
+    args = parser.parse_args()
+    try:
+        duration = parse_duration(args.duration)
+    except ValueError:
+        parser.error(f"--duration: expected seconds or a number with an s/m/h suffix, got {args.duration!r}")
+    if not duration > 0:
+        parser.error('--duration must be positive')
+    if not args.window > 0:
+        parser.error('--window must be positive')
+
+    query_endpoint, health_endpoint = api_endpoints(args.api_base)
+    queries_path = Path(args.test_suite)
+    output_dir = Path(args.output_dir)
+
+    print("🚀 Starting Soak Test")
+    print("="*80)
+    print(f"   Test Suite: {queries_path.name}")
+    print(f"   API Endpoint: {query_endpoint}")
+    print(f"   Duration: {duration:.0f}s in {args.window:g}s windows, {args.concurrency} in flight")
+    print("="*80)
+    print("")
+
+    if not check_api_health(health_endpoint):
+        print("\n❌ API is not healthy. Exiting.")
+        sys.exit(1)
+
+    if not queries_path.exists():
+        print(f"❌ Test suite not found: {queries_path}")
+        return
+
+    queries = load_queries(queries_path)
+    print(f"✅ Loaded {len(queries)} test queries\n")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    log_path = output_dir / RESULT_LOG_NAME
+    metrics_windows = WindowedMetrics(args.window, output_dir / TIMESERIES_NAME)
+    exporter = exporter_from_args(args, {"mode": "soak", "test_suite": queries_path.name})
+    run_start = time.perf_counter()
+    try:
+        with ResultLog(log_path) as log:
+            asyncio.run(run_soak(queries, duration, args.concurrency, args.timeout, query_endpoint,
+                                 log, metrics_windows, exporter))
+            completed = log.written
+    except KeyboardInterrupt:
+        print("\n⏹️  Interrupted; reporting what completed")
+        completed = sum(1 for _ in iter_results(log_path))
+    finally:
+        metrics_windows.close()
+        if exporter:
+            exporter.close()
+    run_duration = time.perf_counter() - run_start
+
+    print("\n📊 Calculating metrics...")
+    metrics = calculate_metrics(iter_results(log_path))
+    if 'error' in metrics:
+        print(f"❌ {metrics['error']}")
+        sys.exit(1)
+    drift = analyze_drift(metrics_windows.closed)
+    metrics['soak'] = {"window_seconds": args.window, "timeseries_file": TIMESERIES_NAME, "drift": drift}
+
+    test_run = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "soak",
+        "total_queries": completed,
+        "test_suite": str(queries_path),
+        "api_endpoint": query_endpoint,
+        "concurrency": args.concurrency,
+        "duration_seconds": run_duration,
+        "throughput_qps": completed / run_duration if run_duration > 0 else 0.0,
+        "window_seconds": args.window
+    }
+    summary = format_summary(metrics) + "\n\n" + format_soak_report(metrics_windows.closed, drift)
+    confusion_text = format_confusion_matrix(metrics['confusion_matrix'])
+    save_reports(output_dir, test_run, iter_results(log_path), metrics, summary, confusion_text)
+    print(f"✅ Time series saved to: {output_dir / TIMESERIES_NAME}")
+    print("")
+
+    print(format_soak_report(metrics_windows.closed, drift))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Test Suite Loader
+
+Loads, validates and normalizes test suite JSON files, and builds the
+difficulty / intent / domain index once at load time instead of every caller
+rescanning the query list.
+
+The suites in test-suites/ use two schemas:
+
+    difficulty-stratified-250-queries.json   id, query, intent, difficulty, difficulty_rationale
+    difficulty-stratified-balanced-250.json  query, intent, difficulty, domain, rationale
+
+Every query is normalized to:
+
+    id                    given id, or "q<position>" (1-based), as the runners always defaulted to
+    query                 non-empty string
+    intent                one of graph / temporal / semantic / metadata
+    difficulty            one of easy / medium / hard
+    difficulty_rationale  from difficulty_rationale or rationale ('' when neither)
+    domain                given domain, or None
+
+plus any other keys unchanged. All schema errors are collected and raised
+together as a SuiteError; disagreements with the suite's own metadata
+(total_queries, tier counts) become warnings.
+
+The file is parsed incrementally, one query object at a time from a bounded
+read buffer, so iter_suite_queries() runs in flat memory for suites of any
+size. load_suite() caches the parsed, indexed suite as plain JSON keyed by the
+SHA-256 of the file, so later runs skip parsing and validation entirely. The
+cache directory may be shared, so entries are data only (never pickles) and any
+entry that fails to load or does not match its source is reparsed.
+
+    suite = load_suite(path)
+    suite.queries                                   # normalized query dicts
+    suite.counts('difficulty')                      # {'easy': 100, 'medium': 100, 'hard': 50}
+    suite.select(difficulty='hard', intent='graph') # queries from the index
+
+    for query in iter_suite_queries(path): ...      # streaming, nothing retained
+
+Usage (validate suites, e.g. in CI):
+    python3 suite_loader.py ../test-suites/*.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from metrics_aggregator import DIFFICULTIES, INTENTS
+
+CACHE_DIR = Path(os.environ.get("SUITE_CACHE_DIR", Path.home() / ".cache" / "router-test-suites"))
+CACHE_VERSION = 2
+INDEXED_FIELDS = ('difficulty', 'intent', 'domain')
+MAX_REPORTED_ERRORS = 20
+READ_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Characters a chunk boundary can leave after a number that decodes early, e.g. "e+" in "1.5e+"
+_NUMBER_TAIL = 3
+
+
+class SuiteError(ValueError):
+    """A test suite file that doesn't match the expected schema."""
+
+    def __init__(self, path: Path, errors: List[str]):
+        self.path = path
+        self.errors = errors
+        shown = errors[:MAX_REPORTED_ERRORS]
+        more = f"\n  ... and {len(errors) - len(shown)} more" if len(errors) > len(shown) else ""
+        super().__init__(f"{path}: {len(errors)} schema error(s)\n  " + "\n  ".join(shown) + more)
+
+
+def normalize_query(raw: Any, position: int, errors: List[str]) -> Optional[Dict[str, Any]]:
+    """Validate one raw query object and return it in the normalized schema (None if invalid)."""
+    where = f"query {position}"
+    if not isinstance(raw, dict):
+        errors.append(f"{where}: expected an object, got {type(raw).__name__}")
+        return None
+
+    problems = []
+    query = raw.get('query')
+    if not isinstance(query, str) or not query.strip():
+        problems.append("'query' must be a non-empty string")
+    if raw.get('intent') not in INTENTS:
+        problems.append(f"'intent' must be one of {INTENTS}, got {raw.get('intent')!r}")
+    if raw.get('difficulty') not in DIFFICULTIES:
+        problems.append(f"'difficulty' must be one of {DIFFICULTIES}, got {raw.get('difficulty')!r}")
+    query_id = raw.get('id', f"q{position}")
+    if type(query_id) not in (int, str):
+        problems.append(f"'id' must be an integer or string, got {query_id!r}")
+    rationale = raw.get('difficulty_rationale', raw.get('rationale', ''))
+    if not isinstance(rationale, str):
+        problems.append("'difficulty_rationale' / 'rationale' must be a string")
+    domain = raw.get('domain')
+    if domain is not None and not isinstance(domain, str):
+        problems.append(f"'domain' must be a string, got {domain!r}")
+
+    if problems:
+        errors.extend(f"{where}: {problem}" for problem in problems)
+        return None
+
+    normalized = {
+        'id': query_id,
+        'query': query,
+        'intent': raw['intent'],
+        'difficulty': raw['difficulty'],
+        'difficulty_rationale': rationale,
+        'domain': domain,
+    }
+    for key, value in raw.items():
+        if key not in normalized and key != 'rationale':
+            normalized[key] = value
+    return normalized
+
+
+class _StreamingParser:
+    """Incremental reader for {"metadata": ..., "queries": [...]} documents.
+
+    Top-level values other than "queries" are decoded whole (they're small);
+    the queries array is decoded one element at a time from a buffer that only
+    grows to the size of the largest single element.
+    """
+
+    def __init__(self, f, read_size: int = READ_SIZE):
+        self.f = f
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("unexpected end of file")
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"expected one of {chars!r} but found {char!r}")
+        self.pos += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number near the end of the buffer may continue in the next chunk: "1." | "5" decodes as 1,
+            # stopping before the ".", and "1.5e" | "3" as 1.5
+            if (len(self.buf) - end <= _NUMBER_TAIL and isinstance(value, (int, float))
+                    and not isinstance(value, bool) and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+    def parse(self) -> Iterator[Tuple[str, Any]]:
+        """Yield ('query', element) for each queries entry and (key, value) for other top-level keys."""
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError("expected an object key")
+            self._expect(":")
+            if key == 'queries' and self._peek() == "[":
+                self.pos += 1
+                if self._peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield 'query', self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                yield key, self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+def _iter_suite(path: Path, metadata: Dict[str, Any], errors: List[str]) -> Iterator[Dict[str, Any]]:
+    """Normalized queries from a suite file; fills metadata and errors as a side effect."""
+    seen_ids = set()
+    position = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            for key, value in _StreamingParser(f).parse():
+                if key != 'query':
+                    if key == 'queries':
+                        errors.append("'queries' must be a list")
+                    metadata[key] = value
+                    continue
+                position += 1
+                normalized = normalize_query(value, position, errors)
+                if normalized is None:
+                    continue
+                if normalized['id'] in seen_ids:
+                    errors.append(f"query {position}: duplicate id {normalized['id']!r}")
+                seen_ids.add(normalized['id'])
+                yield normalized
+        except ValueError as e:
+            errors.append(f"invalid JSON: {e}")
+    if position == 0 and 'queries' not in metadata:
+        errors.append("no 'queries' list")
+
+
+def iter_suite_queries(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream normalized queries without keeping them; raises SuiteError at the end if any were invalid."""
+    path = Path(path)
+    errors: List[str] = []
+    yield from _iter_suite(path, {}, errors)
+    if errors:
+        raise SuiteError(path, errors)
+
+
+class Suite:
+    """A validated, normalized test suite with a position index per difficulty, intent and domain."""
+
+    def __init__(self, path: Path, metadata: Dict[str, Any], queries: List[Dict[str, Any]],
+                 digest: str = "", index: Optional[Dict[str, Dict[Any, List[int]]]] = None):
+        self.path = Path(path)
+        self.metadata = metadata
+        self.queries = queries
+        self.digest = digest
+        if index is None:
+            index = {field: {} for field in INDEXED_FIELDS}
+            for position, query in enumerate(queries):
+                for field in INDEXED_FIELDS:
+                    index[field].setdefault(query[field], []).append(position)
+        self.index = index
+        self.warnings = self._check_metadata()
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.queries)
+
+    def counts(self, field: str) -> Dict[Any, int]:
+        """Queries per value of an indexed field (tiers and intents in canonical order)."""
+        order = {'difficulty': DIFFICULTIES, 'intent': INTENTS}.get(field, sorted(self.index[field], key=str))
+        return {value: len(self.index[field][value]) for value in order if value in self.index[field]}
+
+    def positions(self, **where: Any) -> List[int]:
+        """Sorted positions of queries matching every given indexed field value."""
+        selected = None
+        for field, value in where.items():
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f"{field} is not indexed (use one of {INDEXED_FIELDS})")
+            matching = self.index[field].get(value, [])
+            selected = matching if selected is None else sorted(set(selected).intersection(matching))
+        return list(range(len(self.queries))) if selected is None else list(selected)
+
+    def select(self, **where: Any) -> List[Dict[str, Any]]:
+        """Queries matching every given indexed field value, e.g. select(difficulty='hard', intent='graph')."""
+        return [self.queries[position] for position in self.positions(**where)]
+
+    def _check_metadata(self) -> List[str]:
+        warnings = []
+        declared = self.metadata.get('total_queries')
+        if isinstance(declared, int) and declared != len(self.queries):
+            warnings.append(f"metadata.total_queries is {declared} but the suite has {len(self.queries)} queries")
+        tiers = self.metadata.get('difficulty_distribution') or self.metadata.get('difficulty_tiers')
+        if isinstance(tiers, dict):
+            actual = self.counts('difficulty')
+            for tier, declared_count in tiers.items():
+                if isinstance(declared_count, int) and actual.get(tier, 0) != declared_count:
+                    warnings.append(f"metadata declares {declared_count} {tier} queries, found {actual.get(tier, 0)}")
+        return warnings
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_suite(path: Path, use_cache: bool = True, cache_dir: Path = CACHE_DIR) -> Suite:
+    """Load a validated, indexed suite, from the hash-keyed cache when the file is unchanged."""
+    path = Path(path)
+    digest = file_digest(path)
+    cache_path = Path(cache_dir) / f"{digest}-v{CACHE_VERSION}.json"
+
+    if use_cache and cache_path.exists():
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached['digest'] != digest:
+                raise ValueError("cache entry belongs to another file")
+            # The index is stored as [value, positions] pairs: domains may be None, which JSON keys can't hold
+            index = {field: {value: positions for value, positions in cached['index'][field]}
+                     for field in INDEXED_FIELDS}
+            return Suite(path, cached['metadata'], cached['queries'], digest, index)
+        except Exception:
+            pass  # unreadable or malformed cache entry; reparse below
+
+    top_level: Dict[str, Any] = {}
+    errors: List[str] = []
+    queries = list(_iter_suite(path, top_level, errors))
+    if errors:
+        raise SuiteError(path, errors)
+    metadata = top_level['metadata'] if isinstance(top_level.get('metadata'), dict) else {}
+    suite = Suite(path, metadata, queries, digest)
+
+    if use_cache:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_name(cache_path.name + f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'digest': digest, 'metadata': metadata, 'queries': queries,
+                           'index': {field: list(values.items()) for field, values in suite.index.items()}}, f)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError, ValueError):
+            pass  # caching is best effort (read-only home, full disk...)
+    return suite
+
+
+def format_suite_summary(suite: Suite) -> str:
+    """Counts by tier × intent and by domain, plus any metadata warnings."""
+    lines = [f"📖 {suite.path.name}: {len(suite)} queries (sha256 {suite.digest[:12]})"]
+    header = f"   {'':<8}" + "".join(f"{intent:>10}" for intent in INTENTS) + f"{'total':>10}"
+    lines.append(header)
+    for tier, total in suite.counts('difficulty').items():
+        cells = "".join(f"{len(suite.positions(difficulty=tier, intent=intent)):>10}" for intent in INTENTS)
+        lines.append(f"   {tier:<8}{cells}{total:>10}")
+    domains = suite.counts('domain')
+    if list(domains) != [None]:
+        lines.append("   Domains: " + ", ".join(f"{domain or 'none'} {count}" for domain, count in domains.items()))
+    for warning in suite.warnings:
+        lines.append(f"   ⚠️  {warning}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate test suites and show their stratification')
+    parser.add_argument('suites', type=str, nargs='+', help='Test suite JSON files')
+    parser.add_argument('--no-cache', action='store_true', help='Parse from scratch, ignoring the suite cache')
+    args = parser.parse_args()
+
+    failed = False
+    for suite_path in args.suites:
+        try:
+            suite = load_suite(Path(suite_path), use_cache=not args.no_cache)
+        except SuiteError as e:
+            print(f"❌ {e}")
+            failed = True
+            continue
+        print(format_suite_summary(suite))
+        print("")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
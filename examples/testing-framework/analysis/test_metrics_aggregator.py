@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the columnar metrics engine.
+
+calculate_metrics() must reproduce the metrics stored with the 2025-10-08
+stratified run byte for byte (the sections written by the original list-based
+implementation), however the results are fed into ResultColumns.
+
+Usage:
+    cd analysis && python3 -m pytest -q test_metrics_aggregator.py
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from difficulty_stratified_test import calculate_metrics
+from metrics_aggregator import ResultColumns, aggregate_metrics
+
+BASELINE = Path(__file__).resolve().parent.parent / "results" / "stratified" / "2025-10-08-stratified-results.json"
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    with open(BASELINE, 'r') as f:
+        return json.load(f)
+
+
+def _assert_matches_stored(metrics, stored):
+    for section, expected in stored.items():
+        assert json.dumps(metrics[section]) == json.dumps(expected), section
+
+
+def test_calculate_metrics_matches_stored_baseline(baseline):
+    _assert_matches_stored(calculate_metrics(baseline['results']), baseline['metrics'])
+
+
+def test_chunked_and_appended_rows_match(baseline, monkeypatch):
+    # A chunk size that does not divide the run exercises the chunk boundaries
+    monkeypatch.setattr(ResultColumns, 'CHUNK_ROWS', 7)
+    _assert_matches_stored(calculate_metrics(iter(baseline['results'])), baseline['metrics'])
+
+    columns = ResultColumns()
+    for result in baseline['results']:
+        columns.append(result)
+    _assert_matches_stored(aggregate_metrics(columns.finalize()), baseline['metrics'])
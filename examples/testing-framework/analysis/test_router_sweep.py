@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the router configuration sweep.
+
+A configuration whose requests all fail (e.g. the API rejects its
+request_fields) must show up as a failed row instead of aborting the sweep.
+
+Usage:
+    cd analysis && python3 -m pytest -q test_router_sweep.py
+"""
+
+import argparse
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from mock_query_api import MockQueryAPI, MockServer, load_suite_index, make_handler
+from router_sweep import format_sweep, mark_pareto, recommend, run_config
+from suite_loader import load_suite
+
+SUITE = Path(__file__).resolve().parent.parent / "test-suites" / "quick-test-20.json"
+
+
+@pytest.fixture
+def mock_api_base():
+    """Start a mock query API with the given per-tier profile; returns its base URL."""
+    servers = []
+
+    def start(profiles):
+        expected, difficulties = load_suite_index(str(SUITE))
+        api = MockQueryAPI(expected, latency_ms=1, difficulties=difficulties, profiles=profiles)
+        server = MockServer(("127.0.0.1", 0), make_handler(api))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_config_failing_every_request_is_reported_as_failed(mock_api_base, tmp_path):
+    configs = [
+        {"name": "healthy", "api_base": mock_api_base({}), "request_fields": {}},
+        {"name": "broken", "api_base": mock_api_base({"default": {"latency": 1, "error_rate": 1.0}}),
+         "request_fields": {}},
+    ]
+    args = argparse.Namespace(warmup=0, concurrency=4, timeout=10, test_suite=str(SUITE))
+    queries = load_suite(SUITE).queries
+
+    rows = [run_config(config, queries, args, tmp_path) for config in configs]
+    healthy, broken = rows
+
+    assert healthy['error_rate'] == 0.0
+    assert healthy['overall_accuracy'] is not None
+    assert broken['error_rate'] == 1.0
+    assert broken['overall_accuracy'] is None
+    assert broken['p50_seconds'] is None and broken['p99_seconds'] is None
+
+    stored = json.loads((tmp_path / "broken" / "stratified_results.json").read_text())
+    assert 'error' in stored['metrics']
+    assert "No successful queries" in (tmp_path / "broken" / "stratified_summary.txt").read_text()
+
+    mark_pareto(rows, 0.5, 2.0)
+    recommendation = recommend(rows, 0.05)
+    assert recommendation == "healthy"
+    assert "broken" in format_sweep(rows, recommendation, 0.5, 2.0, 0.05)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the streaming suite parser.
+
+Chunk boundaries can fall anywhere, including inside a number, so the parsed
+document must not depend on the read size.
+
+Usage:
+    cd analysis && python3 -m pytest -q test_suite_loader.py
+"""
+
+import io
+import json
+
+import pytest
+
+from suite_loader import _StreamingParser
+
+DOCUMENT = json.dumps({
+    "version": 1.5,
+    "metadata": {"total_queries": 2, "threshold": -0.25, "scale": 1.5e+3},
+    "queries": [
+        {"id": 10, "query": "who reports to alice", "intent": "graph", "difficulty": "easy", "weight": 2.75},
+        {"id": 11, "query": "changes since 2024", "intent": "temporal", "difficulty": "hard", "weight": 1e-2}
+    ],
+    "count": 12345
+})
+
+
+def _parse(text: str, read_size: int):
+    return list(_StreamingParser(io.StringIO(text), read_size).parse())
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 5, 7, 14, 64, 1 << 20])
+def test_parse_is_independent_of_read_size(read_size):
+    expected = json.loads(DOCUMENT)
+    parsed = _parse(DOCUMENT, read_size)
+    assert [value for key, value in parsed if key == 'query'] == expected['queries']
+    assert {key: value for key, value in parsed if key != 'query'} == {
+        key: value for key, value in expected.items() if key != 'queries'}
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 7, 14])
+def test_number_split_across_reads(read_size):
+    assert _parse('{"version": 1.5, "queries": []}', read_size) == [('version', 1.5)]
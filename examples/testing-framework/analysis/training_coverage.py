@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+"""
+Training Query Coverage and Leakage Analysis
+
+Checks router training queries (e.g. new-training-queries-200.json) against
+the test suites before they go into the router:
+
+    - leakage        test queries identical or nearly identical to a training query
+                     (inflates accuracy; conflicting when the two intents differ)
+    - redundancy     near-duplicate training queries, within an intent (wasted
+                     examples) and across intents (contradictory labels)
+    - coverage       per intent and tier, how close each test query's nearest
+                     training query of its own intent is, how often a k-NN vote
+                     over the training set gets the intent right, and the
+                     under-covered regions (groups of similar test queries with
+                     no nearby training example)
+
+Queries are embedded in batches with a local sentence-transformers model when
+the package is installed, otherwise with a dependency-free hashed TF-IDF
+encoder (word unigrams, bigrams and character trigrams hashed into a fixed
+number of dimensions; IDF weights are computed over the analysed corpus).
+Embeddings are kept in an append-only cache per encoder, keyed by the SHA-1
+of the text and memory-mapped on load, so reruns only embed new queries.
+Nearest neighbours are blocked matrix products over L2-normalized float32
+vectors, which handles tens of thousands of queries on a CPU.
+
+Usage:
+    python3 training_coverage.py --training new-training-queries-200.json \\
+        --test-suite ../test-suites/difficulty-stratified-250-queries.json \\
+        --test-suite ../test-suites/difficulty-stratified-balanced-250.json
+    python3 training_coverage.py --training config/training-queries.json --training new-training-queries-200.json \\
+        --backend model --model all-MiniLM-L6-v2
+
+Arguments:
+    --training PATH             Training query file (repeatable; see load_training_queries)
+    --test-suite PATH           Test suite JSON file (repeatable)
+    --backend NAME              auto, model or tfidf (default: auto = model if installed)
+    --model NAME                sentence-transformers model (default: all-MiniLM-L6-v2)
+    --hash-dim N                TF-IDF hashing dimensions (default: 1024)
+    --batch-size N              Embedding batch size (default: 256)
+    --k N                       Neighbours for the k-NN intent vote (default: 5)
+    --leak-threshold SIM        Cosine at or above which a test query leaks (default: per backend)
+    --duplicate-threshold SIM   Cosine at or above which training queries are near-duplicates (default: per backend)
+    --coverage-threshold SIM    Test queries whose nearest same-intent training query is below this are
+                                under-covered (default: per backend)
+    --cache-dir PATH            Embedding cache (default: ~/.cache/router-embeddings, or $EMBEDDING_CACHE_DIR)
+    --output-dir PATH           Where to write the report (default: <RESULTS_DIR>/training-coverage)
+
+Outputs:
+    - training_coverage.json: Every finding, per-intent and per-tier coverage
+    - training_coverage.txt: The text report
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from difficulty_stratified_test import RESULTS_DIR
+from metrics_aggregator import DIFFICULTIES, INTENTS
+from suite_loader import load_suite
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+CACHE_DIR = Path(os.environ.get("EMBEDDING_CACHE_DIR", Path.home() / ".cache" / "router-embeddings"))
+DEFAULT_TRAINING = Path(__file__).parent / "new-training-queries-200.json"
+
+# Cosine thresholds differ a lot between dense sentence embeddings and sparse lexical vectors
+DEFAULT_THRESHOLDS = {
+    "model": {"leak": 0.95, "duplicate": 0.92, "coverage": 0.60},
+    "tfidf": {"leak": 0.90, "duplicate": 0.80, "coverage": 0.30},
+}
+BLOCK_ROWS = 2048
+MAX_EXAMPLES = 10
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_'][a-z0-9]+)*")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase word tokens joined by single spaces, for exact-match leakage."""
+    return " ".join(_TOKEN.findall(text.lower()))
+
+
+def load_training_queries(path: Path) -> List[Dict[str, Any]]:
+    """Training queries as {text, intent, category, source} from any of the supported layouts.
+
+        {"intents": {"graph": {"categories": {"dependencies": [...]}}, "semantic": {"queries": [...]}}}
+        {"graph": [...], "semantic": [...]}                      (intent -> list, optionally under "intents")
+        [{"query": ..., "intent": ...}, ...]                     (or {"queries": [...]} of those)
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    items = []
+
+    def add(text: Any, intent: str, category: Optional[str]):
+        if isinstance(text, dict):
+            text = text.get('query') or text.get('text')
+        if isinstance(text, str) and text.strip():
+            items.append({"text": text, "intent": intent, "category": category, "source": path.name})
+
+    records = data.get('queries') if isinstance(data, dict) and isinstance(data.get('queries'), list) else data
+    if isinstance(records, list):
+        for record in records:
+            if isinstance(record, dict) and record.get('intent'):
+                add(record, record['intent'], record.get('category'))
+        return items
+
+    intents = data['intents'] if isinstance(data.get('intents'), dict) else data
+    for intent, entry in intents.items():
+        if intents is data and intent == 'metadata':
+            continue
+        if isinstance(entry, list):
+            for text in entry:
+                add(text, intent, None)
+        elif isinstance(entry, dict):
+            for text in entry.get('queries', []):
+                add(text, intent, None)
+            for category, texts in entry.get('categories', {}).items():
+                for text in texts:
+                    add(text, intent, category)
+    return items
+
+
+def load_test_queries(paths: List[Path]) -> List[Dict[str, Any]]:
+    """Test queries as {text, intent, difficulty, suite, id} from one or more suites."""
+    items = []
+    for path in paths:
+        for query in load_suite(path).queries:
+            items.append({"text": query['query'], "intent": query['intent'], "difficulty": query['difficulty'],
+                          "suite": path.name, "id": query['id']})
+    return items
+
+
+class HashedTfidfEncoder:
+    """Dependency-free lexical encoder: signed feature hashing of sublinear term frequencies.
+
+    encode() is corpus-independent (so vectors can be cached per text); the
+    IDF weighting is applied afterwards by idf_weights() over the corpus
+    actually being analysed.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"tfidf-hash{dim}"
+
+    def features(self, text: str) -> List[str]:
+        words = _TOKEN.findall(text.lower())
+        features = [f"w:{word}" for word in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[int, float] = {}
+            for feature in self.features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                index = (h & 0x7fffffff) % self.dim
+                counts[index] = counts.get(index, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+            for index, count in counts.items():
+                if count:
+                    vectors[row, index] = np.sign(count) * (1 + np.log(abs(count)))
+        return vectors
+
+    @staticmethod
+    def idf_weights(vectors: np.ndarray) -> np.ndarray:
+        """Smoothed IDF per hashed dimension over the analysed corpus."""
+        n = len(vectors)
+        df = np.zeros(vectors.shape[1], dtype=np.int64)
+        for start in range(0, n, BLOCK_ROWS):
+            df += (vectors[start:start + BLOCK_ROWS] != 0).sum(axis=0)
+        return (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+
+class ModelEncoder:
+    """A local sentence-transformers model (downloaded once into its own cache)."""
+
+    def __init__(self, model_name: str, batch_size: int):
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+        self.name = "model-" + re.sub(r"[^A-Za-z0-9._-]+", "_", model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+
+
+class EmbeddingCache:
+    """Append-only float32 vectors on disk, keyed by SHA-1 of the text, memory-mapped for reads.
+
+    <dir>/keys.bin holds 20-byte digests and <dir>/vectors.f32 the rows in the
+    same order. Vectors are written before keys, so a crash between the two
+    only leaves unreferenced trailing rows.
+    """
+
+    def __init__(self, directory: Path, dim: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.keys_path = self.directory / "keys.bin"
+        self.vectors_path = self.directory / "vectors.f32"
+        keys = self.keys_path.read_bytes() if self.keys_path.exists() else b""
+        self.rows = {keys[i:i + 20]: i // 20 for i in range(0, len(keys) - len(keys) % 20, 20)}
+        if self.vectors_path.exists():
+            stored = self.vectors_path.stat().st_size // (4 * dim)
+            if stored < len(self.rows):
+                self.rows = {key: row for key, row in self.rows.items() if row < stored}
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(len(self.rows) * 4 * dim)  # drop rows whose keys never landed
+        else:
+            self.rows = {}
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.sha1(text.encode('utf-8')).digest()
+
+    def get(self, texts: List[str], encode, batch_size: int) -> Tuple[np.ndarray, int, int]:
+        """(len(texts) × dim) vectors, embedding and appending the ones not cached yet.
+
+        Also returns how many distinct texts were newly embedded and how many
+        were found in the cache; repeated texts are counted once.
+        """
+        keys = [self.key(text) for text in texts]
+        unique = dict.fromkeys(keys)
+        missing = [key for key in unique if key not in self.rows]
+        hits = len(unique) - len(missing)
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            with open(self.vectors_path, 'ab') as vectors_file, open(self.keys_path, 'ab') as keys_file:
+                for start in range(0, len(missing), batch_size):
+                    batch = missing[start:start + batch_size]
+                    vectors = np.ascontiguousarray(encode([text_by_key[key] for key in batch]), dtype=np.float32)
+                    vectors_file.write(vectors.tobytes())
+                    vectors_file.flush()
+                    keys_file.write(b"".join(batch))
+                    keys_file.flush()
+                    for key in batch:
+                        self.rows[key] = len(self.rows)
+
+        if not keys:
+            return np.zeros((0, self.dim), dtype=np.float32), 0, 0
+        stored = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(len(self.rows), self.dim))
+        return np.asarray(stored[[self.rows[key] for key in keys]]), len(missing), hits
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def nearest_neighbors(queries: np.ndarray, corpus: np.ndarray, k: int, exclude_self: bool = False,
+                      groups: Optional[np.ndarray] = None, n_groups: int = 0) -> Tuple[np.ndarray, ...]:
+    """Top-k cosine neighbours of each query row in corpus, in blocks: (indices, similarities), best first.
+
+    With exclude_self, queries and corpus are the same matrix and a row is
+    not its own neighbour. With groups (a code in [0, n_groups) per corpus
+    row, -1 for none), the same pass also returns the best neighbour within
+    each group as (group_indices, group_similarities), shaped (queries × n_groups).
+    Missing neighbours are -1 / -inf.
+    """
+    m, n = len(queries), len(corpus)
+    k_eff = min(k, n - 1 if exclude_self else n)
+    indices = np.full((m, k), -1, dtype=np.int64)
+    sims = np.full((m, k), -np.inf, dtype=np.float32)
+    group_indices = np.full((m, n_groups), -1, dtype=np.int64)
+    group_sims = np.full((m, n_groups), -np.inf, dtype=np.float32)
+
+    # Sort corpus rows by group so each group is a contiguous column slice of the block
+    order = np.argsort(groups, kind='stable') if groups is not None else np.arange(n)
+    bounds = np.searchsorted(groups[order], np.arange(n_groups + 1)) if groups is not None else []
+    position = np.empty(n, dtype=np.int64)
+    position[order] = np.arange(n)
+    corpus_t = np.ascontiguousarray(corpus[order].T)
+
+    for start in range(0, m if k_eff > 0 else 0, BLOCK_ROWS):
+        block = queries[start:start + BLOCK_ROWS] @ corpus_t
+        rows = np.arange(len(block))
+        out = slice(start, start + len(block))
+        if exclude_self:
+            block[rows, position[start + rows]] = -np.inf
+        for g in range(len(bounds) - 1):
+            lo, hi = bounds[g], bounds[g + 1]
+            if hi > lo:
+                best = lo + block[:, lo:hi].argmax(axis=1)
+                group_indices[out, g] = order[best]
+                group_sims[out, g] = block[rows, best]
+        if k_eff <= 8:
+            # A few argmax passes beat a full argpartition for small k, and come out sorted
+            for j in range(k_eff):
+                best = block.argmax(axis=1)
+                indices[out, j] = order[best]
+                sims[out, j] = block[rows, best]
+                block[rows, best] = -np.inf
+        else:
+            top = np.argpartition(block, n - k_eff, axis=1)[:, n - k_eff:]
+            top_sims = np.take_along_axis(block, top, axis=1)
+            ranked = np.argsort(-top_sims, axis=1)
+            indices[out, :k_eff] = order[np.take_along_axis(top, ranked, axis=1)]
+            sims[out, :k_eff] = np.take_along_axis(top_sims, ranked, axis=1)
+
+    if groups is None:
+        return indices, sims
+    return indices, sims, group_indices, group_sims
+
+
+def find_leakage(train: List[Dict[str, Any]], test: List[Dict[str, Any]], nn_index: np.ndarray,
+                 nn_sim: np.ndarray, threshold: float) -> List[Dict[str, Any]]:
+    """Test queries whose nearest training query is identical or above the leak threshold."""
+    exact = {}
+    for i, item in enumerate(train):
+        exact.setdefault(normalize_text(item['text']), i)
+
+    leaks = []
+    for t, item in enumerate(test):
+        j = exact.get(normalize_text(item['text']))
+        similarity = 1.0 if j is not None else float(nn_sim[t, 0])
+        if j is None:
+            if similarity < threshold:
+                continue
+            j = int(nn_index[t, 0])
+        leaks.append({"test_query": item['text'], "suite": item['suite'], "test_intent": item['intent'],
+                      "difficulty": item['difficulty'], "training_query": train[j]['text'],
+                      "training_intent": train[j]['intent'], "similarity": similarity,
+                      "exact": similarity == 1.0 and normalize_text(train[j]['text']) == normalize_text(item['text']),
+                      "conflicting": train[j]['intent'] != item['intent']})
+    return sorted(leaks, key=lambda leak: -leak['similarity'])
+
+
+def find_duplicates(train: List[Dict[str, Any]], nn_index: np.ndarray, nn_sim: np.ndarray,
+                    threshold: float) -> List[Dict[str, Any]]:
+    """Training pairs at or above the duplicate threshold (each pair once)."""
+    pairs = {}
+    rows, cols = np.nonzero(nn_sim >= threshold)
+    for i, c in zip(rows.tolist(), cols.tolist()):
+        j = int(nn_index[i, c])
+        key = (min(i, j), max(i, j))
+        if key not in pairs:
+            a, b = train[key[0]], train[key[1]]
+            pairs[key] = {"query_a": a['text'], "intent_a": a['intent'], "query_b": b['text'],
+                          "intent_b": b['intent'], "similarity": float(nn_sim[i, c]),
+                          "cross_intent": a['intent'] != b['intent']}
+    return sorted(pairs.values(), key=lambda pair: -pair['similarity'])
+
+
+def knn_vote(train_intents: np.ndarray, nn_index: np.ndarray, nn_sim: np.ndarray) -> np.ndarray:
+    """Similarity-weighted k-NN intent vote (index into INTENTS) for each row; unknown intents (-1) don't vote."""
+    scores = np.zeros((len(nn_index), len(INTENTS)))
+    valid = (nn_index >= 0) & (train_intents[nn_index] >= 0)
+    rows = np.repeat(np.arange(len(nn_index))[:, None], nn_index.shape[1], axis=1)
+    np.add.at(scores, (rows[valid], train_intents[nn_index[valid]]), np.maximum(nn_sim[valid], 0))
+    return scores.argmax(axis=1)
+
+
+def under_covered_regions(vectors: np.ndarray, members: List[int], threshold: float) -> List[List[int]]:
+    """Greedy leader clustering of under-covered test queries: each joins the first leader it's close to."""
+    leaders = np.empty((len(members), vectors.shape[1]), dtype=vectors.dtype)
+    regions: List[List[int]] = []
+    for member in members:
+        if regions:
+            sims = leaders[:len(regions)] @ vectors[member]
+            best = int(np.argmax(sims))
+            if sims[best] >= threshold:
+                regions[best].append(member)
+                continue
+        leaders[len(regions)] = vectors[member]
+        regions.append([member])
+    return sorted(regions, key=len, reverse=True)
+
+
+def intent_codes(items: List[Dict[str, Any]]) -> np.ndarray:
+    """Index into INTENTS for each item's intent, -1 for unknown intents."""
+    return np.array([INTENTS.index(item['intent']) if item['intent'] in INTENTS else -1 for item in items],
+                    dtype=np.int64)
+
+
+def analyze_coverage(train: List[Dict[str, Any]], test: List[Dict[str, Any]], test_vectors: np.ndarray,
+                     test_nn: Tuple[np.ndarray, ...], threshold: float) -> Dict[str, Any]:
+    """Per intent and tier: nearest same-intent similarity, k-NN vote accuracy and under-covered regions.
+
+    test_nn is nearest_neighbors(test, train, k, groups=intent_codes(train), n_groups=len(INTENTS)).
+    """
+    train_intents = intent_codes(train)
+    test_intents = intent_codes(test)
+    test_tiers = np.array([item['difficulty'] for item in test])
+
+    nn_index, nn_sim, group_index, group_sims = test_nn
+    rows = np.arange(len(test))
+    codes = np.maximum(test_intents, 0)
+    same_index = np.where(test_intents >= 0, group_index[rows, codes], -1)
+    same_sim = np.where(same_index >= 0, group_sims[rows, codes], -np.inf)
+
+    predicted = knn_vote(train_intents, nn_index, nn_sim)
+    correct = predicted == test_intents
+    covered = same_sim >= threshold
+
+    by_intent = {}
+    for code, intent in enumerate(INTENTS):
+        rows = test_intents == code
+        if not rows.any():
+            continue
+        under = np.flatnonzero(rows & ~covered)
+        under = under[np.argsort(same_sim[under])]
+        regions = []
+        for region in under_covered_regions(test_vectors, under.tolist(), threshold)[:MAX_EXAMPLES]:
+            leader = region[0]
+            regions.append({
+                "size": len(region),
+                "example": test[leader]['text'],
+                "tiers": {tier: int(sum(test[r]['difficulty'] == tier for r in region)) for tier in DIFFICULTIES},
+                "nearest_training": train[same_index[leader]]['text'] if same_index[leader] >= 0 else None,
+                "similarity": float(same_sim[leader]) if same_index[leader] >= 0 else None,
+            })
+        finite = same_sim[rows][np.isfinite(same_sim[rows])]
+        by_intent[intent] = {
+            "test_queries": int(rows.sum()),
+            "training_queries": int((train_intents == code).sum()),
+            "mean_nearest_similarity": float(finite.mean()) if finite.size else None,
+            "under_covered": int(len(under)),
+            "under_covered_rate": float(len(under) / rows.sum()),
+            "knn_accuracy": float(correct[rows].mean() * 100),
+            "confused_with": {INTENTS[c]: int(n) for c, n in enumerate(np.bincount(predicted[rows & ~correct],
+                                                                                  minlength=len(INTENTS))) if n},
+            "regions": regions,
+        }
+
+    by_tier = {}
+    for tier in DIFFICULTIES:
+        rows = test_tiers == tier
+        if rows.any():
+            by_tier[tier] = {"test_queries": int(rows.sum()), "knn_accuracy": float(correct[rows].mean() * 100),
+                             "under_covered_rate": float((~covered[rows]).mean())}
+
+    return {"by_intent": by_intent, "by_tier": by_tier, "knn_accuracy": float(correct.mean() * 100)}
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Text report: leakage, redundancy, coverage by intent and tier, under-covered regions."""
+    lines = []
+    t = report['thresholds']
+    lines.append("="*80)
+    lines.append("TRAINING QUERY COVERAGE ANALYSIS")
+    lines.append("="*80)
+    lines.append(f"Encoder: {report['encoder']} | {report['training_queries']} training, "
+                 f"{report['test_queries']} test queries | {report['newly_embedded']} newly embedded")
+    lines.append(f"Thresholds: leak ≥ {t['leak']:.2f}, duplicate ≥ {t['duplicate']:.2f}, "
+                 f"coverage ≥ {t['coverage']:.2f} (cosine)")
+    lines.append("")
+
+    leaks = report['leakage']
+    lines.append(f"🚰 Test/train leakage: {len(leaks)} test queries "
+                 f"({sum(l['exact'] for l in leaks)} exact, {sum(l['conflicting'] for l in leaks)} with conflicting intent)")
+    for leak in leaks[:MAX_EXAMPLES]:
+        marker = "⚠️ " if leak['conflicting'] else "  "
+        lines.append(f"   {marker}{leak['similarity']:.3f} [{leak['test_intent']}/{leak['difficulty']}] "
+                     f"\"{leak['test_query'][:60]}\"")
+        lines.append(f"            ≈ [{leak['training_intent']}] \"{leak['training_query'][:60]}\"")
+    lines.append("")
+
+    duplicates = report['duplicates']
+    cross = [d for d in duplicates if d['cross_intent']]
+    lines.append(f"♻️  Near-duplicate training pairs: {len(duplicates)} ({len(cross)} across intents)")
+    for pair in (cross + [d for d in duplicates if not d['cross_intent']])[:MAX_EXAMPLES]:
+        marker = "⚠️ " if pair['cross_intent'] else "  "
+        lines.append(f"   {marker}{pair['similarity']:.3f} [{pair['intent_a']}] \"{pair['query_a'][:55]}\"")
+        lines.append(f"            [{pair['intent_b']}] \"{pair['query_b'][:55]}\"")
+    lines.append("")
+
+    coverage = report['coverage']
+    lines.append(f"🧭 Coverage by intent (k-NN vote accuracy overall: {coverage['knn_accuracy']:.1f}%)")
+    lines.append(f"   {'Intent':<10} {'Train':>6} {'Test':>6} {'Mean sim':>9} {'Under-covered':>14} {'k-NN acc':>9}  Confused with")
+    for intent, data in coverage['by_intent'].items():
+        mean = "-" if data['mean_nearest_similarity'] is None else f"{data['mean_nearest_similarity']:.3f}"
+        confused = ", ".join(f"{k} {v}" for k, v in data['confused_with'].items()) or "-"
+        lines.append(f"   {intent:<10} {data['training_queries']:>6} {data['test_queries']:>6} {mean:>9} "
+                     f"{data['under_covered']:>6} ({data['under_covered_rate'] * 100:4.1f}%) "
+                     f"{data['knn_accuracy']:>8.1f}%  {confused}")
+    lines.append("")
+    lines.append("   By tier: " + " | ".join(f"{tier} {data['knn_accuracy']:.1f}% k-NN, "
+                                            f"{data['under_covered_rate'] * 100:.0f}% under-covered"
+                                            for tier, data in coverage['by_tier'].items()))
+    lines.append("")
+
+    lines.append("🕳️  Largest under-covered regions (add training queries like these):")
+    for intent, data in coverage['by_intent'].items():
+        for region in data['regions'][:3]:
+            tiers = ", ".join(f"{n} {tier}" for tier, n in region['tiers'].items() if n)
+            lines.append(f"   [{intent}] {region['size']} queries ({tiers}): \"{region['example'][:60]}\"")
+            if region['nearest_training']:
+                lines.append(f"            nearest training ({region['similarity']:.3f}): "
+                             f"\"{region['nearest_training'][:55]}\"")
+    lines.append("="*80)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check training query coverage, redundancy and leakage against test suites')
+    parser.add_argument('--training', type=str, action='append',
+                        help=f'Training query file, repeatable (default: {DEFAULT_TRAINING.name})')
+    parser.add_argument('--test-suite', type=str, action='append',
+                        help='Test suite JSON file, repeatable (default: difficulty-stratified-balanced-250.json)')
+    parser.add_argument('--backend', choices=['auto', 'model', 'tfidf'], default='auto',
+                        help='Embedding backend (default: auto = model if sentence-transformers is installed)')
+    parser.add_argument('--model', type=str, default='all-MiniLM-L6-v2', help='sentence-transformers model name')
+    parser.add_argument('--hash-dim', type=int, default=1024, help='TF-IDF hashing dimensions (default: 1024)')
+    parser.add_argument('--batch-size', type=int, default=256, help='Embedding batch size (default: 256)')
+    parser.add_argument('--k', type=int, default=5, help='Neighbours in the k-NN intent vote (default: 5)')
+    parser.add_argument('--leak-threshold', type=float, help='Leakage cosine threshold (default: per backend)')
+    parser.add_argument('--duplicate-threshold', type=float, help='Near-duplicate cosine threshold (default: per backend)')
+    parser.add_argument('--coverage-threshold', type=float, help='Coverage cosine threshold (default: per backend)')
+    parser.add_argument('--cache-dir', type=str, default=str(CACHE_DIR), help=f'Embedding cache (default: {CACHE_DIR})')
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(RESULTS_DIR / "training-coverage"),
+        help='Directory for the report (default: <RESULTS_DIR>/training-coverage)'
+    )
+    args = parser.parse_args()
+
+    training_paths = [Path(p) for p in args.training or [DEFAULT_TRAINING]]
+    suite_paths = [Path(p) for p in args.test_suite or [
+        '/Users/richardglaubitz/Projects/Apex-Memory-System-Development/tests/test-suites/difficulty-stratified-balanced-250.json']]
+
+    backend = args.backend
+    if backend == 'auto':
+        backend = 'model' if SentenceTransformer is not None else 'tfidf'
+    if backend == 'model' and SentenceTransformer is None:
+        parser.error("--backend model needs the sentence-transformers package")
+    defaults = DEFAULT_THRESHOLDS[backend]
+    thresholds = {
+        "leak": args.leak_threshold if args.leak_threshold is not None else defaults['leak'],
+        "duplicate": args.duplicate_threshold if args.duplicate_threshold is not None else defaults['duplicate'],
+        "coverage": args.coverage_threshold if args.coverage_threshold is not None else defaults['coverage'],
+    }
+
+    train = [item for path in training_paths for item in load_training_queries(path)]
+    test = load_test_queries(suite_paths)
+    print(f"📖 {len(train)} training queries from {', '.join(p.name for p in training_paths)}")
+    print(f"📖 {len(test)} test queries from {', '.join(p.name for p in suite_paths)}")
+
+    encoder = ModelEncoder(args.model, args.batch_size) if backend == 'model' else HashedTfidfEncoder(args.hash_dim)
+    cache = EmbeddingCache(Path(args.cache_dir) / encoder.name, encoder.dim)
+    vectors, new, hits = cache.get([item['text'] for item in train] + [item['text'] for item in test],
+                             encoder.encode, args.batch_size)
+    print(f"🧮 Embedded with {encoder.name}: {new} new, {hits} from cache "
+          f"({len(vectors) - new - hits} repeated texts)")
+
+    if backend == 'tfidf':
+        vectors = vectors * HashedTfidfEncoder.idf_weights(vectors)
+    vectors = l2_normalize(vectors).astype(np.float32)
+    train_vectors, test_vectors = vectors[:len(train)], vectors[len(train):]
+
+    train_nn = nearest_neighbors(train_vectors, train_vectors, args.k, exclude_self=True)
+    test_nn = nearest_neighbors(test_vectors, train_vectors, args.k,
+                                groups=intent_codes(train), n_groups=len(INTENTS))
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "encoder": encoder.name,
+        "training_files": [str(p) for p in training_paths],
+        "test_suites": [str(p) for p in suite_paths],
+        "training_queries": len(train),
+        "test_queries": len(test),
+        "newly_embedded": new,
+        "cache_hits": hits,
+        "thresholds": thresholds,
+        "leakage": find_leakage(train, test, *test_nn[:2], thresholds['leak']),
+        "duplicates": find_duplicates(train, *train_nn, thresholds['duplicate']),
+        "coverage": analyze_coverage(train, test, test_vectors, test_nn, thresholds['coverage']),
+    }
+    text = format_report(report)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / "training_coverage.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(output_dir / "training_coverage.txt", 'w') as f:
+        f.write(text)
+
+    print("")
+    print(text)
+    print(f"\n✅ Report saved to: {output_dir / 'training_coverage.txt'}")
+
+
+if __name__ == "__main__":
+    main()